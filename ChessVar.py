@@ -5,103 +5,389 @@
 #               determined by capturing the king. There is no check/checkmate, no castling, en passant, or pawn promotion.
 #               Locations on the board are specified with "algebraic notation"
 
+import random
+from collections import OrderedDict
+
+_BOARD_SIZE = 8
+_NUM_SQUARES = _BOARD_SIZE * _BOARD_SIZE
+
+# One letter per piece type and color: uppercase for white, lowercase for black
+_PIECE_LETTERS = "PNBRQKFHpnbrqkfh"
+
+# Bit used for each fairy piece in Board._fairy_reserve
+_FAIRY_RESERVE_BITS = {
+    "F" : 1,
+    "H" : 2,
+    "f" : 4,
+    "h" : 8,
+}
+
+# Reserve bits belonging to each color
+_FAIRY_RESERVE_COLOR_BITS = {
+    "white" : _FAIRY_RESERVE_BITS["F"] | _FAIRY_RESERVE_BITS["H"],
+    "black" : _FAIRY_RESERVE_BITS["f"] | _FAIRY_RESERVE_BITS["h"],
+}
+
+_FAIRY_RESERVE_COLOR_LETTERS = {
+    "white" : "FH",
+    "black" : "fh",
+}
+
+# Letters of the rooks, knights, bishops and queens, whose capture allows fairy pieces to enter
+_MAJOR_PIECE_LETTERS = frozenset("NBRQnbrq")
+
+_OPPONENT = {
+    "white" : "black",
+    "black" : "white",
+}
+
+# (column, row) for every square index
+_SQUARE_COORDS = tuple((square % _BOARD_SIZE, square // _BOARD_SIZE) for square in range(_NUM_SQUARES))
+
+# Directions for each piece type as (squares moved forwards/backwards, squares moved left/right), in the order
+# destinations are reported. Forward is towards the opponent, so white and black get mirrored tables
+_PIECE_DIRECTIONS = {
+    "N" : [(2, -1), (2, 1), (-2, -1), (-2, 1), (1, -2), (1, 2), (-1, -2), (-1, 2)],
+    "B" : [(1, 1), (1, -1), (-1, -1), (-1, 1)],
+    "R" : [(0, 1), (0, -1), (1, 0), (-1, 0)],
+    "Q" : [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, -1), (-1, 1)],
+    "K" : [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, -1), (-1, 1)],
+    "F" : [(1, 1), (1, -1), (-1, 0)],
+    "H" : [(1, 0), (-1, -1), (-1, 1)],
+}
+_LEAPER_TYPES = "NK"
+_SLIDER_TYPES = "BRQFH"
+
+def _offset_square(square:int, letter:str, squares_moved_forwards_backwards:int, squares_moved_left_right:int):
+    """Returns the square reached by moving a piece with the given letter from the square, or None if it's off the board"""
+    column, row = _SQUARE_COORDS[square]
+    if letter.islower():
+        row += squares_moved_forwards_backwards
+    else:
+        row -= squares_moved_forwards_backwards
+    column += squares_moved_left_right
+    if 0 <= column < _BOARD_SIZE and 0 <= row < _BOARD_SIZE:
+        return row * _BOARD_SIZE + column
+    return None
+
+def _build_ray(square:int, letter:str, direction:tuple, max_steps:int) -> tuple:
+    """Returns the squares along one direction from the square, nearest first, stopping at the edge of the board"""
+    ray = []
+    forwards_backwards, left_right = direction
+    for step in range(1, max_steps + 1):
+        target = _offset_square(square, letter, forwards_backwards * step, left_right * step)
+        if target is None:
+            break
+        ray.append(target)
+    return tuple(ray)
+
+def _build_move_tables():
+    """Builds the per-letter, per-square lookup tables used for move generation
+    Leaper tables hold a tuple of target squares, slider tables hold a tuple of non-empty rays,
+    pawn push tables hold (one square forward, two squares forward) and pawn capture tables the two diagonals"""
+    leaper_targets = {}
+    slider_rays = {}
+    pawn_pushes = {}
+    pawn_captures = {}
+    for letter in _PIECE_LETTERS:
+        piece_type = letter.upper()
+        if piece_type in _LEAPER_TYPES:
+            leaper_targets[letter] = tuple(
+                tuple(ray[0] for ray in (_build_ray(square, letter, direction, 1) for direction in _PIECE_DIRECTIONS[piece_type]) if ray)
+                for square in range(_NUM_SQUARES)
+            )
+        elif piece_type in _SLIDER_TYPES:
+            slider_rays[letter] = tuple(
+                tuple(ray for ray in (_build_ray(square, letter, direction, _BOARD_SIZE) for direction in _PIECE_DIRECTIONS[piece_type]) if ray)
+                for square in range(_NUM_SQUARES)
+            )
+        elif piece_type == "P":
+            pushes = []
+            captures = []
+            for square in range(_NUM_SQUARES):
+                pushes.append(_build_ray(square, letter, (1, 0), 2))
+                forward = _offset_square(square, letter, 1, 0)
+                if forward is None:
+                    captures.append(())
+                else:
+                    captures.append(tuple(target for target in (_offset_square(forward, letter, 0, -1), _offset_square(forward, letter, 0, 1)) if target is not None))
+            pawn_pushes[letter] = tuple(pushes)
+            pawn_captures[letter] = tuple(captures)
+    return leaper_targets, slider_rays, pawn_pushes, pawn_captures
+
+_LEAPER_TARGETS, _SLIDER_RAYS, _PAWN_PUSHES, _PAWN_CAPTURES = _build_move_tables()
+
+def _build_destination_check_tables():
+    """Builds the per-letter, per-square tables used to check a single destination without generating every move
+    Leaper tables hold a bitboard of the target squares. Slider tables hold a dict mapping each square the piece
+    could reach on an empty board to a bitboard of the squares in between, which must be empty"""
+    leaper_masks = {}
+    slider_between = {}
+    for letter, targets_by_square in _LEAPER_TARGETS.items():
+        leaper_masks[letter] = tuple(sum(1 << target for target in targets) for targets in targets_by_square)
+    for letter, rays_by_square in _SLIDER_RAYS.items():
+        between_by_square = []
+        for rays in rays_by_square:
+            between = {}
+            for ray in rays:
+                mask = 0
+                for square in ray:
+                    between[square] = mask
+                    mask |= 1 << square
+            between_by_square.append(between)
+        slider_between[letter] = tuple(between_by_square)
+    return leaper_masks, slider_between
+
+_LEAPER_MASKS, _SLIDER_BETWEEN = _build_destination_check_tables()
+
+# Squares of each color's two home ranks, where fairy pieces may enter
+_HOME_RANKS_BITBOARD = {
+    "white" : 0xFFFF << 48,
+    "black" : 0xFFFF,
+}
+
+# Algebraic name of every square index (e.g. square 0 is 'a8' and square 63 is 'h1')
+_SQUARE_NAMES = tuple("abcdefgh"[column] + str(_BOARD_SIZE - row) for column, row in _SQUARE_COORDS)
+
+# Square index of every algebraic name (e.g. 'a8' is 0 and 'h1' is 63)
+_SQUARE_INDEXES = {name : square for square, name in enumerate(_SQUARE_NAMES)}
+
+# Moves are packed into ints: bits 0-5 hold the origin square and bits 6-11 the destination square.
+# Fairy piece entries set bit 12 and store the fairy piece's index in _FAIRY_LETTERS in place of the origin
+_MOVE_DROP_FLAG = 1 << 12
+_FAIRY_LETTERS = "FHfh"
+
+def _is_square_index(square) -> bool:
+    """Returns True if square is an int index of a square on the board (0 to 63), False otherwise"""
+    return isinstance(square, int) and 0 <= square < _NUM_SQUARES
+
+def encode_move(origin_square:int, destination_square:int) -> int:
+    """Returns the packed int for moving the piece on the origin square to the destination square"""
+    return origin_square | (destination_square << 6)
+
+def encode_drop(fairy_piece_name:str, destination_square:int) -> int:
+    """Returns the packed int for entering the fairy piece ('F', 'H', 'f' or 'h') on the destination square"""
+    return _MOVE_DROP_FLAG | _FAIRY_LETTERS.index(fairy_piece_name) | (destination_square << 6)
+
+def decode_move(move:int) -> tuple:
+    """Unpacks a move into (origin square, destination square, fairy piece name)
+    For board moves the fairy piece name is None, for fairy piece entries the origin square is None"""
+    destination_square = (move >> 6) & 63
+    if move & _MOVE_DROP_FLAG:
+        return None, destination_square, _FAIRY_LETTERS[move & 63]
+    return move & 63, destination_square, None
+
+def move_to_notation(move:int) -> str:
+    """Returns a readable form of a packed move, e.g. 'e2e4' for a board move or 'F@c1' for a fairy piece entry"""
+    origin_square, destination_square, fairy_piece_name = decode_move(move)
+    if fairy_piece_name is not None:
+        return fairy_piece_name + "@" + _SQUARE_NAMES[destination_square]
+    return _SQUARE_NAMES[origin_square] + _SQUARE_NAMES[destination_square]
+
+def notation_to_move(notation:str):
+    """Returns the packed move for a move written as in move_to_notation (e.g. 'e2e4' or 'F@c1'),
+    or None if it's malformed"""
+    if not isinstance(notation, str) or len(notation) != 4:
+        return None
+    destination_square = _SQUARE_INDEXES.get(notation[2:])
+    if destination_square is None:
+        return None
+    if notation[1] == "@":
+        if notation[0] not in _FAIRY_LETTERS:
+            return None
+        return encode_drop(notation[0], destination_square)
+    origin_square = _SQUARE_INDEXES.get(notation[:2])
+    if origin_square is None:
+        return None
+    return encode_move(origin_square, destination_square)
+
+def _walk_rays(rays:tuple, own:int, opponent:int) -> list:
+    """Returns the squares reachable along the rays: each ray stops before a piece of the moving color
+    and includes the first opposing piece it meets"""
+    destinations = []
+    for ray in rays:
+        for square in ray:
+            if (own >> square) & 1:
+                break
+            destinations.append(square)
+            if (opponent >> square) & 1:
+                break
+    return destinations
+
+def _parse_placement(placement:str) -> list:
+    """Returns the piece letter on each square index (None if empty) of a placement written as in Board.get_placement
+    Raises ValueError if the placement is malformed"""
+    ranks = placement.split("/")
+    if len(ranks) != _BOARD_SIZE:
+        raise ValueError("placement must have 8 ranks: " + repr(placement))
+    letters = []
+    for rank in ranks:
+        rank_letters = []
+        for symbol in rank:
+            if symbol in "12345678":
+                rank_letters.extend([None] * int(symbol))
+            elif symbol in _PIECE_LETTERS:
+                rank_letters.append(symbol)
+            else:
+                raise ValueError("unknown piece letter " + repr(symbol) + " in placement")
+        if len(rank_letters) != _BOARD_SIZE:
+            raise ValueError("rank " + repr(rank) + " doesn't have 8 squares")
+        letters.extend(rank_letters)
+    return letters
+
+def _build_zobrist_keys():
+    """Returns the random 64-bit keys XORed together to hash a position: one per piece letter and square,
+    one per fairy piece still in reserve, one per square holding a pawn that can still move two squares,
+    and one for black to move. A fixed seed keeps hashes the same across runs and processes"""
+    generator = random.Random(20240304)
+    piece_keys = {letter: tuple(generator.getrandbits(64) for _ in range(_NUM_SQUARES)) for letter in _PIECE_LETTERS}
+    reserve_keys = {letter: generator.getrandbits(64) for letter in _FAIRY_LETTERS}
+    unmoved_pawn_keys = tuple(generator.getrandbits(64) for _ in range(_NUM_SQUARES))
+    black_to_move_key = generator.getrandbits(64)
+    return piece_keys, reserve_keys, unmoved_pawn_keys, black_to_move_key
+
+_ZOBRIST_PIECE_KEYS, _ZOBRIST_RESERVE_KEYS, _ZOBRIST_UNMOVED_PAWN_KEYS, _ZOBRIST_BLACK_TO_MOVE_KEY = _build_zobrist_keys()
+
 class Board:
     """Represents a board with chess pieces
-    Contains Piece objects and EmptySquare objects
+    Occupancy is stored as 64-bit integers (bitboards) per color and per piece letter, with bit (row * 8 + column)
+    standing for the square at that column and row. A flat list of the 64 squares maps each square to its Piece
+    object or the EmptySquare object
     Is called by ChessVar"""
     def __init__(self) -> None:
-        """Creates a board with all the pieces in their starting positions"""
-        self._pieces = {
-            "black rook a" : Rook("black"),
-            "black knight b" : Knight("black"),
-            "black bishop c" : Bishop("black"),
-            "black queen" : Queen("black"),
-            "black king" : King("black"),
-            "black bishop f": Bishop("black"),
-            "black knight g": Knight("black"),
-            "black rook h": Rook("black"),
-            "black pawn a": Pawn("black"),
-            "black pawn b": Pawn("black"),
-            "black pawn c": Pawn("black"),
-            "black pawn d": Pawn("black"),
-            "black pawn e": Pawn("black"),
-            "black pawn f": Pawn("black"),
-            "black pawn g": Pawn("black"),
-            "black pawn h": Pawn("black"),
-            "black falcon": Falcon("black"),
-            "black hunter": Hunter("black"),
-            "white rook a" : Rook("white"),
-            "white knight b" : Knight("white"),
-            "white bishop c" : Bishop("white"),
-            "white queen" : Queen("white"),
-            "white king" : King("white"),
-            "white bishop f": Bishop("white"),
-            "white knight g": Knight("white"),
-            "white rook h": Rook("white"),
-            "white pawn a": Pawn("white"),
-            "white pawn b": Pawn("white"),
-            "white pawn c": Pawn("white"),
-            "white pawn d": Pawn("white"),
-            "white pawn e": Pawn("white"),
-            "white pawn f": Pawn("white"),
-            "white pawn g": Pawn("white"),
-            "white pawn h": Pawn("white"),
-            "white falcon": Falcon("white"),
-            "white hunter": Hunter("white"),
-            "empty": EmptySquare(),
-        }
-        self._board = [
-            [self._pieces["black rook a"], self._pieces["black knight b"], self._pieces["black bishop c"], self._pieces["black queen"], self._pieces["black king"], self._pieces["black bishop f"], self._pieces["black knight g"], self._pieces["black rook h"]],
-            [self._pieces["black pawn a"], self._pieces["black pawn b"], self._pieces["black pawn c"], self._pieces["black pawn d"], self._pieces["black pawn e"], self._pieces["black pawn f"], self._pieces["black pawn g"], self._pieces["black pawn h"], ],
-            [self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], ],
-            [self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], ],
-            [self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], ],
-            [self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], self._pieces["empty"], ],
-            [self._pieces["white pawn a"], self._pieces["white pawn b"], self._pieces["white pawn c"], self._pieces["white pawn d"], self._pieces["white pawn e"], self._pieces["white pawn f"], self._pieces["white pawn g"], self._pieces["white pawn h"], ],
-            [self._pieces["white rook a"], self._pieces["white knight b"], self._pieces["white bishop c"], self._pieces["white queen"], self._pieces["white king"], self._pieces["white bishop f"], self._pieces["white knight g"], self._pieces["white rook h"]],
-        ]
-        
-        self._avail_fairy_pieces = {
-            "f" : self._pieces["black falcon"],
-            "h" : self._pieces["black hunter"],
-            "F" : self._pieces["white falcon"],
-            "H" : self._pieces["white hunter"],
-        }
+        """Creates a board with all the pieces in their starting positions, by copying the starting board
+        (see _build_starting_board) rather than placing the 32 pieces one by one"""
+        self._copy_state(_STARTING_BOARD)
+
+    def _put_piece(self, letter:str, square:int):
+        """Places the piece with the letter on the (empty) square, and updates the occupancy bitboards"""
+        piece = _PIECE_OBJECTS[letter]
+        color = piece.get_color()
+        bit = 1 << square
+        self._squares[square] = piece
+        self._color_bitboards[color] |= bit
+        self._piece_bitboards[letter] |= bit
+        self._occupied |= bit
+        if letter in _MAJOR_PIECE_LETTERS:
+            self._major_pieces_in_play[color] += 1
+        elif letter in _FAIRY_RESERVE_BITS:
+            self._fairy_pieces_in_play[color] += 1
+
+    def _remove_piece(self, square:int):
+        """Removes whatever piece is on the square, and updates the occupancy bitboards
+        Returns the letter of the removed piece (None if the square was empty)"""
+        piece = self._squares[square]
+        letter = piece.get_letter()
+        if letter is None:
+            return None
+        color = piece.get_color()
+        mask = ~(1 << square)
+        self._squares[square] = _EMPTY_SQUARE
+        self._color_bitboards[color] &= mask
+        self._piece_bitboards[letter] &= mask
+        self._occupied &= mask
+        if letter in _MAJOR_PIECE_LETTERS:
+            self._major_pieces_in_play[color] -= 1
+        elif letter in _FAIRY_RESERVE_BITS:
+            self._fairy_pieces_in_play[color] -= 1
+        return letter
 
     def show_board(self):
         """Prints current board state to terminal"""
-        for row in self._board:
-            for square in row:
-                print(square.get_symbol(), end=" ")
+        for row in range(_BOARD_SIZE):
+            for column in range(_BOARD_SIZE):
+                print(self._squares[row * _BOARD_SIZE + column].get_symbol(), end=" ")
             print()
 
     def get_piece_object(self, piece_name):
-        """Returns the object with the provided name"""
+        """Returns the object with the provided name (see _PIECES_BY_NAME)"""
         return self._pieces[piece_name]
     
     def get_fairy_piece_object(self, fairy_piece_name):
         """Returns the fairy piece with the provided fairy name: white falcon 'F', white hunter 'H', black falcon 'f', black hunter 'h'"""
         return self._avail_fairy_pieces.get(fairy_piece_name)
 
+    def get_color_bitboard(self, color:str) -> int:
+        """Returns a 64-bit integer with a bit set for every square occupied by the given color"""
+        return self._color_bitboards[color]
+
+    def get_piece_bitboard(self, letter:str) -> int:
+        """Returns a 64-bit integer with a bit set for every square occupied by the given piece letter
+        (uppercase for white, lowercase for black, e.g. 'N' for white knights and 'f' for the black falcon)"""
+        return self._piece_bitboards[letter]
+
+    def get_occupied_bitboard(self) -> int:
+        """Returns a 64-bit integer with a bit set for every occupied square"""
+        return self._occupied
+
+    def get_unmoved_pawns(self) -> int:
+        """Returns a 64-bit integer with a bit set for every square holding a pawn that hasn't moved yet"""
+        return self._unmoved_pawns
+
+    def set_unmoved_pawns(self, unmoved_pawns:int):
+        """Restores the bitboard of pawns that haven't moved yet (see get_unmoved_pawns) when a move is taken back"""
+        self._unmoved_pawns = unmoved_pawns
+
+    def get_fairy_reserve(self) -> int:
+        """Returns the off-board fairy reserve as a bitmask (see _FAIRY_RESERVE_BITS)"""
+        return self._fairy_reserve
+
     def get_max_index(self):
         """Returns the max index of the board (assumes that board is square with equal number of rows and columns"""
-        return len(self._board) - 1
+        return _BOARD_SIZE - 1
     
     def get_piece_at_coord(self, column:int, row: int):
         """Returns the object at the given column and row indices"""
-        return self._board[row][column]
+        return self._squares[row * _BOARD_SIZE + column]
+
+    def get_piece_at_square(self, square:int):
+        """Returns the object at the given square index (row * 8 + column)"""
+        return self._squares[square]
     
     def is_piece_in_play(self, piece_name) -> bool:
-        """Returns whether the piece corresponding to the inputted piece name appears on the board"""
-        for row in self._board:
-            if self._pieces[piece_name] in row:
-                return True
-        return False
+        """Returns whether a piece of the named piece's type and color appears on the board
+        Pieces of the same type and color aren't told apart, so e.g. 'white pawn a' stands for any white pawn"""
+        return self._piece_bitboards[self._pieces[piece_name].get_letter()] != 0
+
+    def get_piece_coord(self, piece_name):
+        """Returns the (column, row) of a piece of the named piece's type and color, or None if there's none on the
+        board. Where there are several (e.g. pawns), returns the first one from a8 to h1"""
+        pieces = self._piece_bitboards[self._pieces[piece_name].get_letter()]
+        if not pieces:
+            return None
+        return _SQUARE_COORDS[(pieces & -pieces).bit_length() - 1]
+
+    def get_piece_name_at_coord(self, column:int, row:int):
+        """Returns the name of the type and color of the piece at the given column and row indices (e.g. 'white pawn'
+        or 'black king', see _PIECE_TYPE_NAMES), or None if the square is empty"""
+        return _PIECE_TYPE_NAMES.get(self._squares[row * _BOARD_SIZE + column].get_letter())
+
+    def get_king_coord(self, color:str):
+        """Returns the (column, row) of the king of the given color, or None if it has been captured"""
+        return self.get_piece_coord(color + " king")
     
     def move_piece(self, origin_column:int, origin_row:int, destination_column:int, destination_row: int):
-        """Moves Piece from origin square to destination square"""
-        self._board[destination_row][destination_column] = self._board[origin_row][origin_column]
-        self._board[origin_row][origin_column] = self._pieces["empty"]
+        """Moves Piece from origin square to destination square. A pawn that moves (or is captured) is no longer unmoved
+        Returns the letter of the captured piece (None if the destination was empty)"""
+        origin = origin_row * _BOARD_SIZE + origin_column
+        destination = destination_row * _BOARD_SIZE + destination_column
+        self._unmoved_pawns &= ~((1 << origin) | (1 << destination))
+        letter = self._remove_piece(origin)
+        captured_letter = self._remove_piece(destination)
+        if letter is not None:
+            self._put_piece(letter, destination)
+        return captured_letter
+
+    def undo_move_piece(self, origin_column:int, origin_row:int, destination_column:int, destination_row: int, captured_letter):
+        """Takes back move_piece: moves the Piece from the destination square back to the origin square
+        and puts the captured piece (if any) back on the destination square
+        The unmoved pawns are restored separately, with set_unmoved_pawns"""
+        destination = destination_row * _BOARD_SIZE + destination_column
+        letter = self._remove_piece(destination)
+        if letter is not None:
+            self._put_piece(letter, origin_row * _BOARD_SIZE + origin_column)
+        if captured_letter is not None:
+            self._put_piece(captured_letter, destination)
 
     def is_on_board(self, column:int, row: int) -> bool:
         """Returns whether the inputted coordinates are within the bounds of the chess board"""
@@ -111,73 +397,164 @@ class Board:
     
     def is_empty(self, column:int, row: int) -> bool:
         """Returns whether the square is empty"""
-        return self._board[row][column] == self._pieces["empty"]
+        return not (self._occupied >> (row * _BOARD_SIZE + column)) & 1
     
     def count_major_pieces(self, color:str) -> int:
         """Counts the number of rooks, knights, bishops, and queen the color has in play"""
-        major_pieces_in_play = 0
-        black_major_pieces = [
-            "black rook a",
-            "black knight b",
-            "black bishop c",
-            "black queen",
-            'black bishop f',
-            "black knight g",
-            "black rook h"
-        ]
-        white_major_pieces = [
-            "white rook a",
-            "white knight b",
-            "white bishop c",
-            "white queen",
-            "white bishop f",
-            "white knight g",
-            "white rook h",
-        ]
-        if color == "black":
-            for piece in black_major_pieces:
-                if self.is_piece_in_play(piece):
-                    major_pieces_in_play += 1
-        else:
-            for piece in white_major_pieces:
-                if self.is_piece_in_play(piece):
-                    major_pieces_in_play += 1
-
-        return major_pieces_in_play
+        return self._major_pieces_in_play[color]
     
     def count_fairy_pieces(self, color:str) -> int:
         """Counts the number of fairy pieces the color has in play"""
-        fairy_pieces_in_play = 0
-        black_fairy_pieces = [
-            "black falcon",
-            "black hunter",
-        ]
-        white_fairy_pieces = [
-            "white falcon",
-            "white hunter",
-        ]
-        if color == "black":
-            for piece in black_fairy_pieces:
-                if self.is_piece_in_play(piece):
-                    fairy_pieces_in_play += 1
-        else:
-            for piece in white_fairy_pieces:
-                if self.is_piece_in_play(piece):
-                    fairy_pieces_in_play += 1
+        return self._fairy_pieces_in_play[color]
 
-        return fairy_pieces_in_play
+    def can_enter_fairy(self, color:str) -> bool:
+        """Returns whether the color has a fairy piece in reserve and has lost enough major pieces to enter it:
+        one lost major piece allows one fairy piece in play, two or more allow both"""
+        if not self._fairy_reserve & _FAIRY_RESERVE_COLOR_BITS[color]:
+            return False
+        major_pieces = self._major_pieces_in_play[color]
+        fairy_pieces = self._fairy_pieces_in_play[color]
+        if major_pieces == 7:
+            return False
+        if major_pieces == 6 and fairy_pieces == 1:
+            return False
+        if major_pieces < 6 and fairy_pieces == 2:
+            return False
+        return True
     
     def place_fairy_piece(self, fairy_piece_name, destination_column:int, destination_row:int):
         """Removes the placed fairy piece from the list of available fairy pieces and places fairy piece at the destination"""
-        object = self._avail_fairy_pieces[fairy_piece_name]
-        self._board[destination_row][destination_column] = object
+        destination = destination_row * _BOARD_SIZE + destination_column
+        self._remove_piece(destination)
+        self._put_piece(fairy_piece_name, destination)
         del self._avail_fairy_pieces[fairy_piece_name]
+        self._fairy_reserve &= ~_FAIRY_RESERVE_BITS[fairy_piece_name]
+
+    def remove_fairy_piece(self, fairy_piece_name, destination_column:int, destination_row:int):
+        """Takes back place_fairy_piece: removes the fairy piece from the board and returns it to the available fairy pieces"""
+        self._remove_piece(destination_row * _BOARD_SIZE + destination_column)
+        self._avail_fairy_pieces[fairy_piece_name] = _PIECE_OBJECTS[fairy_piece_name]
+        self._fairy_reserve |= _FAIRY_RESERVE_BITS[fairy_piece_name]
+
+    def _copy_state(self, board):
+        """Makes this board an independent copy of the other board. The pieces are shared, so only the flat
+        per-square lists and the small dicts of bitboards and counts are copied"""
+        self._pieces = board._pieces
+        self._squares = board._squares.copy()
+        self._color_bitboards = board._color_bitboards.copy()
+        self._piece_bitboards = board._piece_bitboards.copy()
+        self._occupied = board._occupied
+        self._major_pieces_in_play = board._major_pieces_in_play.copy()
+        self._fairy_pieces_in_play = board._fairy_pieces_in_play.copy()
+        self._unmoved_pawns = board._unmoved_pawns
+        self._avail_fairy_pieces = board._avail_fairy_pieces.copy()
+        self._fairy_reserve = board._fairy_reserve
+
+    def clone(self):
+        """Returns an independent copy of the board (see _copy_state)"""
+        board = type(self).__new__(type(self))
+        board._copy_state(self)
+        return board
+
+    def get_placement(self) -> str:
+        """Returns the pieces on the board as eight ranks of piece letters separated by '/', top row first,
+        with a digit for each run of empty squares (e.g. 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR')"""
+        ranks = []
+        for row in range(_BOARD_SIZE):
+            rank = ""
+            empty_run = 0
+            for square in range(row * _BOARD_SIZE, (row + 1) * _BOARD_SIZE):
+                letter = self._squares[square].get_letter()
+                if letter is None:
+                    empty_run += 1
+                    continue
+                if empty_run:
+                    rank += str(empty_run)
+                    empty_run = 0
+                rank += letter
+            if empty_run:
+                rank += str(empty_run)
+            ranks.append(rank)
+        return "/".join(ranks)
 
+    def set_position(self, letters, reserve:str, moved_pawn_squares):
+        """Replaces every piece on the board with the piece letters (one per square index, None for an empty square),
+        the fairy pieces in reserve with the letters in reserve (e.g. 'Hf'), and marks the pawns on moved_pawn_squares
+        as having moved
+        Raises ValueError if the position can't be set up with this board's pieces (see _MAX_PIECES_PER_LETTER)"""
+        for letter in reserve:
+            if letter not in _FAIRY_RESERVE_BITS or reserve.count(letter) > 1:
+                raise ValueError("invalid fairy reserve " + repr(reserve))
+            if letter in letters:
+                raise ValueError("fairy piece " + letter + " can't be both in reserve and on the board")
+
+        for letter in _PIECE_LETTERS:
+            if letters.count(letter) > _MAX_PIECES_PER_LETTER[letter]:
+                raise ValueError("too many " + repr(letter) + " pieces in placement")
+        for square in moved_pawn_squares:
+            if letters[square] not in ("P", "p"):
+                raise ValueError("no pawn on moved pawn square " + _SQUARE_NAMES[square])
+
+        # The position is valid, so clear the board and set it up
+        for square in range(_NUM_SQUARES):
+            self._remove_piece(square)
+        for square, letter in enumerate(letters):
+            if letter is not None:
+                self._put_piece(letter, square)
+        self._unmoved_pawns = self._piece_bitboards["P"] | self._piece_bitboards["p"]
+        for square in moved_pawn_squares:
+            self._unmoved_pawns &= ~(1 << square)
+        self._avail_fairy_pieces = {letter: _PIECE_OBJECTS[letter] for letter in reserve}
+        self._fairy_reserve = 0
+        for letter in reserve:
+            self._fairy_reserve |= _FAIRY_RESERVE_BITS[letter]
+
+    def generate_moves(self, color:str) -> list:
+        """Returns a list of packed ints (see encode_move and encode_drop) for every valid move of the color's pieces,
+        followed by every valid fairy piece entry. Doesn't know whose turn it is or whether the game is over"""
+        moves = []
+        pieces_left = self._color_bitboards[color]
+        while pieces_left:
+            lowest_bit = pieces_left & -pieces_left
+            origin_square = lowest_bit.bit_length() - 1
+            pieces_left ^= lowest_bit
+            for destination_square in self._squares[origin_square].get_destination_squares(origin_square, self):
+                moves.append(origin_square | (destination_square << 6))
+
+        if self.can_enter_fairy(color):
+            empty_home_squares = _HOME_RANKS_BITBOARD[color] & ~self._occupied
+            for fairy_piece_name in _FAIRY_RESERVE_COLOR_LETTERS[color]:
+                if self._fairy_reserve & _FAIRY_RESERVE_BITS[fairy_piece_name]:
+                    drop = _MOVE_DROP_FLAG | _FAIRY_LETTERS.index(fairy_piece_name)
+                    squares_left = empty_home_squares
+                    while squares_left:
+                        lowest_bit = squares_left & -squares_left
+                        squares_left ^= lowest_bit
+                        moves.append(drop | ((lowest_bit.bit_length() - 1) << 6))
+        return moves
+
+
+def _set_once(piece, name:str, value):
+    """Sets an attribute of a piece or empty square while it's being created
+    They're shared by every board, so their attributes can't be changed afterwards: raises AttributeError if it's set"""
+    if hasattr(piece, name):
+        raise AttributeError(type(piece).__name__ + " objects are shared and can't be changed: " + name)
+    object.__setattr__(piece, name, value)
+
+def _no_delete(piece, name:str):
+    """Raises AttributeError: the attributes of shared pieces and empty squares can't be deleted"""
+    raise AttributeError(type(piece).__name__ + " objects are shared and can't be changed: " + name)
 
 class EmptySquare:
-    """Represents an empty square on the board"""
+    """Represents an empty square on the board
+    One shared object stands for every empty square (see _EMPTY_SQUARE), so its attributes can't be changed"""
+    __slots__ = ("_color", "_letter")
+    __setattr__ = _set_once
+    __delattr__ = _no_delete
+
     def __init__(self) -> None:
         self._color = None
+        self._letter = None
 
     def get_symbol(self) -> str:
         """Returns the symbol used to print the board graphic"""
@@ -187,19 +564,60 @@ class EmptySquare:
         """Returns the color of the empty square (aka none)"""
         return self._color
 
+    def get_letter(self):
+        """Returns the letter of the empty square (aka none)"""
+        return self._letter
+
+    def __reduce__(self):
+        """Pickles the empty square by reference, so unpickling gives back the shared object (see _shared_piece)"""
+        return _shared_piece, (None,)
+
+    def __copy__(self):
+        """Returns the empty square itself, since it's shared and can't be changed"""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Returns the empty square itself, since it's shared and can't be changed"""
+        return self
+
 class Piece:
-    """Represents a chess piece"""
-    def __init__(self, color:str) -> None:
-        self._color = color  
+    """Represents a chess piece
+    Pieces hold no per-game state, so one object per piece type and color is shared by every board (see _PIECE_OBJECTS).
+    Anything that changes during a game, like whether a pawn has moved, is kept by the Board, and a piece's attributes
+    are set once when it's created and can't be changed afterwards"""
+    __slots__ = ("_color", "_letter")
+    __setattr__ = _set_once
+    __delattr__ = _no_delete
+
+    def __init__(self, color:str, letter:str = None) -> None:
+        """Creates a piece of the given color. The letter names the piece type in uppercase ('P', 'N', 'B', 'R', 'Q',
+        'K', 'F', 'H') and is stored uppercase for white and lowercase for black"""
+        self._color = color
+        if letter is not None and color == "black":
+            letter = letter.lower()
+        self._letter = letter
 
     def get_color(self):
         """Returns piece color"""
         return self._color
-    
-    def on_move(self):
-        """Implements any side effects after a piece's valid move"""
-        pass
 
+    def get_letter(self):
+        """Returns the letter for the piece's type and color (uppercase for white, lowercase for black)"""
+        return self._letter
+
+    def __reduce__(self):
+        """Pickles the piece as its letter, so unpickling gives back the shared piece (see _shared_piece) instead of a
+        copy carrying its own copies of the move tables"""
+        return _shared_piece, (self._letter,)
+
+    def __copy__(self):
+        """Returns the piece itself, since it's shared and can't be changed"""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Returns the piece itself, since it's shared and can't be changed"""
+        return self
+    
     def get_symbol(self):
         """Returns the symbol used when printing the board graphic"""
         pass
@@ -219,18 +637,25 @@ class Piece:
     
     def get_valid_destinations(self, origin_column:int, origin_row:int, board):
         """Returns a list of tuples, where each tuple is a valid coordinate for a destination square"""
+        return [_SQUARE_COORDS[square] for square in self.get_destination_squares(origin_row * _BOARD_SIZE + origin_column, board)]
+
+    def get_destination_squares(self, origin_square:int, board) -> list:
+        """Returns a list of square indices (row * 8 + column) that are valid destinations from the origin square"""
         pass
 
+    def is_valid_destination(self, origin_column:int, origin_row:int, destination_column:int, destination_row:int, board) -> bool:
+        """Returns whether the piece can move from the origin square to the destination square"""
+        return (destination_column, destination_row) in self.get_valid_destinations(origin_column, origin_row, board)
+
 class Pawn(Piece):
     """Represents a pawn chess piece
     Inherits from Piece"""
+    __slots__ = ("_pushes", "_captures")
+
     def __init__(self, color: str) -> None:
-        super().__init__(color)
-        self._moves_made = 0
-    
-    def on_move(self):
-        """Increment's the piece's moves by 1"""
-        self._moves_made += 1
+        super().__init__(color, "P")
+        self._pushes = _PAWN_PUSHES[self._letter]
+        self._captures = _PAWN_CAPTURES[self._letter]
 
     def get_symbol(self) -> str:
         """Returns the piece's unicode"""
@@ -239,37 +664,93 @@ class Pawn(Piece):
         else:
             return '\u2659'
         
-    def get_valid_destinations(self, origin_column:int, origin_row:int, board):
-        """Returns a list of tuples, where each tuple is a valid coordinate for a destination square"""
-        valid_destinations = []        
-        # Check Pawn moving forward 1 square
-        trial_column_forward1, trial_row_forward1 = self.move(origin_column, origin_row, 1, 0)
-        # The move is valid if the move doesn't take it off the board, and the spot is empty
-        if board.is_on_board(trial_column_forward1, trial_row_forward1) and board.is_empty(trial_column_forward1, trial_row_forward1):
-            valid_destinations.append( (trial_column_forward1, trial_row_forward1) )
-            # if Pawn is not blocked and it's on its starting rank it has the option of moving two squares in one turn
-            trial_column, trial_row = self.move(origin_column, origin_row, 2, 0)
-            # The move is valid if the Pawn hasn't moved yet, the move doesn't take it off the board, and the spot is empty
-            if self._moves_made == 0 and board.is_on_board(trial_column, trial_row) and board.is_empty(trial_column, trial_row):
-                valid_destinations.append( (trial_column, trial_row) )
-        
-        # Check if there are any pieces to capture diagonally
-        trial_column_diagleft, trial_row_diagleft = self.move(trial_column_forward1, trial_row_forward1, 0, -1)
-        # The move is valid if the move is on the board and the spot is occupied by the opposite color
-        if board.is_on_board(trial_column_diagleft, trial_row_diagleft) and board.get_piece_at_coord(trial_column_diagleft, trial_row_diagleft).get_color() != self._color and not board.is_empty(trial_column_diagleft, trial_row_diagleft):
-            valid_destinations.append( (trial_column_diagleft, trial_row_diagleft) )
-        # Similarly for the other diagonal direction
-        trial_column_diagright, trial_row_diagright = self.move(trial_column_forward1, trial_row_forward1, 0, 1)
-        if board.is_on_board(trial_column_diagright, trial_row_diagright) and board.get_piece_at_coord(trial_column_diagright, trial_row_diagright).get_color() != self._color and not board.is_empty(trial_column_diagright, trial_row_diagright):
-            valid_destinations.append( (trial_column_diagright, trial_row_diagright) )
+    def get_destination_squares(self, origin_square:int, board) -> list:
+        """Returns a list of square indices (row * 8 + column) that are valid destinations from the origin square"""
+        valid_destinations = []
+        occupied = board.get_occupied_bitboard()
+        pushes = self._pushes[origin_square]
+        # The Pawn can move forward 1 square if the spot is empty, and 2 squares if it hasn't moved yet and both spots are empty
+        if pushes and not (occupied >> pushes[0]) & 1:
+            valid_destinations.append(pushes[0])
+            if len(pushes) == 2 and (board.get_unmoved_pawns() >> origin_square) & 1 and not (occupied >> pushes[1]) & 1:
+                valid_destinations.append(pushes[1])
+
+        # Check if there are any pieces of the opposite color to capture diagonally
+        opponent = board.get_color_bitboard(_OPPONENT[self._color])
+        for square in self._captures[origin_square]:
+            if (opponent >> square) & 1:
+                valid_destinations.append(square)
 
         return valid_destinations
 
-class Knight(Piece):
-    """Represents a knight chess piece
+    def is_valid_destination(self, origin_column:int, origin_row:int, destination_column:int, destination_row:int, board) -> bool:
+        """Returns whether the piece can move from the origin square to the destination square"""
+        origin = origin_row * _BOARD_SIZE + origin_column
+        destination = destination_row * _BOARD_SIZE + destination_column
+        pushes = self._pushes[origin]
+        occupied = board.get_occupied_bitboard()
+        if pushes and destination == pushes[0]:
+            return not (occupied >> destination) & 1
+        if len(pushes) == 2 and destination == pushes[1]:
+            return bool((board.get_unmoved_pawns() >> origin) & 1) and not (occupied >> pushes[0]) & 1 and not (occupied >> destination) & 1
+        if destination in self._captures[origin]:
+            return bool((board.get_color_bitboard(_OPPONENT[self._color]) >> destination) & 1)
+        return False
+
+class LeaperPiece(Piece):
+    """Represents a piece that jumps straight to its destinations (knight and king), using the precomputed target
+    squares for its letter
+    Inherits from Piece"""
+    __slots__ = ("_targets", "_target_masks")
+
+    def __init__(self, color:str, letter:str) -> None:
+        super().__init__(color, letter)
+        self._targets = _LEAPER_TARGETS[self._letter]
+        self._target_masks = _LEAPER_MASKS[self._letter]
+
+    def get_destination_squares(self, origin_square:int, board) -> list:
+        """Returns a list of square indices (row * 8 + column) that are valid destinations from the origin square"""
+        own = board.get_color_bitboard(self._color)
+        return [square for square in self._targets[origin_square] if not (own >> square) & 1]
+
+    def is_valid_destination(self, origin_column:int, origin_row:int, destination_column:int, destination_row:int, board) -> bool:
+        """Returns whether the piece can move from the origin square to the destination square"""
+        destination = destination_row * _BOARD_SIZE + destination_column
+        if not (self._target_masks[origin_row * _BOARD_SIZE + origin_column] >> destination) & 1:
+            return False
+        return not (board.get_color_bitboard(self._color) >> destination) & 1
+
+class SliderPiece(Piece):
+    """Represents a piece that moves along rays until it's blocked (bishop, rook, queen, falcon and hunter), using the
+    precomputed rays for its letter
     Inherits from Piece"""
+    __slots__ = ("_rays", "_between")
+
+    def __init__(self, color:str, letter:str) -> None:
+        super().__init__(color, letter)
+        self._rays = _SLIDER_RAYS[self._letter]
+        self._between = _SLIDER_BETWEEN[self._letter]
+
+    def get_destination_squares(self, origin_square:int, board) -> list:
+        """Returns a list of square indices (row * 8 + column) that are valid destinations from the origin square"""
+        return _walk_rays(self._rays[origin_square], board.get_color_bitboard(self._color), board.get_color_bitboard(_OPPONENT[self._color]))
+
+    def is_valid_destination(self, origin_column:int, origin_row:int, destination_column:int, destination_row:int, board) -> bool:
+        """Returns whether the piece can move from the origin square to the destination square"""
+        destination = destination_row * _BOARD_SIZE + destination_column
+        # Only the ray towards the destination is checked: the squares in between have to be empty
+        between = self._between[origin_row * _BOARD_SIZE + origin_column].get(destination)
+        if between is None or board.get_occupied_bitboard() & between:
+            return False
+        return not (board.get_color_bitboard(self._color) >> destination) & 1
+
+class Knight(LeaperPiece):
+    """Represents a knight chess piece
+    Inherits from LeaperPiece"""
+    __slots__ = ()
+
     def __init__(self, color: str) -> None:
-        super().__init__(color)
+        super().__init__(color, "N")
 
     def get_symbol(self) -> str:
         """Returns the piece's unicode"""
@@ -277,70 +758,29 @@ class Knight(Piece):
             return '\u265E'
         else:
             return '\u2658'
-        
-    def get_valid_destinations(self, origin_column:int, origin_row:int, board):
-        """Returns a list of tuples, where each tuple is a valid coordinate for a destination square"""
-        valid_destinations = []
-        possible_moves = [
-            (2, -1),
-            (2, 1),
-            (-2, -1),
-            (-2, 1),
-            (1, -2),
-            (1, 2),
-            (-1, -2),
-            (-1, 2),
-        ]
-
-        for (row_offset, column_offset) in possible_moves:
-            trial_column, trial_row = self.move(origin_column, origin_row, row_offset, column_offset)
-            if board.is_on_board(trial_column, trial_row) and board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color:
-                valid_destinations.append( (trial_column, trial_row) )
-        
-        return valid_destinations
 
-class Bishop(Piece):
+class Bishop(SliderPiece):
     """Represents a bishop chess piece
-    Inherits from Piece"""
+    Inherits from SliderPiece"""
+    __slots__ = ()
+
     def __init__(self, color: str) -> None:
-        super().__init__(color)
-    
+        super().__init__(color, "B")
+
     def get_symbol(self) -> str:
         """Returns the piece's unicode"""
         if self.get_color() == "black":
             return '\u265D'
         else:
             return '\u2657'
-            
-    def get_valid_destinations(self, origin_column:int, origin_row:int, board):
-        """Returns a list of tuples, where each tuple is a valid coordinate for a destination square"""
-        valid_destinations = []
-        possible_moves = [
-            (1,1),
-            (1,-1),
-            (-1,-1),
-            (-1,1),
-        ]
-
-        for (row_offset, column_offset) in possible_moves:
-            column_counter = column_offset
-            row_counter = row_offset
-            trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
-            while board.is_on_board(trial_column, trial_row) and board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color:
-                valid_destinations.append( (trial_column, trial_row) )
-                if board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color and not board.is_empty(trial_column, trial_row):
-                    break
-                column_counter += column_offset
-                row_counter += row_offset
-                trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
-
-        return valid_destinations
 
-class Rook(Piece):
+class Rook(SliderPiece):
     """Represents a rook chess piece
-    Inherits from Piece"""
+    Inherits from SliderPiece"""
+    __slots__ = ()
+
     def __init__(self, color: str) -> None:
-        super().__init__(color)
+        super().__init__(color, "R")
 
     def get_symbol(self) -> str:
         """Returns the piece's unicode"""
@@ -348,78 +788,29 @@ class Rook(Piece):
             return '\u265C'
         else:
             return '\u2656'
-                
-    def get_valid_destinations(self, origin_column:int, origin_row:int, board):
-        """Returns a list of tuples, where each tuple is a valid coordinate for a destination square"""
-        valid_destinations = []
-        possible_moves = [
-            (0,1),
-            (0,-1),
-            (1,0),
-            (-1,0),
-        ]
-        
-        for (row_offset, column_offset) in possible_moves:
-            column_counter = column_offset
-            row_counter = row_offset
-            trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
-            while board.is_on_board(trial_column, trial_row) and board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color:
-                valid_destinations.append( (trial_column, trial_row) )
-                if board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color and not board.is_empty(trial_column, trial_row):
-                    break
-                column_counter += column_offset
-                row_counter += row_offset
-                trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
-
-        return valid_destinations
 
-
-class Queen(Piece):
+class Queen(SliderPiece):
     """Represents a queen chess piece
-    Inherits from Piece"""
+    Inherits from SliderPiece"""
+    __slots__ = ()
+
     def __init__(self, color: str) -> None:
-        super().__init__(color)
-    
+        super().__init__(color, "Q")
+
     def get_symbol(self) -> str:
         """Returns the piece's unicode"""
         if self.get_color() == "black":
             return '\u265B'
         else:
             return '\u2655'
-                
-    def get_valid_destinations(self, origin_column:int, origin_row:int, board):
-        """Returns a list of tuples, where each tuple is a valid coordinate for a destination square"""
-        valid_destinations = []
-        possible_moves = [
-            (0,1),
-            (0,-1),
-            (1,0),
-            (-1,0),
-            (1,1),
-            (1,-1),
-            (-1,-1),
-            (-1,1),
-        ]
-        
-        for (row_offset, column_offset) in possible_moves:
-            column_counter = column_offset
-            row_counter = row_offset
-            trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
-            while board.is_on_board(trial_column, trial_row) and board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color:
-                valid_destinations.append( (trial_column, trial_row) )
-                if board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color and not board.is_empty(trial_column, trial_row):
-                    break
-                column_counter += column_offset
-                row_counter += row_offset
-                trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
-
-        return valid_destinations
 
-class King(Piece):
+class King(LeaperPiece):
     """Represents a king chess piece
-    Inherits from Piece"""
+    Inherits from LeaperPiece"""
+    __slots__ = ()
+
     def __init__(self, color: str) -> None:
-        super().__init__(color)
+        super().__init__(color, "K")
 
     def get_symbol(self) -> str:
         """Returns the piece's unicode"""
@@ -427,34 +818,14 @@ class King(Piece):
             return '\u265A'
         else:
             return '\u2654'
-                
-    def get_valid_destinations(self, origin_column:int, origin_row:int, board):
-        """Returns a list of tuples, where each tuple is a valid coordinate for a destination square"""
-        valid_destinations = []
-        possible_moves = [
-            (0,1),
-            (0,-1),
-            (1,0),
-            (-1,0),
-            (1,1),
-            (1,-1),
-            (-1,-1),
-            (-1,1),
-        ]
-
-        for (row_offset, column_offset) in possible_moves:
-            trial_column, trial_row = self.move(origin_column, origin_row, row_offset, column_offset)
-            if board.is_on_board(trial_column, trial_row) and board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color:
-                valid_destinations.append( (trial_column, trial_row) )
-
-        return valid_destinations
-
 
-class Falcon(Piece):
+class Falcon(SliderPiece):
     """Represents a falcon chess piece
-    Inherits from Piece"""
+    Inherits from SliderPiece"""
+    __slots__ = ()
+
     def __init__(self, color: str) -> None:
-        super().__init__(color)
+        super().__init__(color, "F")
 
     def get_symbol(self) -> str:
         """Returns the piece's unicode"""
@@ -462,35 +833,14 @@ class Falcon(Piece):
             return '\u2666'
         else:
             return '\u2662'
-                
-    def get_valid_destinations(self, origin_column:int, origin_row:int, board):
-        """Returns a list of tuples, where each tuple is a valid coordinate for a destination square"""
-        valid_destinations = []
-        possible_moves = [
-            (1,1),
-            (1,-1),
-            (-1,0),
-        ]
-        
-        for (row_offset, column_offset) in possible_moves:
-            column_counter = column_offset
-            row_counter = row_offset
-            trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
-            while board.is_on_board(trial_column, trial_row) and board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color:
-                valid_destinations.append( (trial_column, trial_row) )
-                if board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color and not board.is_empty(trial_column, trial_row):
-                    break
-                column_counter += column_offset
-                row_counter += row_offset
-                trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
-
-        return valid_destinations
 
-class Hunter(Piece):
+class Hunter(SliderPiece):
     """Represents a hunter chess piece
-    Inherits from Piece"""
+    Inherits from SliderPiece"""
+    __slots__ = ()
+
     def __init__(self, color: str) -> None:
-        super().__init__(color)
+        super().__init__(color, "H")
 
     def get_symbol(self) -> str:
         """Returns the piece's unicode"""
@@ -498,29 +848,142 @@ class Hunter(Piece):
             return '\u2617'
         else:
             return '\u2616'
-                
-    def get_valid_destinations(self, origin_column:int, origin_row:int, board):
-        """Returns a list of tuples, where each tuple is a valid coordinate for a destination square"""
-        valid_destinations = []
-        possible_moves = [
-            (1,0),
-            (-1,-1),
-            (-1,1),
-        ]
-        
-        for (row_offset, column_offset) in possible_moves:
-            column_counter = column_offset
-            row_counter = row_offset
-            trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
-            while board.is_on_board(trial_column, trial_row) and board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color:
-                valid_destinations.append( (trial_column, trial_row) )
-                if board.get_piece_at_coord(trial_column, trial_row).get_color() != self._color and not board.is_empty(trial_column, trial_row):
-                    break
-                column_counter += column_offset
-                row_counter += row_offset
-                trial_column, trial_row = self.move(origin_column, origin_row, row_counter, column_counter)
 
-        return valid_destinations
+# One shared piece object per piece letter, and the object shared by every empty square
+_PIECE_OBJECTS = {
+    letter: piece_class(color)
+    for color, letters in (("white", "PNBRQKFH"), ("black", "pnbrqkfh"))
+    for letter, piece_class in zip(letters, (Pawn, Knight, Bishop, Rook, Queen, King, Falcon, Hunter))
+}
+_EMPTY_SQUARE = EmptySquare()
+
+def _shared_piece(letter):
+    """Returns the shared piece object for a piece letter, or the empty square object if the letter is None"""
+    if letter is None:
+        return _EMPTY_SQUARE
+    return _PIECE_OBJECTS[letter]
+
+def _build_piece_names() -> tuple:
+    """Returns a dict mapping the name of every piece in a game (e.g. 'black pawn a') and of every piece type and color
+    (e.g. 'black pawn') to its shared piece object, plus 'empty' for the empty square object; a dict mapping each
+    piece letter to the name of its type and color; and a dict with the most pieces of each letter a game can have"""
+    names = [("rook a", "R"), ("knight b", "N"), ("bishop c", "B"), ("queen", "Q"), ("king", "K"), ("bishop f", "B"), ("knight g", "N"), ("rook h", "R")]
+    names += [("pawn " + file, "P") for file in "abcdefgh"]
+    names += [("falcon", "F"), ("hunter", "H")]
+    pieces = {}
+    type_names = {}
+    max_per_letter = {letter: 0 for letter in _PIECE_LETTERS}
+    for color in ("black", "white"):
+        for name, letter in names:
+            if color == "black":
+                letter = letter.lower()
+            type_name = color + " " + name.split()[0]
+            pieces[color + " " + name] = _PIECE_OBJECTS[letter]
+            pieces[type_name] = _PIECE_OBJECTS[letter]
+            type_names[letter] = type_name
+            max_per_letter[letter] += 1
+    pieces["empty"] = _EMPTY_SQUARE
+    return pieces, type_names, max_per_letter
+
+_PIECES_BY_NAME, _PIECE_TYPE_NAMES, _MAX_PIECES_PER_LETTER = _build_piece_names()
+
+def _build_starting_board():
+    """Returns a board with all the pieces in their starting positions, placed one by one. Is built once, at import,
+    and copied by Board.__init__"""
+    board = Board.__new__(Board)
+    # Piece name -> shared piece object (see _PIECES_BY_NAME): the board itself only stores the piece on each square
+    board._pieces = _PIECES_BY_NAME
+
+    # Square index = row * 8 + column, so bit 0 is a8 and bit 63 is h1
+    board._squares = [_EMPTY_SQUARE] * _NUM_SQUARES
+    board._color_bitboards = {
+        "white": 0,
+        "black": 0,
+    }
+    board._piece_bitboards = {letter: 0 for letter in _PIECE_LETTERS}
+    board._occupied = 0
+    # Running counts of major pieces (rooks, knights, bishops, queen) and fairy pieces in play, per color
+    board._major_pieces_in_play = {
+        "white": 0,
+        "black": 0,
+    }
+    board._fairy_pieces_in_play = {
+        "white": 0,
+        "black": 0,
+    }
+    for square, letter in enumerate(_parse_placement("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR")):
+        if letter is not None:
+            board._put_piece(letter, square)
+
+    # Squares of the pawns that haven't moved yet (and can still move two squares)
+    board._unmoved_pawns = board._piece_bitboards["P"] | board._piece_bitboards["p"]
+
+    board._avail_fairy_pieces = {
+        "f" : board._pieces["black falcon"],
+        "h" : board._pieces["black hunter"],
+        "F" : board._pieces["white falcon"],
+        "H" : board._pieces["white hunter"],
+    }
+    # Off-board reserve as a bitmask, one bit per fairy piece letter
+    board._fairy_reserve = _FAIRY_RESERVE_BITS["F"] | _FAIRY_RESERVE_BITS["H"] | _FAIRY_RESERVE_BITS["f"] | _FAIRY_RESERVE_BITS["h"]
+    return board
+
+_STARTING_BOARD = _build_starting_board()
+
+def _hash_position(board, current_turn:str) -> int:
+    """Returns the Zobrist hash (see ChessVar.position_hash) of the position on the board with current_turn to move"""
+    position_hash = 0
+    for square in range(_NUM_SQUARES):
+        piece = board.get_piece_at_coord(*_SQUARE_COORDS[square])
+        if piece.get_letter() is not None:
+            position_hash ^= _ZOBRIST_PIECE_KEYS[piece.get_letter()][square]
+        if (board.get_unmoved_pawns() >> square) & 1:
+            position_hash ^= _ZOBRIST_UNMOVED_PAWN_KEYS[square]
+    for fairy_piece_name in _FAIRY_LETTERS:
+        if board.get_fairy_reserve() & _FAIRY_RESERVE_BITS[fairy_piece_name]:
+            position_hash ^= _ZOBRIST_RESERVE_KEYS[fairy_piece_name]
+    if current_turn == "black":
+        position_hash ^= _ZOBRIST_BLACK_TO_MOVE_KEY
+    return position_hash
+
+# Hash of the starting position with white to move, which every new game starts from
+_STARTING_POSITION_HASH = _hash_position(_STARTING_BOARD, "white")
+
+class DestinationCache:
+    """Represents a least-recently-used cache of the valid destinations of the piece on a square, keyed by
+    (position hash, square index). Since the key includes the position, a move never makes an entry wrong:
+    the new position just has different keys. Is used by ChessVar when enabled"""
+    def __init__(self, max_size:int) -> None:
+        """Creates an empty cache holding at most max_size entries"""
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key:tuple):
+        """Returns the cached destinations for the key and marks them as most recently used, or None if not cached"""
+        destinations = self._entries.get(key)
+        if destinations is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return destinations
+
+    def put(self, key:tuple, destinations:tuple):
+        """Caches the destinations for the key, dropping the least recently used entry if the cache is full"""
+        self._entries[key] = destinations
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        """Returns the number of hits and misses, and the current and maximum number of entries"""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": len(self._entries),
+            "max_size": self._max_size,
+        }
 
 class ChessVar:
     """Represents a game of chess to be played
@@ -532,28 +995,58 @@ class ChessVar:
         self._board = Board()
         self._turns = 0
         self._current_turn = "white"
-        self._column_to_index = {
-            "a" : 0,
-            "b" : 1,
-            "c" : 2,
-            "d" : 3,
-            "e" : 4,
-            "f" : 5,
-            "g" : 6,
-            "h" : 7, 
-        }
+        # One undo record per move made: (packed move, captured piece letter, previous unmoved pawns bitboard,
+        # previous game state, previous turn count, previous current turn, previous position hash)
+        self._undo_stack = []
+        # Whether the undo stack is shared with a clone (or the game it was cloned from), and must be copied before
+        # it's changed
+        self._undo_shared = False
+        self._hash = _STARTING_POSITION_HASH
+        self._search_stats = None
+        # Valid destinations cached by position and square (None unless enabled with enable_destination_cache)
+        self._destination_cache = None
 
     def get_game_state(self) -> str:
         """Returns the current game state ('UNFINISHED', 'WHITE_WON', 'BLACK_WON')"""
         return self._game_state
+
+    def get_current_turn(self) -> str:
+        """Returns the color whose turn it is ('white' or 'black')"""
+        return self._current_turn
+
+    def get_board(self):
+        """Returns the Board object holding the pieces"""
+        return self._board
+
+    def get_turn_count(self) -> int:
+        """Returns the number of turns played (moves and fairy piece entries)"""
+        return self._turns
+
+    def clone(self):
+        """Returns an independent copy of the game, including the moves that can be taken back with pop
+        Much cheaper than copy.deepcopy, since the pieces are shared and only the board's lists and small dicts are
+        copied. The undo stack is shared until either game makes or takes back a move, which copies it: that copy grows
+        with the number of moves played, but is only made once per clone"""
+        game = type(self).__new__(type(self))
+        game._game_state = self._game_state
+        game._board = self._board.clone()
+        game._turns = self._turns
+        game._current_turn = self._current_turn
+        game._undo_stack = self._undo_stack
+        game._undo_shared = self._undo_shared = True
+        game._hash = self._hash
+        game._search_stats = None
+        game._destination_cache = None
+        return game
     
     def _translate_string_to_index(self, input:str) -> tuple:
         """Takes a user input string in the format and converts it into column and row indices 
-        for the game board (e.g. 'g7' becomes (6,1) where (0,0) is the top left square of the board)"""
-        column, row = [*input]
-        column = self._column_to_index[column]
-        row = self._board.get_max_index() +1 - int(row)
-        return column, row
+        for the game board (e.g. 'g7' becomes (6,1) where (0,0) is the top left square of the board)
+        Returns None if the string isn't a square on the board (e.g. 'a10' or 'z1')"""
+        square = _SQUARE_INDEXES.get(input)
+        if square is None:
+            return None
+        return _SQUARE_COORDS[square]
     
     def _advance_turn(self):
         """Increments the current turn count and updates whose turn it is"""
@@ -576,53 +1069,63 @@ class ChessVar:
         return self._board.get_piece_at_coord(origin_column, origin_row).get_color() != self._current_turn
 
     def make_move(self, origin:str, destination:str) -> bool:
-        """Checks if move is valid. If not valid, returns False
+        """Checks if move is valid. If not valid (including squares that aren't on the board, e.g. 'a10'), returns False
         If yes, it makes the move, removes any captured piece, updates game state if necesssary, updates whose turn it is,
         then returns true."""
+        origin_square = _SQUARE_INDEXES.get(origin)
+        destination_square = _SQUARE_INDEXES.get(destination)
+        # If origin or destination is not a square of the board
+        if origin_square is None or destination_square is None:
+            return False
+        return self.make_move_idx(origin_square, destination_square)
+
+    def make_move_idx(self, origin_square:int, destination_square:int) -> bool:
+        """Same as make_move, with the squares given as indices (row * 8 + column, 0 to 63, where 0 is 'a8')
+        Returns False if either index is not an int from 0 to 63"""
         # If game is already won
         if self._game_state_is_finished():
             return False
-        
-        origin_column, origin_row = self._translate_string_to_index(origin)
-        destination_column, destination_row = self._translate_string_to_index(destination)
 
         # If origin or destination is outside of board
-        if self._origin_or_destination_are_invalid(origin_column, origin_row, destination_column, destination_row):
+        if not _is_square_index(origin_square) or not _is_square_index(destination_square):
             return False
+        origin_column, origin_row = _SQUARE_COORDS[origin_square]
+        destination_column, destination_row = _SQUARE_COORDS[destination_square]
+
         # If origin square is empty or it's not this piece's turn:
         if self._origin_piece_cant_move(origin_column, origin_row):
             return False
         
-        valid_destinations = self._board.get_piece_at_coord(origin_column, origin_row).get_valid_destinations(origin_column, origin_row, self._board)
-
-        destination_coord = (destination_column, destination_row)
-        if destination_coord not in valid_destinations:
+        # Only checks the one destination, instead of building the piece's whole list of valid destinations
+        if not self._board.get_piece_at_coord(origin_column, origin_row).is_valid_destination(origin_column, origin_row, destination_column, destination_row, self._board):
             return False
 
-        # Move is valid, so do any "on move" piece side effects and then move the piece
-        self._board.get_piece_at_coord(origin_column, origin_row).on_move()
-        self._board.move_piece(origin_column, origin_row, destination_column, destination_row)
-
-        # After move is made, checks if the kings are still in play. If not, updates game state
-        if not self._board.is_piece_in_play("white king"):
-            self._game_state = "BLACK_WON"
-        if not self._board.is_piece_in_play("black king"):
-            self._game_state = "WHITE_WON"
-
-        # If the move made was valid and the game is not over, prepare to advance turn
-        if self._game_state == "UNFINISHED":
-            self._advance_turn()
+        # Move is valid, so make it (piece side effects, capture, game state and turn are handled by push)
+        self.push(encode_move(origin_square, destination_square))
         return True
 
     def enter_fairy_piece(self, fairy_piece_name: str, destination: str) -> bool:
-        """Returns false if the fairy piece is not allowed to enter at this destination coordinate
+        """Returns false if the fairy piece is not allowed to enter at this destination coordinate (including squares
+        that aren't on the board, e.g. 'a10')
         Otherwise it places the fairy piece at the given location, update whose turn it is, and returns true"""
+        destination_square = _SQUARE_INDEXES.get(destination)
+        # If destination is not a square of the board
+        if destination_square is None:
+            return False
+        return self.enter_fairy_piece_idx(fairy_piece_name, destination_square)
+
+    def enter_fairy_piece_idx(self, fairy_piece_name:str, destination_square:int) -> bool:
+        """Same as enter_fairy_piece, with the destination given as a square index (row * 8 + column, 0 to 63)
+        Returns False if the index is not an int from 0 to 63"""
         # If game is already won
         if self._game_state_is_finished():
             return False
+
+        # If destination is outside of board
+        if not _is_square_index(destination_square):
+            return False
         
         fairy_piece = self._board.get_fairy_piece_object(fairy_piece_name)
-        destination_column, destination_row = self._translate_string_to_index(destination)
         
         # If the fairy piece name is invalid aka not F, H, f, or h or already in play:
         if fairy_piece is None:
@@ -632,30 +1135,290 @@ class ChessVar:
         if fairy_piece.get_color() != self._current_turn:
             return False
 
-        # Sets home row value based on piece color
-        if fairy_piece.get_color() == "black":
-            home_rows = [0,1]
-        else:
-            home_rows = [6,7]
-        
-        # If destination square is not in home rows, not on board, or not empty:
-        if destination_row not in home_rows or not self._board.is_on_board(destination_column, destination_row) or not self._board.is_empty(destination_column,destination_row):
+        # If destination square is not in the piece's home rows or not empty:
+        destination_column, destination_row = _SQUARE_COORDS[destination_square]
+        if not (_HOME_RANKS_BITBOARD[fairy_piece.get_color()] >> destination_square) & 1 or not self._board.is_empty(destination_column, destination_row):
             return False
 
-        # Checks if the number of major pieces and the number of fairy pieces on the board to see if it's valid to enter a fairy piece
-        if self._board.count_major_pieces(self._current_turn) == 7:
-            return False
-        if self._board.count_major_pieces(self._current_turn) == 6 and self._board.count_fairy_pieces(self._current_turn) == 1:
-            return False
-        if self._board.count_major_pieces(self._current_turn) < 6 and self._board.count_fairy_pieces(self._current_turn) == 2:
+        # Checks the running counts of major pieces and fairy pieces on the board to see if it's valid to enter a fairy piece
+        if not self._board.can_enter_fairy(self._current_turn):
             return False
 
         # If the move made was valid, remove fairy piece from available fairy places, place fairy piece at destination, and advance turn
-
-        self._board.place_fairy_piece(fairy_piece_name, destination_column, destination_row)
-        self._advance_turn()
+        self.push(encode_drop(fairy_piece_name, destination_square))
         return True
 
+    def make_packed_move(self, move:int) -> bool:
+        """Same as make_move or enter_fairy_piece (depending on the kind of move), with the move given as a packed int
+        (see encode_move and encode_drop). Returns False if the move is invalid or isn't a packed move"""
+        if not isinstance(move, int) or not 0 <= move <= (_MOVE_DROP_FLAG | 0xFFF):
+            return False
+        destination_square = (move >> 6) & 63
+        if move & _MOVE_DROP_FLAG:
+            if move & 63 >= len(_FAIRY_LETTERS):
+                return False
+            return self.enter_fairy_piece_idx(_FAIRY_LETTERS[move & 63], destination_square)
+        return self.make_move_idx(move & 63, destination_square)
+
+    def push(self, move:int):
+        """Makes a packed move (see legal_moves) and records how to take it back with pop
+        The move is NOT checked, so it must come from legal_moves for the current position"""
+        if self._undo_shared:
+            self._unshare_undo_stack()
+        board = self._board
+        destination = (move >> 6) & 63
+        destination_column, destination_row = _SQUARE_COORDS[destination]
+        if move & _MOVE_DROP_FLAG:
+            fairy_piece_name = _FAIRY_LETTERS[move & 63]
+            board.place_fairy_piece(fairy_piece_name, destination_column, destination_row)
+            self._undo_stack.append((move, None, None, self._game_state, self._turns, self._current_turn, self._hash))
+            # The fairy piece leaves the reserve and appears on the board, and the turn passes
+            self._hash ^= _ZOBRIST_RESERVE_KEYS[fairy_piece_name] ^ _ZOBRIST_PIECE_KEYS[fairy_piece_name][destination] ^ _ZOBRIST_BLACK_TO_MOVE_KEY
+            self._advance_turn()
+            return
+
+        # Move the piece (the board keeps track of which pawns have moved)
+        origin = move & 63
+        origin_column, origin_row = _SQUARE_COORDS[origin]
+        piece = board.get_piece_at_coord(origin_column, origin_row)
+        unmoved_pawns = board.get_unmoved_pawns()
+        captured_letter = board.move_piece(origin_column, origin_row, destination_column, destination_row)
+        self._undo_stack.append((move, captured_letter, unmoved_pawns, self._game_state, self._turns, self._current_turn, self._hash))
+
+        # Update the hash for the piece leaving the origin and landing on the destination, any captured piece,
+        # and any pawn losing its double step
+        piece_keys = _ZOBRIST_PIECE_KEYS[piece.get_letter()]
+        self._hash ^= piece_keys[origin] ^ piece_keys[destination]
+        if (unmoved_pawns >> origin) & 1:
+            self._hash ^= _ZOBRIST_UNMOVED_PAWN_KEYS[origin]
+        if captured_letter is not None:
+            self._hash ^= _ZOBRIST_PIECE_KEYS[captured_letter][destination]
+            if (unmoved_pawns >> destination) & 1:
+                self._hash ^= _ZOBRIST_UNMOVED_PAWN_KEYS[destination]
+
+        # After move is made, checks if the kings are still in play. If not, updates game state
+        if not board.is_piece_in_play("white king"):
+            self._game_state = "BLACK_WON"
+        if not board.is_piece_in_play("black king"):
+            self._game_state = "WHITE_WON"
+
+        # If the game is not over, advance turn
+        if self._game_state == "UNFINISHED":
+            self._hash ^= _ZOBRIST_BLACK_TO_MOVE_KEY
+            self._advance_turn()
+
+    def _unshare_undo_stack(self):
+        """Gives the game its own copy of an undo stack shared with a clone (see clone)"""
+        self._undo_stack = self._undo_stack.copy()
+        self._undo_shared = False
+
+    def pop(self) -> int:
+        """Takes back the last move made (by push, make_move or enter_fairy_piece) and returns it as a packed move
+        Raises IndexError if no moves have been made"""
+        if self._undo_shared:
+            self._unshare_undo_stack()
+        move, captured_letter, unmoved_pawns, game_state, turns, current_turn, position_hash = self._undo_stack.pop()
+        destination_column, destination_row = _SQUARE_COORDS[(move >> 6) & 63]
+        if move & _MOVE_DROP_FLAG:
+            self._board.remove_fairy_piece(_FAIRY_LETTERS[move & 63], destination_column, destination_row)
+        else:
+            origin_column, origin_row = _SQUARE_COORDS[move & 63]
+            self._board.undo_move_piece(origin_column, origin_row, destination_column, destination_row, captured_letter)
+            self._board.set_unmoved_pawns(unmoved_pawns)
+        self._game_state = game_state
+        self._turns = turns
+        self._current_turn = current_turn
+        self._hash = position_hash
+        return move
+
+    def best_move(self, depth:int = None, time_limit:float = None, processes:int = 1, searcher = None):
+        """Searches for the best move for the player whose turn it is and returns it as a packed move
+        (None if there are no moves). Searches up to depth plies and/or for time_limit seconds (see search.Searcher)
+        With more than one process, the root moves are split across a pool of worker processes (see search.ParallelSearcher)
+        that is started for this call and stopped afterwards, which takes time out of a time limit. To search every move
+        with the same pool, pass a long-lived search.ParallelSearcher (or Searcher) as searcher; processes is then ignored
+        Statistics about the search, including nodes per second, are available from get_search_stats afterwards"""
+        from search import Searcher, ParallelSearcher
+        if searcher is not None:
+            move = searcher.search(self, depth, time_limit)
+            self._search_stats = searcher.get_stats()
+            return move
+        if processes > 1:
+            with ParallelSearcher(processes) as searcher:
+                move = searcher.search(self, depth, time_limit)
+                self._search_stats = searcher.get_stats()
+            return move
+        searcher = Searcher()
+        move = searcher.search(self, depth, time_limit)
+        self._search_stats = searcher.get_stats()
+        return move
+
+    def get_search_stats(self):
+        """Returns statistics about the last best_move search (None if there hasn't been one)"""
+        return self._search_stats
+
+    def perft(self, depth:int) -> int:
+        """Returns the number of move sequences (board moves and fairy piece entries) of exactly depth plies from the
+        current position. A game that ends (a king is captured) before depth plies has no further moves
+        Raises ValueError if depth is negative"""
+        if depth < 0:
+            raise ValueError("perft depth must be at least 0, not " + str(depth))
+        if depth == 0:
+            return 1
+        moves = self.legal_moves()
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            self.push(move)
+            nodes += self.perft(depth - 1)
+            self.pop()
+        return nodes
+
+    def perft_divide(self, depth:int) -> dict:
+        """Returns a dict mapping each move from the current position (as in move_to_notation) to the perft count
+        of the position after it, which sum to perft(depth)
+        Raises ValueError if depth is less than 1"""
+        if depth < 1:
+            raise ValueError("perft_divide depth must be at least 1, not " + str(depth))
+        counts = {}
+        for move in self.legal_moves():
+            self.push(move)
+            counts[move_to_notation(move)] = self.perft(depth - 1)
+            self.pop()
+        return counts
+
+    def to_position(self) -> str:
+        """Returns the position as a single line of text that from_position can load, with five fields separated by
+        spaces: the pieces (see Board.get_placement, 'F'/'H' for falcons and hunters), whose turn it is ('w' or 'b'),
+        the turn count, the squares of pawns that have already moved (e.g. 'e4,d5'), and the fairy pieces in reserve
+        (e.g. 'FHfh'). An empty list of squares or reserve is written as '-'
+        e.g. the starting position is 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 0 - FHfh'"""
+        board = self._board
+        moved_pawn_squares = []
+        moved_pawns_left = (board.get_piece_bitboard("P") | board.get_piece_bitboard("p")) & ~board.get_unmoved_pawns()
+        while moved_pawns_left:
+            moved_pawn_squares.append(_SQUARE_NAMES[(moved_pawns_left & -moved_pawns_left).bit_length() - 1])
+            moved_pawns_left &= moved_pawns_left - 1
+        reserve = "".join(letter for letter in _FAIRY_LETTERS if board.get_fairy_reserve() & _FAIRY_RESERVE_BITS[letter])
+        return " ".join((
+            board.get_placement(),
+            "w" if self._current_turn == "white" else "b",
+            str(self._turns),
+            ",".join(moved_pawn_squares) or "-",
+            reserve or "-",
+        ))
+
+    @classmethod
+    def from_position(cls, position:str):
+        """Returns a new game set up at the position (as returned by to_position), without replaying any moves
+        The game is over if a king is missing. There are no moves to take back with pop
+        Raises ValueError if the position is malformed or impossible (e.g. two white kings)"""
+        fields = position.split()
+        if len(fields) != 5:
+            raise ValueError("position must have 5 fields: " + repr(position))
+        placement, side_to_move, turns, moved_pawns, reserve = fields
+        if side_to_move not in ("w", "b"):
+            raise ValueError("side to move must be 'w' or 'b', not " + repr(side_to_move))
+        if not turns.isdigit():
+            raise ValueError("turn count must be a non-negative integer, not " + repr(turns))
+        moved_pawn_squares = []
+        if moved_pawns != "-":
+            for square_name in moved_pawns.split(","):
+                if square_name not in _SQUARE_INDEXES:
+                    raise ValueError("invalid moved pawn square " + repr(square_name))
+                moved_pawn_squares.append(_SQUARE_INDEXES[square_name])
+        return cls._from_letters(
+            _parse_placement(placement),
+            "white" if side_to_move == "w" else "black",
+            int(turns),
+            moved_pawn_squares,
+            "" if reserve == "-" else reserve,
+        )
+
+    @classmethod
+    def _from_letters(cls, letters, current_turn:str, turns:int, moved_pawn_squares, reserve:str):
+        """Returns a new game set up with the piece letter on each square index (see Board.set_position), whose turn
+        it is, the turn count, the squares of pawns that have moved and the fairy pieces in reserve
+        Raises ValueError if the position is impossible"""
+        # White moves on even turn counts and black on odd ones (a finished game stays on the winner's turn)
+        if (current_turn == "black") != (turns % 2 == 1):
+            raise ValueError("side to move doesn't match the turn count " + str(turns))
+        game = cls()
+        board = game._board
+        board.set_position(letters, reserve, moved_pawn_squares)
+        white_king_in_play = board.is_piece_in_play("white king")
+        black_king_in_play = board.is_piece_in_play("black king")
+        if not white_king_in_play and not black_king_in_play:
+            raise ValueError("position must have at least one king")
+        if not white_king_in_play:
+            game._game_state = "BLACK_WON"
+        elif not black_king_in_play:
+            game._game_state = "WHITE_WON"
+        game._turns = turns
+        game._current_turn = current_turn
+        game._hash = game._compute_position_hash()
+        return game
+
+    def position_hash(self) -> int:
+        """Returns the 64-bit Zobrist hash of the position: piece placement, whose turn it is, the fairy pieces in reserve
+        and which pawns can still move two squares. Equal positions have equal hashes"""
+        return self._hash
+
+    def _compute_position_hash(self) -> int:
+        """Computes the Zobrist hash of the position from scratch (position_hash is kept up to date incrementally)"""
+        return _hash_position(self._board, self._current_turn)
+
+    def legal_moves(self) -> list:
+        """Returns a list of packed ints for every valid move and fairy piece entry of the player whose turn it is
+        (empty if the game is over). Use decode_move or move_to_notation to read them"""
+        if self._game_state_is_finished():
+            return []
+        return self._board.generate_moves(self._current_turn)
+
+    def get_valid_destinations(self, square:str) -> list:
+        """Returns the squares (e.g. ['e3', 'e4']) the piece on the square (e.g. 'e2') can move to, whoever's turn
+        it is. Returns an empty list if the square is empty or not on the board
+        Uses the destination cache if it's enabled"""
+        square_index = _SQUARE_INDEXES.get(square)
+        if square_index is None:
+            return []
+        cache = self._destination_cache
+        if cache is not None:
+            key = (self._hash, square_index)
+            destinations = cache.get(key)
+            if destinations is not None:
+                return list(destinations)
+        piece = self._board.get_piece_at_square(square_index)
+        destinations = ()
+        if piece.get_letter() is not None:
+            destinations = tuple(_SQUARE_NAMES[destination] for destination in piece.get_destination_squares(square_index, self._board))
+        if cache is not None:
+            cache.put(key, destinations)
+        return list(destinations)
+
+    def enable_destination_cache(self, max_size:int = 4096):
+        """Starts caching get_valid_destinations results, keeping at most max_size of the most recently used
+        (replaces any existing cache)"""
+        self._destination_cache = DestinationCache(max_size)
+
+    def disable_destination_cache(self):
+        """Stops caching get_valid_destinations results and drops the cache"""
+        self._destination_cache = None
+
+    def get_destination_cache_stats(self):
+        """Returns the destination cache's hits, misses, size and max_size (see DestinationCache.get_stats),
+        or None if the cache isn't enabled"""
+        if self._destination_cache is None:
+            return None
+        return self._destination_cache.get_stats()
+
+    def can_enter_fairy(self, color:str) -> bool:
+        """Returns whether the color is currently eligible to enter a fairy piece (ignoring whose turn it is)"""
+        if self._game_state_is_finished():
+            return False
+        return self._board.can_enter_fairy(color)
+
     def show_board(self):
         """Prints current board state to the terminal"""
         return self._board.show_board()
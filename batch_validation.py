@@ -0,0 +1,183 @@
+# Description: Checks a batch of moves against a batch of positions at once with NumPy array operations, for jobs that
+#               check millions of independent moves. Positions are the 48-byte records of position_encoding, viewed as a
+#               NumPy array with POSITION_DTYPE, and moves are packed moves (see ChessVar.encode_move and encode_drop).
+#               Needs NumPy, which the rest of the package doesn't
+
+import numpy as np
+
+from ChessVar import (
+    _FAIRY_RESERVE_BITS, _FAIRY_LETTERS, _HOME_RANKS_BITBOARD, _LEAPER_TARGETS, _MOVE_DROP_FLAG,
+    _NUM_SQUARES, _SLIDER_BETWEEN,
+)
+from position_encoding import (
+    RECORD_SIZE, _BLACK_TO_MOVE_FLAG, _LETTER_CODES, _NO_KING, _RESERVE_SHIFT, _SQUARE_LETTERS,
+)
+
+# The fields of a position_encoding record. The padding byte is a field too, so copies don't leave it uninitialized
+POSITION_DTYPE = np.dtype({
+    "names": ["squares", "white_king", "black_king", "flags", "turns", "moved_pawns", "padding"],
+    "formats": [("u1", 32), "u1", "u1", "u1", "<u4", "<u8", "u1"],
+    "offsets": [0, 32, 33, 34, 35, 39, 47],
+    "itemsize": RECORD_SIZE,
+})
+
+# Records hold 4-bit codes for every piece but the kings. Unpacked boards hold one code per square, with extra codes
+# for the kings
+_WHITE_KING_CODE = 16
+_BLACK_KING_CODE = 17
+_NUM_CODES = 18
+_CODE_LETTERS = _SQUARE_LETTERS[:15] + (None, "K", "k")
+
+def _build_code_tables():
+    """Returns arrays indexed by square code: the color (0 empty, 1 white, 2 black), whether it's a pawn, a major
+    piece (rook, knight, bishop, queen) or a fairy piece, and for the leapers and sliders whether each (origin,
+    destination) pair can be reached on an empty board and the bitboard of squares in between"""
+    colors = np.zeros(_NUM_CODES, np.uint8)
+    pawns = np.zeros(_NUM_CODES, bool)
+    majors = np.zeros(_NUM_CODES, bool)
+    fairies = np.zeros(_NUM_CODES, bool)
+    reachable = np.zeros((_NUM_CODES, _NUM_SQUARES, _NUM_SQUARES), bool)
+    between = np.zeros((_NUM_CODES, _NUM_SQUARES, _NUM_SQUARES), np.uint64)
+    for code, letter in enumerate(_CODE_LETTERS):
+        if letter is None:
+            continue
+        colors[code] = 1 if letter.isupper() else 2
+        pawns[code] = letter in "Pp"
+        majors[code] = letter in "NBRQnbrq"
+        fairies[code] = letter in _FAIRY_RESERVE_BITS
+        if letter in _LEAPER_TARGETS:
+            for origin, targets in enumerate(_LEAPER_TARGETS[letter]):
+                reachable[code, origin, list(targets)] = True
+        elif letter in _SLIDER_BETWEEN:
+            for origin, between_by_destination in enumerate(_SLIDER_BETWEEN[letter]):
+                for destination, mask in between_by_destination.items():
+                    reachable[code, origin, destination] = True
+                    between[code, origin, destination] = mask
+    return colors, pawns, majors, fairies, reachable, between
+
+_CODE_COLORS, _CODE_IS_PAWN, _CODE_IS_MAJOR, _CODE_IS_FAIRY, _REACHABLE, _BETWEEN = _build_code_tables()
+
+# Per fairy letter index (see _FAIRY_LETTERS): square code, color (1 white, 2 black), reserve bit and home ranks
+_DROP_CODES = np.array([_LETTER_CODES[letter] for letter in _FAIRY_LETTERS], np.uint8)
+_DROP_COLORS = np.array([1 if letter.isupper() else 2 for letter in _FAIRY_LETTERS], np.uint8)
+_DROP_RESERVE_BITS = np.array([_FAIRY_RESERVE_BITS[letter] for letter in _FAIRY_LETTERS], np.uint8)
+_DROP_HOME_RANKS = np.array([_HOME_RANKS_BITBOARD["white" if letter.isupper() else "black"] for letter in _FAIRY_LETTERS], np.uint64)
+
+def positions_from_buffer(buffer) -> np.ndarray:
+    """Returns an array of positions viewing a buffer of position_encoding records, without copying it"""
+    return np.frombuffer(buffer, dtype=POSITION_DTYPE)
+
+def _unpack_squares(positions:np.ndarray) -> np.ndarray:
+    """Returns an (N, 64) array of the square code on every square of every position, kings included"""
+    packed = positions["squares"]
+    codes = np.empty((len(positions), _NUM_SQUARES), np.uint8)
+    codes[:, 0::2] = packed & 0xF
+    codes[:, 1::2] = packed >> 4
+    rows = np.arange(len(positions))
+    for field, code in (("white_king", _WHITE_KING_CODE), ("black_king", _BLACK_KING_CODE)):
+        on_board = positions[field] != _NO_KING
+        codes[rows[on_board], positions[field][on_board]] = code
+    return codes
+
+def _to_bitboards(squares:np.ndarray) -> np.ndarray:
+    """Returns a 64-bit bitboard per row of an (N, 64) boolean array, with bit i set when column i is True"""
+    return np.packbits(squares, axis=1, bitorder="little").view("<u8")[:, 0]
+
+def _bit(bitboards:np.ndarray, squares:np.ndarray) -> np.ndarray:
+    """Returns whether the bit for each square is set in each bitboard"""
+    return ((bitboards >> squares.astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+def validate_moves(positions:np.ndarray, moves) -> tuple:
+    """Checks N packed moves against N positions (an array with POSITION_DTYPE, see positions_from_buffer), the i-th
+    move being made in the i-th position by the player whose turn it is
+    Returns (legal, new positions): a boolean array saying which moves are valid (as make_move and enter_fairy_piece
+    would decide), and a new array of positions with every valid move made. Positions with invalid moves are copied
+    unchanged. Slider moves are checked by testing the squares in between against each board's occupancy bitboard"""
+    positions = np.asarray(positions, dtype=POSITION_DTYPE)
+    moves = np.asarray(moves, dtype=np.int64)
+    count = len(positions)
+    rows = np.arange(count)
+    codes = _unpack_squares(positions)
+    colors = _CODE_COLORS[codes]
+    occupied = _to_bitboards(colors != 0)
+    flags = positions["flags"]
+    mover_colors = np.where(flags & _BLACK_TO_MOVE_FLAG, 2, 1).astype(np.uint8)
+    unfinished = (positions["white_king"] != _NO_KING) & (positions["black_king"] != _NO_KING)
+
+    # Ints with bits set above the drop flag, or negative ones, aren't packed moves, even if their low bits are
+    in_range = (moves >= 0) & (moves <= (_MOVE_DROP_FLAG | 0xFFF))
+    is_drop = (moves & _MOVE_DROP_FLAG) != 0
+    destinations = (moves >> 6) & 63
+    origins = np.where(is_drop, 0, moves & 63)
+    destination_codes = codes[rows, destinations]
+    destination_colors = colors[rows, destinations]
+
+    # Board moves: the piece must belong to the player to move and not land on its own piece
+    piece_codes = codes[rows, origins]
+    board_legal = in_range & (~is_drop) & unfinished & (colors[rows, origins] == mover_colors) & (destination_colors != mover_colors)
+    # Leapers and sliders: the destination must be reachable on an empty board with nothing in between
+    between = _BETWEEN[piece_codes, origins, destinations]
+    ray_legal = _REACHABLE[piece_codes, origins, destinations] & ((occupied & between) == 0)
+    # Pawns: one square forward onto an empty square, two from an unmoved pawn's square over an empty square,
+    # or one square diagonally forward onto an opponent's piece
+    forward = np.where(mover_colors == 1, -1, 1)
+    rows_moved = (destinations >> 3) - (origins >> 3)
+    columns_moved = (destinations & 7) - (origins & 7)
+    unmoved = ~_bit(positions["moved_pawns"], origins)
+    passed_square = np.clip(origins + 8 * forward, 0, _NUM_SQUARES - 1)
+    pawn_legal = (
+        ((columns_moved == 0) & (rows_moved == forward) & (destination_colors == 0))
+        | ((columns_moved == 0) & (rows_moved == 2 * forward) & unmoved & (destination_colors == 0) & ~_bit(occupied, passed_square))
+        | ((np.abs(columns_moved) == 1) & (rows_moved == forward) & (destination_colors != 0))
+    )
+    board_legal &= np.where(_CODE_IS_PAWN[piece_codes], pawn_legal, ray_legal)
+
+    # Fairy piece entries: the player's own fairy piece from the reserve, onto an empty square of their home ranks,
+    # once they have lost enough major pieces (see Board.can_enter_fairy)
+    fairy_indexes = np.where(is_drop, moves & 63, 0)
+    valid_fairy = fairy_indexes < len(_FAIRY_LETTERS)
+    fairy_indexes = np.where(valid_fairy, fairy_indexes, 0)
+    reserve = flags >> _RESERVE_SHIFT
+    own_pieces = colors == mover_colors[:, None]
+    major_pieces = (own_pieces & _CODE_IS_MAJOR[codes]).sum(axis=1)
+    fairy_pieces = (own_pieces & _CODE_IS_FAIRY[codes]).sum(axis=1)
+    eligible = ~((major_pieces == 7) | ((major_pieces == 6) & (fairy_pieces == 1)) | ((major_pieces < 6) & (fairy_pieces == 2)))
+    drop_legal = (
+        in_range & is_drop & valid_fairy & unfinished & eligible
+        & (_DROP_COLORS[fairy_indexes] == mover_colors)
+        & ((reserve & _DROP_RESERVE_BITS[fairy_indexes]) != 0)
+        & (destination_colors == 0)
+        & _bit(_DROP_HOME_RANKS[fairy_indexes], destinations)
+    )
+    legal = board_legal | drop_legal
+
+    # Make the valid moves on a copy of the positions
+    new_positions = positions.copy()
+    moved_rows = rows[board_legal]
+    new_codes = codes.copy()
+    new_codes[moved_rows, destinations[board_legal]] = piece_codes[board_legal]
+    new_codes[moved_rows, origins[board_legal]] = 0
+    dropped_rows = rows[drop_legal]
+    new_codes[dropped_rows, destinations[drop_legal]] = _DROP_CODES[fairy_indexes[drop_legal]]
+    new_positions["flags"][dropped_rows] &= ~(_DROP_RESERVE_BITS[fairy_indexes[drop_legal]] << _RESERVE_SHIFT).astype(np.uint8)
+
+    # A pawn that moves has moved, and whatever was on its origin and destination squares no longer counts
+    origin_bits = np.left_shift(np.uint64(1), origins.astype(np.uint64))
+    destination_bits = np.left_shift(np.uint64(1), destinations.astype(np.uint64))
+    moved_pawns = positions["moved_pawns"] & ~(origin_bits | destination_bits)
+    moved_pawns |= np.where(_CODE_IS_PAWN[piece_codes], destination_bits, np.uint64(0))
+    new_positions["moved_pawns"] = np.where(board_legal, moved_pawns, positions["moved_pawns"])
+
+    # Kings are stored as squares: a moved king gets its new square and a captured king is removed
+    for field, code in (("white_king", _WHITE_KING_CODE), ("black_king", _BLACK_KING_CODE)):
+        new_positions[field] = np.where(board_legal & (piece_codes == code), destinations, new_positions[field])
+        new_positions[field] = np.where(board_legal & (destination_codes == code), _NO_KING, new_positions[field])
+    king_captured = board_legal & ((destination_codes == _WHITE_KING_CODE) | (destination_codes == _BLACK_KING_CODE))
+    new_codes[new_codes >= _WHITE_KING_CODE] = 0
+    new_positions["squares"] = new_codes[:, 0::2] | (new_codes[:, 1::2] << 4)
+
+    # The turn passes unless the move captured a king and ended the game
+    turn_passes = legal & ~king_captured
+    new_positions["turns"] += turn_passes
+    new_positions["flags"] ^= turn_passes.astype(np.uint8) * _BLACK_TO_MOVE_FLAG
+    return legal, new_positions
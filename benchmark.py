@@ -0,0 +1,204 @@
+# Description: Benchmarks for the core ChessVar operations, to tell whether a change made them faster or slower.
+#               Times Board construction, each piece class's valid destinations, make_move and enter_fairy_piece,
+#               and full random game playouts, prints operations per second, and can write the results as JSON and
+#               compare them with an earlier run:
+#                   python benchmark.py --output results.json
+#                   python benchmark.py --compare results.json --threshold 0.1
+#               The run fails (exit status 1) if any benchmark is slower than the earlier run by more than the threshold
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from ChessVar import Board, ChessVar, _MOVE_DROP_FLAG, _SQUARE_INDEXES, _SQUARE_NAMES
+from self_play import play_random_moves
+
+_RESULTS_VERSION = 1
+_DEFAULT_MIN_TIME = 0.2
+_DEFAULT_ROUNDS = 3
+_DEFAULT_THRESHOLD = 0.1
+
+# Positions (see ChessVar.to_position) whose pieces are timed for the valid destination benchmarks: the start,
+# a crowded middlegame and an open endgame, with every piece class on the board in at least one of them
+_DESTINATION_POSITIONS = (
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 0 - FHfh",
+    "r1bqk2r/pppp1ppp/2n2h2/2f1p3/2F1P3/3H1N2/PPPP1PPP/RNBQK2R w 10 e5,e4 -",
+    "4k3/pp6/2h5/3r4/8/1B2Q1n1/5F1P/4K2R w 40 - fH",
+)
+
+# A position where white may enter both fairy pieces, for the enter_fairy_piece benchmark
+_FAIRY_POSITION = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/1NBQK1N1 w 0 - FHfh"
+
+_PLAYOUT_SEED = 162
+_PLAYOUT_GAMES = 8
+_MAX_PLAYOUT_PLIES = 400
+
+def _time_operations(run, operations:int, min_time:float, rounds:int) -> dict:
+    """Calls run (which does the given number of operations) repeatedly for at least min_time seconds per round,
+    and returns the best round as {'ops_per_sec': ..., 'operations': ..., 'seconds': ...}"""
+    best = None
+    for _ in range(rounds):
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time:
+            run()
+            calls += 1
+            elapsed = time.perf_counter() - start
+        result = {
+            "ops_per_sec": calls * operations / elapsed,
+            "operations": calls * operations,
+            "seconds": elapsed,
+        }
+        if best is None or result["ops_per_sec"] > best["ops_per_sec"]:
+            best = result
+    return best
+
+def _board_construction():
+    """Returns (run, operations) for building a Board"""
+    return Board, 1
+
+def _valid_destinations(piece_class_name:str):
+    """Returns (run, operations) for ChessVar.get_valid_destinations on every square holding a piece of the class,
+    in every destination position"""
+    targets = []
+    for position in _DESTINATION_POSITIONS:
+        game = ChessVar.from_position(position)
+        board = game.get_board()
+        squares = [name for square, name in enumerate(_SQUARE_NAMES) if type(board.get_piece_at_square(square)).__name__ == piece_class_name]
+        if squares:
+            targets.append((game, squares))
+    def run():
+        for game, squares in targets:
+            for square in squares:
+                game.get_valid_destinations(square)
+    return run, sum(len(squares) for _, squares in targets)
+
+def _make_move():
+    """Returns (run, operations) for replaying random games through make_move, one move per operation"""
+    rng = random.Random(_PLAYOUT_SEED)
+    games = []
+    for _ in range(_PLAYOUT_GAMES):
+        moves = play_random_moves(ChessVar(), rng, 60)
+        # Fairy piece entries can't be made with make_move, so each game stops before its first one
+        moves = moves[:next((index for index, move in enumerate(moves) if move & _MOVE_DROP_FLAG), len(moves))]
+        games.append([(_SQUARE_NAMES[move & 63], _SQUARE_NAMES[(move >> 6) & 63]) for move in moves])
+    def run():
+        for moves in games:
+            game = ChessVar()
+            for origin, destination in moves:
+                game.make_move(origin, destination)
+    return run, sum(len(moves) for moves in games)
+
+def _enter_fairy_piece():
+    """Returns (run, operations) for entering a fairy piece on each empty square of white's home ranks,
+    taking every entry back with pop"""
+    game = ChessVar.from_position(_FAIRY_POSITION)
+    squares = [name for name in _SQUARE_NAMES if name[1] in "12" and game.get_board().get_piece_at_square(_SQUARE_INDEXES[name]).get_letter() is None]
+    def run():
+        for square in squares:
+            game.enter_fairy_piece("F", square)
+            game.pop()
+    return run, len(squares)
+
+def _random_playouts():
+    """Returns (run, operations) for playing random games to the end from the starting position, one game per operation
+    Every run plays the same games, so runs can be compared"""
+    def run():
+        rng = random.Random(_PLAYOUT_SEED)
+        for _ in range(_PLAYOUT_GAMES):
+            play_random_moves(ChessVar(), rng, _MAX_PLAYOUT_PLIES)
+    return run, _PLAYOUT_GAMES
+
+def _build_benchmarks() -> dict:
+    """Returns benchmark name -> function returning (run, operations)"""
+    benchmarks = {"board_construction": _board_construction}
+    for piece_class_name in ("Pawn", "Knight", "Bishop", "Rook", "Queen", "King", "Falcon", "Hunter"):
+        benchmarks["valid_destinations." + piece_class_name] = lambda piece_class_name=piece_class_name: _valid_destinations(piece_class_name)
+    benchmarks["make_move"] = _make_move
+    benchmarks["enter_fairy_piece"] = _enter_fairy_piece
+    benchmarks["random_playouts"] = _random_playouts
+    return benchmarks
+
+_BENCHMARKS = _build_benchmarks()
+
+def get_benchmark_names() -> list:
+    """Returns the names of every benchmark"""
+    return list(_BENCHMARKS)
+
+def run_benchmarks(names = None, min_time:float = _DEFAULT_MIN_TIME, rounds:int = _DEFAULT_ROUNDS) -> dict:
+    """Runs the named benchmarks (all of them by default) and returns the results, as written to JSON:
+    {'version': ..., 'python': ..., 'results': {name: {'ops_per_sec': ..., 'operations': ..., 'seconds': ...}}}
+    Each benchmark runs for rounds rounds of at least min_time seconds, and the best round is kept
+    Raises KeyError for an unknown benchmark name"""
+    if names is None:
+        names = get_benchmark_names()
+    results = {}
+    for name in names:
+        run, operations = _BENCHMARKS[name]()
+        results[name] = _time_operations(run, operations, min_time, rounds)
+    return {
+        "version": _RESULTS_VERSION,
+        "python": platform.python_implementation() + " " + platform.python_version(),
+        "results": results,
+    }
+
+def compare_results(baseline:dict, current:dict, threshold:float = _DEFAULT_THRESHOLD) -> list:
+    """Returns (name, baseline ops/sec, current ops/sec) for every benchmark in both runs that is slower in the
+    current run by more than threshold (e.g. 0.1 for 10%)"""
+    regressions = []
+    for name, result in current["results"].items():
+        baseline_result = baseline["results"].get(name)
+        if baseline_result is None:
+            continue
+        if result["ops_per_sec"] < baseline_result["ops_per_sec"] * (1 - threshold):
+            regressions.append((name, baseline_result["ops_per_sec"], result["ops_per_sec"]))
+    return regressions
+
+def format_results(current:dict, baseline:dict = None) -> str:
+    """Returns a table of operations per second, with the change from the baseline run if there is one"""
+    lines = []
+    for name, result in current["results"].items():
+        line = "{:<28} {:>14,.0f} ops/sec".format(name, result["ops_per_sec"])
+        baseline_result = baseline["results"].get(name) if baseline is not None else None
+        if baseline_result is not None:
+            line += "  {:+7.1%}".format(result["ops_per_sec"] / baseline_result["ops_per_sec"] - 1)
+        lines.append(line)
+    return "\n".join(lines)
+
+def main(argv = None) -> int:
+    """Runs the benchmarks from the command line and returns the exit status: 1 if there are regressions, 0 otherwise"""
+    parser = argparse.ArgumentParser(description="Benchmarks for the core ChessVar operations")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (all by default): " + ", ".join(get_benchmark_names()))
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="compare with the JSON results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=_DEFAULT_THRESHOLD, help="slowdown that counts as a regression (default 0.1, i.e. 10%%)")
+    parser.add_argument("--min-time", type=float, default=_DEFAULT_MIN_TIME, help="minimum seconds per round (default 0.2)")
+    parser.add_argument("--rounds", type=int, default=_DEFAULT_ROUNDS, help="rounds per benchmark, the best is kept (default 3)")
+    arguments = parser.parse_args(argv)
+    unknown_names = [name for name in arguments.names if name not in _BENCHMARKS]
+    if unknown_names:
+        parser.error("unknown benchmark " + ", ".join(unknown_names))
+
+    baseline = None
+    if arguments.compare is not None:
+        with open(arguments.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    current = run_benchmarks(arguments.names or None, arguments.min_time, arguments.rounds)
+    print(format_results(current, baseline))
+    if arguments.output is not None:
+        with open(arguments.output, "w") as output_file:
+            json.dump(current, output_file, indent=2)
+
+    if baseline is None:
+        return 0
+    regressions = compare_results(baseline, current, arguments.threshold)
+    for name, baseline_ops, current_ops in regressions:
+        print("REGRESSION {}: {:,.0f} -> {:,.0f} ops/sec".format(name, baseline_ops, current_ops))
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
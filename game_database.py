@@ -0,0 +1,309 @@
+# Description: An on-disk database of ChessVar games that is opened with mmap, so single games and index lookups
+#               are read straight from the file without loading it into memory. Each game is stored as a run of
+#               2-byte packed moves (see ChessVar.encode_move and encode_drop), with an index of where each game
+#               starts, an index of the positions each game reaches and an index of games sorted by their opening moves
+
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+
+from ChessVar import ChessVar, move_to_notation, _STARTING_POSITION_HASH
+
+# File layout: the header, then the moves of every game, padding to a multiple of 8 bytes, then the indexes.
+# Header: magic, version, opening plies indexed, number of games, number of moves, number of position index entries
+_HEADER = struct.Struct("<4sHHQQQ")
+_MAGIC = b"CVGD"
+_VERSION = 1
+
+# Array type codes: moves, game offsets and position hashes, and game numbers
+_MOVE_TYPE = "H"
+_OFFSET_TYPE = "Q"
+_GAME_TYPE = "I"
+
+_DEFAULT_OPENING_PLIES = 12
+
+# Index entries are sorted as fixed-width big-endian records, so sorting the bytes sorts the values. A position entry
+# is (position hash, game number) for each position a game reaches after one of its moves (every game reaches the
+# starting position before its first move, so find_position answers for it without the index). An opening entry is
+# the game's opening moves (see _pack_opening) then its number
+_POSITION_ENTRY = struct.Struct(">QI")
+
+# Index entries sorted in memory at a time before a sorted run is spilled to a temporary file (see _ExternalSorter),
+# and entries read from each run at a time while merging them
+_SORT_RUN_ENTRIES = 1 << 18
+_MERGE_READ_ENTRIES = 4096
+
+# Values written to the file at a time
+_WRITE_BATCH_SIZE = 1 << 16
+
+def _padding(size:int) -> int:
+    """Returns the number of bytes needed after size bytes to reach a multiple of 8"""
+    return -size % 8
+
+class _ExternalSorter:
+    """Represents fixed-width byte records being sorted without holding them all in memory: records are collected in
+    runs of _SORT_RUN_ENTRIES, each run is sorted and spilled to a temporary file, and the runs are merged when the
+    sorted records are read back"""
+    def __init__(self, record_size:int, directory:str = None) -> None:
+        """Creates a sorter of records of record_size bytes, spilling runs to a temporary file in the directory
+        (the system's temporary directory by default)"""
+        self._record_size = record_size
+        self._directory = directory
+        self._buffer = bytearray()
+        self._count = 0
+        self._runs_file = None
+        # (start, end) byte offsets of every run spilled to the runs file
+        self._runs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Deletes the temporary file of spilled runs"""
+        if self._runs_file is not None:
+            self._runs_file.close()
+            self._runs_file = None
+
+    def get_count(self) -> int:
+        """Returns the number of records added"""
+        return self._count
+
+    def add(self, record:bytes):
+        """Adds a record, spilling a sorted run if the buffer is full"""
+        self._buffer += record
+        self._count += 1
+        if len(self._buffer) >= self._record_size * _SORT_RUN_ENTRIES:
+            self._spill()
+
+    def _sort_buffer(self) -> list:
+        """Returns the records in the buffer, sorted, and empties the buffer"""
+        size = self._record_size
+        buffer = self._buffer
+        self._buffer = bytearray()
+        return sorted(bytes(buffer[start:start + size]) for start in range(0, len(buffer), size))
+
+    def _spill(self):
+        """Writes the buffer to the runs file as a sorted run"""
+        if self._runs_file is None:
+            self._runs_file = tempfile.TemporaryFile(dir=self._directory)
+        self._runs_file.seek(0, os.SEEK_END)
+        start = self._runs_file.tell()
+        self._runs_file.write(b"".join(self._sort_buffer()))
+        self._runs.append((start, self._runs_file.tell()))
+
+    def _read_run(self, start:int, end:int):
+        """Yields the records of a spilled run, reading a block of them at a time"""
+        size = self._record_size
+        while start < end:
+            self._runs_file.seek(start)
+            block = self._runs_file.read(min(end - start, size * _MERGE_READ_ENTRIES))
+            start += len(block)
+            for offset in range(0, len(block), size):
+                yield block[offset:offset + size]
+
+    def sorted_records(self):
+        """Yields every record added, in sorted order"""
+        if not self._runs:
+            yield from self._sort_buffer()
+            return
+        if self._buffer:
+            self._spill()
+        yield from heapq.merge(*(self._read_run(start, end) for start, end in self._runs))
+
+def _pack_opening(opening_entry, opening_plies:int, moves, game_number:int) -> bytes:
+    """Returns the opening index entry of a game. Each opening move is stored plus one, and missing moves as 0,
+    so a shorter opening sorts before the longer ones it starts"""
+    opening = [move + 1 for move in moves[:opening_plies]]
+    return opening_entry.pack(*opening, *[0] * (opening_plies - len(opening)), game_number)
+
+def _write_values(database_file, type_code:str, values):
+    """Writes an iterable of values as an array of the type code, a batch at a time"""
+    batch = array(type_code)
+    for value in values:
+        batch.append(value)
+        if len(batch) == _WRITE_BATCH_SIZE:
+            batch.tofile(database_file)
+            batch = array(type_code)
+    batch.tofile(database_file)
+
+def write_database(path:str, games, opening_plies:int = _DEFAULT_OPENING_PLIES) -> int:
+    """Writes a database file of games, each given as a sequence of packed moves from the starting position,
+    and returns the number of games written. Moves are written to the file as each game is read, and every game
+    is replayed through ChessVar to build the indexes
+    The index entries are sorted on disk, in temporary files next to the database file, so memory use doesn't
+    grow with the number of positions: besides the longest game, it holds 8 bytes per game (where each game starts)
+    and one run of index entries being sorted (see _SORT_RUN_ENTRIES)
+    Raises ValueError if a game has an invalid move"""
+    directory = os.path.dirname(os.path.abspath(path))
+    game_offsets = array(_OFFSET_TYPE, [0])
+    opening_entry = struct.Struct(">" + "H" * opening_plies + "I")
+    with open(path, "wb") as database_file, \
+            _ExternalSorter(_POSITION_ENTRY.size, directory) as position_entries, \
+            _ExternalSorter(opening_entry.size, directory) as opening_entries:
+        database_file.write(bytes(_HEADER.size))
+        for game_number, moves in enumerate(games):
+            moves = array(_MOVE_TYPE, moves)
+            game = ChessVar()
+            position_hashes = set()
+            for ply, move in enumerate(moves):
+                if not game.make_packed_move(move):
+                    raise ValueError("game " + str(game_number) + " has an invalid move " + move_to_notation(move) + " at ply " + str(ply))
+                position_hashes.add(game.position_hash())
+            for position_hash in position_hashes:
+                position_entries.add(_POSITION_ENTRY.pack(position_hash, game_number))
+            opening_entries.add(_pack_opening(opening_entry, opening_plies, moves, game_number))
+            moves.tofile(database_file)
+            game_offsets.append(game_offsets[-1] + len(moves))
+
+        game_count = len(game_offsets) - 1
+        move_count = game_offsets[-1]
+        database_file.write(bytes(_padding(_HEADER.size + move_count * 2)))
+        game_offsets.tofile(database_file)
+
+        # The position hashes go straight into the file, while their game numbers, which come after all of them,
+        # are held in a temporary file and copied in afterwards
+        with tempfile.TemporaryFile(dir=directory) as position_games:
+            hashes_batch = array(_OFFSET_TYPE)
+            games_batch = array(_GAME_TYPE)
+            for entry in position_entries.sorted_records():
+                position_hash, game_number = _POSITION_ENTRY.unpack(entry)
+                hashes_batch.append(position_hash)
+                games_batch.append(game_number)
+                if len(hashes_batch) == _WRITE_BATCH_SIZE:
+                    hashes_batch.tofile(database_file)
+                    games_batch.tofile(position_games)
+                    hashes_batch = array(_OFFSET_TYPE)
+                    games_batch = array(_GAME_TYPE)
+            hashes_batch.tofile(database_file)
+            games_batch.tofile(position_games)
+            position_games.seek(0)
+            shutil.copyfileobj(position_games, database_file)
+
+        _write_values(database_file, _GAME_TYPE, (opening_entry.unpack(entry)[-1] for entry in opening_entries.sorted_records()))
+        database_file.seek(0)
+        database_file.write(_HEADER.pack(_MAGIC, _VERSION, opening_plies, game_count, move_count, position_entries.get_count()))
+    return game_count
+
+class GameDatabase:
+    """Represents a database file written by write_database, memory-mapped for reading
+    Can be used as a context manager, which closes the file on exit"""
+    def __init__(self, path:str) -> None:
+        """Opens the database file at the path
+        Raises ValueError if it isn't a database file"""
+        self._file = open(path, "rb")
+        self._views = []
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(path + " is not a game database")
+        if len(self._map) < _HEADER.size or self._map[:4] != _MAGIC:
+            self.close()
+            raise ValueError(path + " is not a game database")
+        magic, version, self._opening_plies, self._game_count, move_count, position_count = _HEADER.unpack_from(self._map)
+        if version != _VERSION:
+            self.close()
+            raise ValueError(path + " has unsupported database version " + str(version))
+
+        view = memoryview(self._map)
+        start = _HEADER.size
+        # (array type, number of items) of each section, in file order
+        sections = [
+            (_MOVE_TYPE, move_count),
+            (_OFFSET_TYPE, self._game_count + 1),
+            (_OFFSET_TYPE, position_count),
+            (_GAME_TYPE, position_count),
+            (_GAME_TYPE, self._game_count),
+        ]
+        self._views.append(view)
+        for type_code, count in sections:
+            size = count * array(type_code).itemsize
+            self._views.append(view[start:start + size].cast(type_code))
+            start += size
+            if type_code == _MOVE_TYPE:
+                start += _padding(start)
+        self._moves, self._game_offsets, self._position_hashes, self._position_games, self._opening_order = self._views[1:]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the database file"""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+        self._file.close()
+
+    def get_game_count(self) -> int:
+        """Returns the number of games in the database"""
+        return self._game_count
+
+    def get_opening_plies(self) -> int:
+        """Returns the number of opening moves the opening index sorts games by"""
+        return self._opening_plies
+
+    def get_moves(self, game_number:int) -> list:
+        """Returns the packed moves of a game (numbered from 0 in the order they were written)
+        Raises IndexError if there's no such game"""
+        if not 0 <= game_number < self._game_count:
+            raise IndexError("game number out of range")
+        return self._moves[self._game_offsets[game_number]:self._game_offsets[game_number + 1]].tolist()
+
+    def replay(self, game_number:int, plies:int = None):
+        """Returns a ChessVar with the first plies moves of a game made (all of them by default)
+        The moves were checked when the database was written, so they're replayed without checking"""
+        game = ChessVar()
+        for move in self.get_moves(game_number)[:plies]:
+            game.push(move)
+        return game
+
+    def find_position(self, position_hash:int) -> list:
+        """Returns the numbers of the games that reach the position with the hash (see ChessVar.position_hash),
+        in increasing order. Every game reaches the starting position"""
+        if position_hash == _STARTING_POSITION_HASH:
+            return list(range(self._game_count))
+        hashes = self._position_hashes
+        low = self._bisect(lambda index: hashes[index] < position_hash, len(hashes))
+        high = self._bisect(lambda index: hashes[index] <= position_hash, len(hashes))
+        return sorted(self._position_games[low:high])
+
+    def find_opening(self, moves) -> list:
+        """Returns the numbers of the games that start with the packed moves, in increasing order"""
+        moves = tuple(moves)
+        prefix = moves[:self._opening_plies]
+        length = len(prefix)
+        order = self._opening_order
+        low = self._bisect(lambda index: self._get_opening(order[index], length) < prefix, len(order))
+        high = self._bisect(lambda index: self._get_opening(order[index], length) <= prefix, len(order))
+        games = sorted(order[low:high])
+        # Longer queries than the index covers are checked game by game
+        if len(moves) > length:
+            games = [game_number for game_number in games if tuple(self.get_moves(game_number)[:len(moves)]) == moves]
+        return games
+
+    def _get_opening(self, game_number:int, length:int) -> tuple:
+        """Returns the first length moves of a game"""
+        start = self._game_offsets[game_number]
+        return tuple(self._moves[start:min(start + length, self._game_offsets[game_number + 1])])
+
+    def _bisect(self, is_before, count:int) -> int:
+        """Returns the first index in range(count) for which is_before is False (is_before must be True then False)"""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if is_before(middle):
+                low = middle + 1
+            else:
+                high = middle
+        return low
@@ -0,0 +1,100 @@
+# Description: Streams game records out of a line-oriented game log and checks every move with ChessVar. Each line
+#               holds one game: an id followed by its moves as in move_to_notation (e.g. "game17 e2e4 d7d5 F@c1").
+#               Blank lines and lines starting with '#' are skipped. Results come out in the order of the log, one at
+#               a time, so memory use doesn't grow with the size of the log
+
+import collections
+import multiprocessing
+
+from ChessVar import ChessVar, notation_to_move
+
+_DEFAULT_CHUNK_SIZE = 64
+
+# Tasks handed to each worker process ahead of the results being read (see imap_bounded)
+_TASKS_IN_FLIGHT_PER_PROCESS = 4
+
+_WINNERS = {
+    "UNFINISHED" : None,
+    "WHITE_WON" : "white",
+    "BLACK_WON" : "black",
+}
+
+def parse_line(line:str):
+    """Returns (game id, list of move strings) for a line of the log, or None if the line is blank or a comment"""
+    fields = line.split()
+    if not fields or fields[0].startswith("#"):
+        return None
+    return fields[0], fields[1:]
+
+def validate_game(game_id:str, moves:list) -> dict:
+    """Replays the moves of a game from the starting position until one is invalid, and returns a dict with:
+    game_id, plies (the number of valid moves made), illegal_ply (the index of the first invalid move, or None),
+    game_state and winner ('white', 'black' or None) after the valid moves, and position (see ChessVar.to_position)"""
+    game = ChessVar()
+    plies = 0
+    illegal_ply = None
+    for move in moves:
+        # A malformed move (notation_to_move returns None) is invalid too
+        if not game.make_packed_move(notation_to_move(move)):
+            illegal_ply = plies
+            break
+        plies += 1
+    return {
+        "game_id": game_id,
+        "plies": plies,
+        "illegal_ply": illegal_ply,
+        "game_state": game.get_game_state(),
+        "winner": _WINNERS[game.get_game_state()],
+        "position": game.to_position(),
+    }
+
+def _validate_chunk(records:list) -> list:
+    """Validates a chunk of (game id, moves) records, in a worker process or in this one"""
+    return [validate_game(game_id, moves) for game_id, moves in records]
+
+def _read_chunks(lines, chunk_size:int):
+    """Yields lists of up to chunk_size parsed records from the lines, skipping blank lines and comments"""
+    chunk = []
+    for line in lines:
+        record = parse_line(line)
+        if record is None:
+            continue
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def imap_bounded(processes:int, function, tasks):
+    """Yields function(*arguments) for each tuple of arguments in the tasks iterable, in order, computed by a pool of
+    processes worker processes (or in this process if processes is 1)
+    Unlike Pool.imap, which reads every task up front, only a few tasks per process are read ahead of the results"""
+    if processes == 1:
+        for arguments in tasks:
+            yield function(*arguments)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        pending = collections.deque()
+        for arguments in tasks:
+            pending.append(pool.apply_async(function, arguments))
+            if len(pending) >= processes * _TASKS_IN_FLIGHT_PER_PROCESS:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def ingest(lines, processes:int = None, chunk_size:int = _DEFAULT_CHUNK_SIZE):
+    """Yields a result dict (see validate_game) for each game in an iterable of log lines, in the order of the lines
+    Lines are read in chunks of chunk_size games, which are validated by a pool of worker processes (one per CPU by
+    default, or none at all if processes is 1). Only a few chunks per process are read ahead of the results"""
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    chunks = ((chunk,) for chunk in _read_chunks(lines, chunk_size))
+    for results in imap_bounded(processes, _validate_chunk, chunks):
+        yield from results
+
+def ingest_file(path:str, processes:int = None, chunk_size:int = _DEFAULT_CHUNK_SIZE):
+    """Yields a result dict (see validate_game) for each game in the log file at the path, in order (see ingest)"""
+    with open(path) as log_file:
+        yield from ingest(log_file, processes, chunk_size)
@@ -0,0 +1,206 @@
+# Description: An asyncio server hosting many ChessVar games (sessions) over a line protocol on TCP or a Unix socket.
+#               Any connection can address any session by its id, so players can reconnect. Requests are one line
+#               each and every request gets one reply line, "OK ...", "INVALID" or "ERR <reason>":
+#                   NEW                              -> OK <session id>
+#                   MOVE <session> <from> <to>       -> OK / INVALID (see ChessVar.make_move)
+#                   ENTER <session> <fairy> <square> -> OK / INVALID (see ChessVar.enter_fairy_piece)
+#                   STATE <session>                  -> OK <game state> <current turn>
+#                   BOARD <session>                  -> OK <position> (see ChessVar.to_position)
+#                   WATCH <session>                  -> OK, then "UPDATE <session> <position>" lines after moves
+#                   CLOSE <session>                  -> OK
+#               Sessions left idle are evicted to a 48-byte record (see position_encoding) and restored when used
+
+import asyncio
+import time
+
+from ChessVar import ChessVar
+from position_encoding import encode_position, decode_position
+
+_DEFAULT_IDLE_TIMEOUT = 300.0
+_DEFAULT_EVICTION_INTERVAL = 30.0
+_READ_SIZE = 65536
+_MAX_LINE_LENGTH = 1024
+
+# Number of arguments each command takes
+_COMMAND_ARGUMENTS = {
+    "NEW" : 0,
+    "MOVE" : 3,
+    "ENTER" : 3,
+    "STATE" : 1,
+    "BOARD" : 1,
+    "WATCH" : 1,
+    "CLOSE" : 1,
+}
+
+class GameServer:
+    """Represents a server hosting ChessVar sessions
+    Replies to the requests read from a connection in one go are written together, and updates for watchers are
+    collected and written once per pass of the event loop, with only the latest position of each session"""
+    def __init__(self, idle_timeout:float = _DEFAULT_IDLE_TIMEOUT, eviction_interval:float = _DEFAULT_EVICTION_INTERVAL) -> None:
+        """Creates a server with no sessions. Sessions not used for idle_timeout seconds are evicted,
+        checking every eviction_interval seconds once the server is started"""
+        self._idle_timeout = idle_timeout
+        self._eviction_interval = eviction_interval
+        # Session id -> ChessVar for sessions in memory, and -> packed position for evicted sessions
+        self._sessions = {}
+        self._evicted_sessions = {}
+        # Session id -> time of its last request, for sessions in memory
+        self._last_used = {}
+        self._next_session_id = 1
+        # Session id -> set of writers watching it, and writer -> {session id: update line} waiting to be written
+        self._watchers = {}
+        self._pending_updates = {}
+        self._flush_scheduled = False
+        self._eviction_task = None
+
+    async def start(self, host:str = None, port:int = None, path:str = None):
+        """Starts listening on a Unix socket at the path, or on TCP at the host and port, and returns the asyncio server"""
+        if path is not None:
+            server = await asyncio.start_unix_server(self._handle_connection, path)
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+        if self._eviction_task is None:
+            self._eviction_task = asyncio.get_running_loop().create_task(self._evict_periodically())
+        return server
+
+    def stop(self):
+        """Stops evicting idle sessions (close the asyncio server returned by start to stop listening)"""
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+            self._eviction_task = None
+
+    def get_stats(self) -> dict:
+        """Returns the number of sessions in memory, evicted sessions and watched sessions"""
+        return {
+            "sessions": len(self._sessions),
+            "evicted_sessions": len(self._evicted_sessions),
+            "watched_sessions": len(self._watchers),
+        }
+
+    def get_session(self, session_id:str):
+        """Returns the ChessVar of a session, restoring it if it was evicted, or None if there's no such session"""
+        game = self._sessions.get(session_id)
+        if game is None:
+            record = self._evicted_sessions.pop(session_id, None)
+            if record is None:
+                return None
+            game = decode_position(record)
+            self._sessions[session_id] = game
+        self._last_used[session_id] = time.monotonic()
+        return game
+
+    def evict_idle_sessions(self, now:float = None) -> int:
+        """Packs every session that hasn't been used for the idle timeout and returns how many were evicted"""
+        if now is None:
+            now = time.monotonic()
+        idle_session_ids = [session_id for session_id, last_used in self._last_used.items() if now - last_used >= self._idle_timeout]
+        for session_id in idle_session_ids:
+            self._evicted_sessions[session_id] = encode_position(self._sessions.pop(session_id))
+            del self._last_used[session_id]
+        return len(idle_session_ids)
+
+    def handle_line(self, line:str, writer = None) -> str:
+        """Carries out one request line and returns the reply line (without a newline)
+        The writer is the connection that sent it, which is needed for WATCH"""
+        fields = line.split()
+        if not fields:
+            return "ERR empty request"
+        command = fields[0].upper()
+        arguments = fields[1:]
+        if command not in _COMMAND_ARGUMENTS:
+            return "ERR unknown command " + fields[0]
+        if len(arguments) != _COMMAND_ARGUMENTS[command]:
+            return "ERR " + command + " takes " + str(_COMMAND_ARGUMENTS[command]) + " arguments"
+        if command == "NEW":
+            session_id = str(self._next_session_id)
+            self._next_session_id += 1
+            self._sessions[session_id] = ChessVar()
+            self._last_used[session_id] = time.monotonic()
+            return "OK " + session_id
+
+        session_id = arguments[0]
+        game = self.get_session(session_id)
+        if game is None:
+            return "ERR no session " + session_id
+        if command == "MOVE" or command == "ENTER":
+            # Malformed squares (e.g. 'z9') are invalid moves
+            if command == "MOVE":
+                valid = game.make_move(arguments[1], arguments[2])
+            else:
+                valid = game.enter_fairy_piece(arguments[1], arguments[2])
+            if not valid:
+                return "INVALID"
+            self._queue_update(session_id, game)
+            return "OK"
+        if command == "STATE":
+            return "OK " + game.get_game_state() + " " + game.get_current_turn()
+        if command == "BOARD":
+            return "OK " + game.to_position()
+        if command == "WATCH":
+            if writer is None:
+                return "ERR WATCH needs a connection"
+            self._watchers.setdefault(session_id, set()).add(writer)
+            return "OK"
+        # CLOSE
+        del self._sessions[session_id]
+        del self._last_used[session_id]
+        self._watchers.pop(session_id, None)
+        return "OK"
+
+    def _queue_update(self, session_id:str, game):
+        """Queues an update with the session's position for every connection watching it"""
+        watchers = self._watchers.get(session_id)
+        if not watchers:
+            return
+        update = "UPDATE " + session_id + " " + game.to_position() + "\n"
+        for writer in watchers:
+            self._pending_updates.setdefault(writer, {})[session_id] = update
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush_updates)
+
+    def _flush_updates(self):
+        """Writes the queued updates, one write per connection"""
+        self._flush_scheduled = False
+        pending_updates = self._pending_updates
+        self._pending_updates = {}
+        for writer, updates in pending_updates.items():
+            if not writer.is_closing():
+                writer.write("".join(updates.values()).encode())
+
+    def _forget_writer(self, writer):
+        """Stops sending updates to a closed connection"""
+        self._pending_updates.pop(writer, None)
+        for session_id in [session_id for session_id, watchers in self._watchers.items() if writer in watchers]:
+            self._watchers[session_id].discard(writer)
+            if not self._watchers[session_id]:
+                del self._watchers[session_id]
+
+    async def _handle_connection(self, reader, writer):
+        """Serves one connection until it closes"""
+        unfinished_line = b""
+        try:
+            while True:
+                data = await reader.read(_READ_SIZE)
+                if not data:
+                    break
+                # Answer every complete request that has arrived, then write the replies together
+                *lines, unfinished_line = (unfinished_line + data).split(b"\n")
+                if len(unfinished_line) > _MAX_LINE_LENGTH:
+                    writer.write(b"ERR request too long\n")
+                    break
+                if lines:
+                    replies = [self.handle_line(line.decode(errors="replace"), writer) for line in lines]
+                    writer.write(("\n".join(replies) + "\n").encode())
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._forget_writer(writer)
+            writer.close()
+
+    async def _evict_periodically(self):
+        """Evicts idle sessions every eviction interval"""
+        while True:
+            await asyncio.sleep(self._eviction_interval)
+            self.evict_idle_sessions()
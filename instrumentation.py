@@ -0,0 +1,129 @@
+# Description: Optional counters and timers for the hot paths of ChessVar, to see which piece types and rule checks
+#               use the CPU without attaching a profiler. Nothing is counted until enable is called: it swaps timing
+#               wrappers in for the instrumented methods and a counting copy in for the ray walk, and disable puts the
+#               original functions back, so there is no cost at all while it's off. Counters are kept per process,
+#               across every game
+#
+#               Counters (see get_counters), each with the number of calls and their cumulative wall time in seconds:
+#                   valid_destinations.<piece class>   destination generation per piece class (Pawn, Knight, ...),
+#                                                      as used by get_valid_destinations and legal_moves
+#                   ray_walks                          walks along a slider's rays, with the squares scanned
+#                   is_piece_in_play                   Board.is_piece_in_play scans
+#                   make_move.accepted / .rejected     make_move and make_move_idx calls, by outcome
+#                   enter_fairy_piece.accepted / ...   enter_fairy_piece and enter_fairy_piece_idx calls, by outcome
+#               (calls with square names that aren't on the board are rejected before any checks and aren't counted)
+
+import functools
+import time
+
+import ChessVar as chess_module
+from ChessVar import Board, ChessVar, Pawn, Knight, Bishop, Rook, Queen, King, Falcon, Hunter
+
+_PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King, Falcon, Hunter)
+
+# Counter name -> [calls, seconds], and the squares scanned by all ray walks
+_counters = {}
+_ray_squares_scanned = 0
+
+# (owner, attribute name) -> original function, for every function swapped out while enabled, or None if the owner
+# inherited it (e.g. a piece class's get_destination_squares, from SliderPiece or LeaperPiece)
+_originals = {}
+
+def _counter(name:str) -> list:
+    """Returns the [calls, seconds] list of a counter, creating it if needed"""
+    return _counters.setdefault(name, [0, 0.0])
+
+def _timed(name:str, function):
+    """Returns a wrapper of the function that counts its calls and their time"""
+    counter = _counter(name)
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        counter[1] += time.perf_counter() - start
+        counter[0] += 1
+        return result
+    return wrapper
+
+def _timed_by_outcome(name:str, function):
+    """Returns a wrapper of a function returning True or False that counts its accepted and rejected calls and their time"""
+    accepted = _counter(name + ".accepted")
+    rejected = _counter(name + ".rejected")
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        counter = accepted if result else rejected
+        counter[1] += time.perf_counter() - start
+        counter[0] += 1
+        return result
+    return wrapper
+
+def _counted_walk_rays(walk_rays):
+    """Returns an instrumented copy of _walk_rays that counts the walks, their time, and the squares they scan (each
+    ray up to and including the first occupied square) in the same pass, so timings don't include a second walk"""
+    counter = _counter("ray_walks")
+    @functools.wraps(walk_rays)
+    def counted_walk_rays(rays, own, opponent):
+        global _ray_squares_scanned
+        start = time.perf_counter()
+        destinations = []
+        scanned = 0
+        for ray in rays:
+            for square in ray:
+                scanned += 1
+                if (own >> square) & 1:
+                    break
+                destinations.append(square)
+                if (opponent >> square) & 1:
+                    break
+        counter[1] += time.perf_counter() - start
+        counter[0] += 1
+        _ray_squares_scanned += scanned
+        return destinations
+    return counted_walk_rays
+
+def _swap(owner, name:str, wrapper):
+    """Replaces owner.name with a wrapper of it, remembering the original"""
+    _originals[(owner, name)] = vars(owner).get(name)
+    setattr(owner, name, wrapper(getattr(owner, name)))
+
+def is_enabled() -> bool:
+    """Returns whether the instrumentation is switched on"""
+    return bool(_originals)
+
+def enable():
+    """Switches the instrumentation on (does nothing if it's already on). Counters keep their values"""
+    if is_enabled():
+        return
+    for piece_class in _PIECE_CLASSES:
+        _swap(piece_class, "get_destination_squares", functools.partial(_timed, "valid_destinations." + piece_class.__name__))
+    _swap(chess_module, "_walk_rays", _counted_walk_rays)
+    _swap(Board, "is_piece_in_play", functools.partial(_timed, "is_piece_in_play"))
+    _swap(ChessVar, "make_move_idx", functools.partial(_timed_by_outcome, "make_move"))
+    _swap(ChessVar, "enter_fairy_piece_idx", functools.partial(_timed_by_outcome, "enter_fairy_piece"))
+
+def disable():
+    """Switches the instrumentation off, restoring the original functions. Counters keep their values"""
+    for (owner, name), original in _originals.items():
+        if original is None:
+            delattr(owner, name)
+        else:
+            setattr(owner, name, original)
+    _originals.clear()
+
+def get_counters() -> dict:
+    """Returns {counter name: {'calls': ..., 'seconds': ...}} for every counter (see the module description)
+    The ray_walks counter also has 'squares', the number of squares scanned"""
+    counters = {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in sorted(_counters.items())}
+    if "ray_walks" in counters:
+        counters["ray_walks"]["squares"] = _ray_squares_scanned
+    return counters
+
+def reset_counters():
+    """Sets every counter back to zero"""
+    global _ray_squares_scanned
+    for counter in _counters.values():
+        counter[0] = 0
+        counter[1] = 0.0
+    _ray_squares_scanned = 0
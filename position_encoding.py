@@ -0,0 +1,113 @@
+# Description: A fixed-width binary encoding of ChessVar positions for bulk storage. Every position packs into a
+#               48-byte record, so many positions can be written to and read from one bytes-like buffer by index
+
+import struct
+
+from ChessVar import ChessVar, _FAIRY_LETTERS, _FAIRY_RESERVE_BITS, _NUM_SQUARES
+
+# Record layout (little-endian): 32 bytes of squares at 4 bits each (even squares in the low nibble), the white and
+# black king squares, a flags byte, the turn count, a bitmask of squares holding pawns that have moved, and padding
+_RECORD = struct.Struct("<32sBBBIQx")
+RECORD_SIZE = _RECORD.size
+
+# Offset of the 4-byte turn count in a record
+_TURNS_OFFSET = 35
+
+# 4-bit code of every piece letter except the kings, which are stored as squares since 16 codes can't cover
+# 14 piece letters, 2 kings and an empty square. Code 0 is an empty square and code 15 is unused
+_SQUARE_LETTERS = (None, "P", "N", "B", "R", "Q", "F", "H", "p", "n", "b", "r", "q", "f", "h", None)
+_LETTER_CODES = {letter: code for code, letter in enumerate(_SQUARE_LETTERS) if letter is not None}
+_INVALID_CODE = 15
+
+# King square stored for a captured king
+_NO_KING = 0xFF
+
+# Flags byte: bit 0 is set when black is to move, bits 1-4 hold the fairy reserve (see _FAIRY_RESERVE_BITS)
+_BLACK_TO_MOVE_FLAG = 1
+_RESERVE_SHIFT = 1
+
+# Piece letters (low nibble's square first) for every value of a squares byte
+_BYTE_LETTERS = tuple((_SQUARE_LETTERS[value & 0xF], _SQUARE_LETTERS[value >> 4]) for value in range(256))
+
+def encode_position(game) -> bytes:
+    """Returns the position of the game packed into a RECORD_SIZE-byte record"""
+    record = bytearray(RECORD_SIZE)
+    encode_position_into(game, record, 0)
+    return bytes(record)
+
+def encode_position_into(game, buffer, index:int):
+    """Packs the position of the game into the index-th record of a writable buffer (e.g. a bytearray or mmap)"""
+    board = game.get_board()
+    codes = [0] * _NUM_SQUARES
+    king_squares = [_NO_KING, _NO_KING]
+    for square in range(_NUM_SQUARES):
+        letter = board.get_piece_at_square(square).get_letter()
+        if letter is None:
+            continue
+        if letter == "K":
+            king_squares[0] = square
+        elif letter == "k":
+            king_squares[1] = square
+        else:
+            codes[square] = _LETTER_CODES[letter]
+    moved_pawns = (board.get_piece_bitboard("P") | board.get_piece_bitboard("p")) & ~board.get_unmoved_pawns()
+    squares = bytes(codes[square] | (codes[square + 1] << 4) for square in range(0, _NUM_SQUARES, 2))
+    flags = board.get_fairy_reserve() << _RESERVE_SHIFT
+    if game.get_current_turn() == "black":
+        flags |= _BLACK_TO_MOVE_FLAG
+    _RECORD.pack_into(buffer, index * RECORD_SIZE, squares, king_squares[0], king_squares[1], flags, game.get_turn_count(), moved_pawns)
+
+def encode_positions(games) -> bytearray:
+    """Returns the positions of an iterable of games packed into consecutive records of one buffer"""
+    games = list(games)
+    buffer = bytearray(len(games) * RECORD_SIZE)
+    for index, game in enumerate(games):
+        encode_position_into(game, buffer, index)
+    return buffer
+
+def count_positions(buffer) -> int:
+    """Returns the number of records in a buffer of packed positions"""
+    return len(buffer) // RECORD_SIZE
+
+def get_record(buffer, index:int) -> memoryview:
+    """Returns the index-th record of a buffer without copying it
+    A record includes the turn count, so the same position reached after a different number of moves (e.g. a
+    transposition) has a different record. Use get_position_key to compare or hash positions"""
+    return memoryview(buffer)[index * RECORD_SIZE:(index + 1) * RECORD_SIZE]
+
+def get_position_key(buffer, index:int = 0) -> bytes:
+    """Returns the index-th record of a buffer without its turn count and padding, so equal positions have equal
+    keys whatever move they were reached on (like ChessVar.position_hash), and keys can be compared or hashed"""
+    start = index * RECORD_SIZE
+    return bytes(buffer[start:start + _TURNS_OFFSET]) + bytes(buffer[start + _TURNS_OFFSET + 4:start + RECORD_SIZE - 1])
+
+def decode_position(buffer, index:int = 0):
+    """Returns a new ChessVar set up at the position in the index-th record of the buffer
+    Raises ValueError if the record doesn't hold a valid position"""
+    squares, white_king, black_king, flags, turns, moved_pawns = _RECORD.unpack_from(buffer, index * RECORD_SIZE)
+    letters = []
+    for value in squares:
+        if value & 0xF == _INVALID_CODE or value >> 4 == _INVALID_CODE:
+            raise ValueError("invalid square code in record " + str(index))
+        letters.extend(_BYTE_LETTERS[value])
+    for king_square, letter in ((white_king, "K"), (black_king, "k")):
+        if king_square == _NO_KING:
+            continue
+        if king_square >= _NUM_SQUARES or letters[king_square] is not None:
+            raise ValueError("invalid king square in record " + str(index))
+        letters[king_square] = letter
+    reserve_bits = flags >> _RESERVE_SHIFT
+    if reserve_bits > 0xF:
+        raise ValueError("invalid flags in record " + str(index))
+    reserve = "".join(letter for letter in _FAIRY_LETTERS if reserve_bits & _FAIRY_RESERVE_BITS[letter])
+    moved_pawn_squares = []
+    while moved_pawns:
+        moved_pawn_squares.append((moved_pawns & -moved_pawns).bit_length() - 1)
+        moved_pawns &= moved_pawns - 1
+    current_turn = "black" if flags & _BLACK_TO_MOVE_FLAG else "white"
+    return ChessVar._from_letters(letters, current_turn, turns, moved_pawn_squares, reserve)
+
+def iter_positions(buffer):
+    """Yields a ChessVar for each record of a buffer of packed positions, in order"""
+    for index in range(count_positions(buffer)):
+        yield decode_position(buffer, index)
@@ -0,0 +1,400 @@
+# Description: Alpha-beta search for ChessVar. Finds the best move for the player whose turn it is, using negamax with
+#               iterative deepening, a transposition table, and capture-first (MVV-LVA), killer and history move ordering.
+#               Winning means capturing the king (there is no check or checkmate), so a king capture ends the line
+
+import multiprocessing
+import time
+from multiprocessing.sharedctypes import RawArray
+
+from ChessVar import ChessVar, _MOVE_DROP_FLAG, _OPPONENT, _PIECE_LETTERS
+from transposition import TranspositionTable, table_size_in_bytes, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# Material values by piece letter. The king is priceless, but capturing it ends the game, so it's scored as a win instead
+_PIECE_VALUES = {
+    "P" : 100, "p" : 100,
+    "N" : 300, "n" : 300,
+    "B" : 320, "b" : 320,
+    "R" : 500, "r" : 500,
+    "Q" : 900, "q" : 900,
+    "K" : 0, "k" : 0,
+    "F" : 400, "f" : 400,
+    "H" : 400, "h" : 400,
+}
+
+# Squares c3-f3 through c6-f6, and the bonus for each piece standing on them
+_CENTER_BITBOARD = 0x3C3C3C3C << 16
+_CENTER_BONUS = 10
+
+# Score for capturing the king. Wins found sooner score higher (WIN_SCORE - plies from the root)
+WIN_SCORE = 1000000
+_WIN_THRESHOLD = WIN_SCORE - 1000
+
+_DEFAULT_DEPTH = 3
+_MAX_DEPTH = 64
+# How many nodes are searched between checks of the clock
+_TIME_CHECK_INTERVAL = 1024
+
+# Move ordering priorities, above any history score
+_TT_MOVE_PRIORITY = 1 << 40
+_CAPTURE_PRIORITY = 1 << 30
+_KILLER_PRIORITY = 1 << 29
+
+class _SearchTimeout(Exception):
+    """Raised inside the search when the time limit runs out"""
+    pass
+
+def evaluate(game) -> int:
+    """Returns the material balance, plus a small bonus for pieces in the center, from the point of view of the player
+    whose turn it is"""
+    board = game.get_board()
+    score = 0
+    for letter in _PIECE_LETTERS:
+        if letter.isupper():
+            score += _PIECE_VALUES[letter] * board.get_piece_bitboard(letter).bit_count()
+        else:
+            score -= _PIECE_VALUES[letter] * board.get_piece_bitboard(letter).bit_count()
+    score += _CENTER_BONUS * (board.get_color_bitboard("white") & _CENTER_BITBOARD).bit_count()
+    score -= _CENTER_BONUS * (board.get_color_bitboard("black") & _CENTER_BITBOARD).bit_count()
+    if game.get_current_turn() == "black":
+        return -score
+    return score
+
+def _score_to_table(score:int, ply:int) -> int:
+    """Converts a win score relative to the root into one relative to the current position, for the transposition table"""
+    if score > _WIN_THRESHOLD:
+        return score + ply
+    if score < -_WIN_THRESHOLD:
+        return score - ply
+    return score
+
+def _score_from_table(score:int, ply:int) -> int:
+    """Converts a win score stored in the transposition table back into one relative to the root"""
+    if score > _WIN_THRESHOLD:
+        return score - ply
+    if score < -_WIN_THRESHOLD:
+        return score + ply
+    return score
+
+class Searcher:
+    """Represents an alpha-beta search engine
+    The transposition table and history scores are kept between searches, so a Searcher can be reused move after move"""
+    def __init__(self, table:TranspositionTable = None, size_mb:float = 16) -> None:
+        """Creates a searcher using the given transposition table, or a new one of size_mb megabytes"""
+        if table is None:
+            table = TranspositionTable(size_mb)
+        self._table = table
+        self._history = [0] * (1 << 13)
+        self._killers = [[None, None] for _ in range(_MAX_DEPTH + 1)]
+        self._nodes = 0
+        self._ply = 0
+        self._deadline = None
+        self._next_time_check = 0
+        self._game = None
+        self._stats = {}
+
+    def get_stats(self) -> dict:
+        """Returns statistics about the last search: best move, score, depth completed, nodes, seconds, nodes per second,
+        and (depth, score, best move) for each completed iteration"""
+        return dict(self._stats)
+
+    def search(self, game, depth:int = None, time_limit:float = None, root_moves:list = None, generation:int = None):
+        """Returns the best packed move for the player whose turn it is (None if there are no moves)
+        Searches one ply deeper at a time, up to depth plies, until time_limit seconds have passed (the last completed
+        depth is used). With neither given, searches to a default depth. root_moves limits the search to those moves,
+        and generation sets the transposition table generation (see TranspositionTable.new_search)
+        The game is left exactly as it was found"""
+        if depth is None:
+            depth = _MAX_DEPTH if time_limit is not None else _DEFAULT_DEPTH
+        moves = game.legal_moves() if root_moves is None else list(root_moves)
+        start_time = time.perf_counter()
+        self._deadline = None if time_limit is None else start_time + time_limit
+        self._game = game
+        self._nodes = 0
+        self._ply = 0
+        self._next_time_check = _TIME_CHECK_INTERVAL
+        self._table.new_search(generation)
+        for killers in self._killers:
+            killers[0] = killers[1] = None
+
+        best_move = moves[0] if moves else None
+        best_score = 0
+        completed_depth = 0
+        iterations = []
+        try:
+            for current_depth in range(1, depth + 1):
+                if not moves:
+                    break
+                best_score, best_move = self._search_root(moves, current_depth, best_move, root_moves is not None)
+                completed_depth = current_depth
+                iterations.append((current_depth, best_score, best_move))
+                # Nothing can beat a forced win, and nothing can be done about a forced loss
+                if abs(best_score) > _WIN_THRESHOLD:
+                    break
+        except _SearchTimeout:
+            # Unwind the moves made by the interrupted search
+            while self._ply:
+                game.pop()
+                self._ply -= 1
+
+        elapsed = time.perf_counter() - start_time
+        self._stats = {
+            "best_move": best_move,
+            "score": best_score,
+            "depth": completed_depth,
+            "nodes": self._nodes,
+            "seconds": elapsed,
+            "nodes_per_second": self._nodes / elapsed if elapsed > 0 else 0.0,
+            "iterations": iterations,
+        }
+        self._game = None
+        return best_move
+
+    def _search_root(self, moves:list, depth:int, previous_best_move, partial:bool) -> tuple:
+        """Searches every root move to the given depth and returns (best score, best move)
+        The previous iteration's best move is searched first. partial says the moves are only some of the root moves
+        (a worker's share), so the score is only a lower bound for the root position"""
+        game = self._game
+        ordered_moves = self._order_moves(moves, previous_best_move, 0)
+        alpha = -WIN_SCORE - 1
+        beta = WIN_SCORE + 1
+        best_move = ordered_moves[0]
+        for move in ordered_moves:
+            score = self._search_child(move, depth, alpha, beta)
+            if score > alpha:
+                alpha = score
+                best_move = move
+        # Another worker's search can transpose back to the root, and must not take a share's score as exact
+        self._table.store(game.position_hash(), depth, alpha, LOWER_BOUND if partial else EXACT, best_move)
+        return alpha, best_move
+
+    def _search_child(self, move:int, depth:int, alpha:int, beta:int) -> int:
+        """Makes the move, scores the resulting position from the mover's point of view, and takes the move back"""
+        game = self._game
+        game.push(move)
+        self._ply += 1
+        if game.get_game_state() != "UNFINISHED":
+            # The move captured the king
+            self._nodes += 1
+            score = WIN_SCORE - self._ply
+        else:
+            score = -self._negamax(depth - 1, -beta, -alpha)
+        game.pop()
+        self._ply -= 1
+        return score
+
+    def _negamax(self, depth:int, alpha:int, beta:int) -> int:
+        """Returns the score of the position from the point of view of the player whose turn it is"""
+        self._nodes += 1
+        if self._nodes >= self._next_time_check:
+            self._next_time_check = self._nodes + _TIME_CHECK_INTERVAL
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise _SearchTimeout()
+        if depth <= 0:
+            return self._quiescence(alpha, beta)
+
+        game = self._game
+        ply = self._ply
+        position_hash = game.position_hash()
+        entry = self._table.probe(position_hash)
+        table_move = None
+        if entry is not None:
+            entry_depth, entry_score, entry_bound, table_move = entry
+            if entry_depth >= depth:
+                entry_score = _score_from_table(entry_score, ply)
+                if entry_bound == EXACT:
+                    return entry_score
+                if entry_bound == LOWER_BOUND and entry_score >= beta:
+                    return entry_score
+                if entry_bound == UPPER_BOUND and entry_score <= alpha:
+                    return entry_score
+
+        moves = game.legal_moves()
+        if not moves:
+            # No piece can move and no fairy piece can enter, so the game can't progress
+            return 0
+
+        original_alpha = alpha
+        best_score = -WIN_SCORE - 1
+        best_move = None
+        opponent = game.get_board().get_color_bitboard(_OPPONENT[game.get_current_turn()])
+        for move in self._order_moves(moves, table_move, ply):
+            score = self._search_child(move, depth, alpha, beta)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        # Quiet moves that cause a cutoff are remembered as killers and in the history scores
+                        if move & _MOVE_DROP_FLAG or not (opponent >> ((move >> 6) & 63)) & 1:
+                            killers = self._killers[ply]
+                            if killers[0] != move:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                            self._history[move] += depth * depth
+                        break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self._table.store(position_hash, depth, _score_to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    def _quiescence(self, alpha:int, beta:int) -> int:
+        """Returns the score of the position after searching captures only, so positions aren't scored mid-exchange"""
+        game = self._game
+        stand_pat = evaluate(game)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        board = game.get_board()
+        opponent = board.get_color_bitboard(_OPPONENT[game.get_current_turn()])
+        captures = [move for move in game.legal_moves() if not move & _MOVE_DROP_FLAG and (opponent >> ((move >> 6) & 63)) & 1]
+        for move in self._order_moves(captures, None, self._ply):
+            game.push(move)
+            self._ply += 1
+            self._nodes += 1
+            if game.get_game_state() != "UNFINISHED":
+                score = WIN_SCORE - self._ply
+            else:
+                score = -self._quiescence(-beta, -alpha)
+            game.pop()
+            self._ply -= 1
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _order_moves(self, moves:list, table_move, ply:int) -> list:
+        """Returns the moves sorted best-first: the transposition table move, then captures of the most valuable
+        piece by the least valuable attacker (MVV-LVA), then killer moves, then quiet moves by history score"""
+        game = self._game
+        board = game.get_board()
+        opponent = board.get_color_bitboard(_OPPONENT[game.get_current_turn()])
+        killers = self._killers[ply] if ply <= _MAX_DEPTH else (None, None)
+        history = self._history
+        scored_moves = []
+        for move in moves:
+            destination = (move >> 6) & 63
+            if move == table_move:
+                priority = _TT_MOVE_PRIORITY
+            elif not move & _MOVE_DROP_FLAG and (opponent >> destination) & 1:
+                victim = _PIECE_VALUES[board.get_piece_at_square(destination).get_letter()]
+                attacker = _PIECE_VALUES[board.get_piece_at_square(move & 63).get_letter()]
+                # The king is worth 0 as material, but capturing it wins, so it's always the first capture tried
+                if victim == 0:
+                    victim = WIN_SCORE
+                priority = _CAPTURE_PRIORITY + victim * 16 - attacker
+            elif move == killers[0] or move == killers[1]:
+                priority = _KILLER_PRIORITY
+            else:
+                priority = history[move]
+            scored_moves.append((priority, move))
+        scored_moves.sort(reverse=True)
+        return [move for _, move in scored_moves]
+
+
+# Transposition table shared by the searches running in one worker process, and the barrier every worker waits at
+# before searching its share (set by _init_worker)
+_worker_table = None
+_worker_barrier = None
+
+def _init_worker(shared_buffer, barrier):
+    """Runs once in each worker process: builds the transposition table over the shared memory buffer"""
+    global _worker_table, _worker_barrier
+    _worker_table = TranspositionTable(buffer=shared_buffer)
+    _worker_barrier = barrier
+
+def _search_in_worker(task:tuple):
+    """Searches a share of the root moves in a worker process and returns the search statistics (None for an empty share)
+    The task holds the position (see ChessVar.to_position), the share, the depth, the deadline as a time.time() value
+    (or None), and the transposition table generation"""
+    position, root_moves, depth, deadline, generation = task
+    # A worker holding a task waits here until every worker holds one, so no worker takes two shares
+    _worker_barrier.wait()
+    if not root_moves:
+        return None
+    time_limit = None if deadline is None else max(0.0, deadline - time.time())
+    searcher = Searcher(table=_worker_table)
+    searcher.search(ChessVar.from_position(position), depth, time_limit, root_moves, generation)
+    return searcher.get_stats()
+
+class ParallelSearcher:
+    """Represents a search split across a pool of worker processes
+    The root moves are dealt out between the workers, one share per worker, and the workers all read and write one
+    transposition table in shared memory, so a position searched by one worker is found in the table by the others.
+    The searcher counts the table generation for all of them, and a time limit is one deadline shared by every worker.
+    The pool is kept between searches: call close (or use the object in a with statement) when done"""
+    def __init__(self, processes:int = None, size_mb:float = 64) -> None:
+        """Starts the given number of worker processes (one per CPU by default) sharing a table of size_mb megabytes"""
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self._processes = processes
+        self._shared_buffer = RawArray("B", table_size_in_bytes(size_mb))
+        self._pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(self._shared_buffer, multiprocessing.Barrier(processes)))
+        self._generation = 0
+        self._stats = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stops the worker processes"""
+        self._pool.close()
+        self._pool.join()
+
+    def get_stats(self) -> dict:
+        """Returns statistics about the last search, with the nodes of all workers added together"""
+        return dict(self._stats)
+
+    def search(self, game, depth:int = None, time_limit:float = None):
+        """Returns the best packed move for the player whose turn it is (None if there are no moves)
+        Takes the same limits as Searcher.search. When a time limit stops the workers at different depths, the result
+        comes from the deepest iteration every worker completed"""
+        start_time = time.perf_counter()
+        deadline = None if time_limit is None else time.time() + time_limit
+        moves = game.legal_moves()
+        if not moves:
+            self._stats = {"best_move": None, "score": 0, "depth": 0, "nodes": 0, "seconds": 0.0, "nodes_per_second": 0.0}
+            return None
+
+        # Deal the root moves out round-robin, so every worker gets a mix of captures and quiet moves. Every worker
+        # gets a task (empty if there are fewer moves than workers), since they all wait for each other to start
+        self._generation += 1
+        position = game.to_position()
+        shares = [moves[worker::self._processes] for worker in range(self._processes)]
+        tasks = [(position, share, depth, deadline, self._generation) for share in shares]
+        results = [result for result in self._pool.map(_search_in_worker, tasks, chunksize=1) if result is not None]
+
+        # Every worker reports one result per completed depth: compare the workers at the deepest depth they all reached
+        common_depth = min(len(result["iterations"]) for result in results)
+        best_score = None
+        best_move = moves[0]
+        if common_depth > 0:
+            for result in results:
+                _, score, move = result["iterations"][common_depth - 1]
+                if best_score is None or score > best_score:
+                    best_score = score
+                    best_move = move
+
+        nodes = sum(result["nodes"] for result in results)
+        elapsed = time.perf_counter() - start_time
+        self._stats = {
+            "best_move": best_move,
+            "score": 0 if best_score is None else best_score,
+            "depth": common_depth,
+            "nodes": nodes,
+            "seconds": elapsed,
+            "nodes_per_second": nodes / elapsed if elapsed > 0 else 0.0,
+            "processes": len(results),
+        }
+        return best_move
@@ -0,0 +1,242 @@
+# Description: Plays complete ChessVar games against itself with a random or weighted policy (fairy piece entries
+#               included), across a pool of worker processes, to gather statistics for balancing the variant or to
+#               generate load. Moves are chosen from legal_moves and made with push, so there are no strings to parse.
+#               Every game is seeded from the run's seed and its number, so a run gives the same games however many
+#               processes play it. Each game is summed up in a small fixed-width record, which can be streamed to a
+#               file as games finish and read back with read_results:
+#                   python self_play.py 100000 --policy weighted --output games.selfplay
+
+import argparse
+import json
+import multiprocessing
+import random
+import struct
+import sys
+
+from ChessVar import ChessVar, _FAIRY_LETTERS, _MOVE_DROP_FLAG, _OPPONENT
+from game_log import imap_bounded
+
+_DEFAULT_MAX_PLIES = 500
+_DEFAULT_CHUNK_SIZE = 64
+
+# Move weights for each policy: (quiet move, capture, fairy piece entry). The random policy picks uniformly
+_POLICY_WEIGHTS = {
+    "random" : None,
+    "weighted" : (1, 8, 3),
+}
+
+# File layout: a header (magic, version, record size) followed by one record per game, in game order.
+# A record holds the plies played, the result (see _RESULTS), the captures made by white and by black, and the ply at
+# which each fairy piece (in _FAIRY_LETTERS order) entered, or _NOT_ENTERED
+_MAGIC = b"CVSP"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+_RECORD = struct.Struct("<HBBB4H")
+_NOT_ENTERED = 0xFFFF
+
+# Result code of each game state
+_RESULTS = {
+    "UNFINISHED" : 0,
+    "WHITE_WON" : 1,
+    "BLACK_WON" : 2,
+}
+
+def play_random_moves(game, rng, plies:int) -> list:
+    """Pushes up to plies random legal moves chosen with the random.Random rng (fewer if the game ends),
+    and returns the packed moves played"""
+    moves = []
+    for _ in range(plies):
+        legal_moves = game.legal_moves()
+        if not legal_moves:
+            break
+        moves.append(rng.choice(legal_moves))
+        game.push(moves[-1])
+    return moves
+
+def play_game(rng, policy:str = "random", max_plies:int = _DEFAULT_MAX_PLIES) -> tuple:
+    """Plays a game from the starting position until a king is captured or max_plies plies have been played, choosing
+    moves with the policy ('random' or 'weighted', see _POLICY_WEIGHTS) and the random.Random rng
+    Returns (plies, game state, captures by color dict, fairy letter -> ply of entry dict)
+    Raises KeyError for an unknown policy"""
+    weights = _POLICY_WEIGHTS[policy]
+    game = ChessVar()
+    board = game.get_board()
+    captures = {"white": 0, "black": 0}
+    entry_plies = {}
+    plies = 0
+    while plies < max_plies:
+        moves = game.legal_moves()
+        if not moves:
+            break
+        color = game.get_current_turn()
+        opponent = board.get_color_bitboard(_OPPONENT[color])
+        if weights is None:
+            move = rng.choice(moves)
+        else:
+            quiet_weight, capture_weight, drop_weight = weights
+            move_weights = [
+                drop_weight if move & _MOVE_DROP_FLAG else capture_weight if (opponent >> ((move >> 6) & 63)) & 1 else quiet_weight
+                for move in moves
+            ]
+            move = rng.choices(moves, move_weights)[0]
+        if move & _MOVE_DROP_FLAG:
+            entry_plies[_FAIRY_LETTERS[move & 63]] = plies
+        elif (opponent >> ((move >> 6) & 63)) & 1:
+            captures[color] += 1
+        game.push(move)
+        plies += 1
+    return plies, game.get_game_state(), captures, entry_plies
+
+def _pack_game(plies:int, game_state:str, captures:dict, entry_plies:dict) -> bytes:
+    """Returns the record of a game played by play_game"""
+    return _RECORD.pack(
+        plies,
+        _RESULTS[game_state],
+        captures["white"],
+        captures["black"],
+        *(entry_plies.get(letter, _NOT_ENTERED) for letter in _FAIRY_LETTERS),
+    )
+
+def _game_rng(seed:int, game_number:int):
+    """Returns the random number generator for a game of a run"""
+    return random.Random(seed * 1_000_003 + game_number)
+
+def _play_chunk(first_game:int, count:int, policy:str, seed:int, max_plies:int) -> bytes:
+    """Plays games first_game to first_game + count - 1 of a run, in a worker process or in this one,
+    and returns their records"""
+    return b"".join(_pack_game(*play_game(_game_rng(seed, game_number), policy, max_plies)) for game_number in range(first_game, first_game + count))
+
+class SelfPlayStats:
+    """Represents statistics gathered from game records (see get_stats)"""
+    def __init__(self) -> None:
+        self._games = 0
+        self._results = [0] * len(_RESULTS)
+        self._total_plies = 0
+        self._min_plies = None
+        self._max_plies = None
+        self._captures = [0, 0]
+        # Per fairy letter: games in which it entered, and the sum of the plies at which it entered
+        self._entries = [0] * len(_FAIRY_LETTERS)
+        self._total_entry_plies = [0] * len(_FAIRY_LETTERS)
+
+    def add_records(self, records):
+        """Adds the games of a bytes-like buffer of records"""
+        for plies, result, white_captures, black_captures, *entry_plies in _RECORD.iter_unpack(records):
+            self._games += 1
+            self._results[result] += 1
+            self._total_plies += plies
+            if self._min_plies is None or plies < self._min_plies:
+                self._min_plies = plies
+            if self._max_plies is None or plies > self._max_plies:
+                self._max_plies = plies
+            self._captures[0] += white_captures
+            self._captures[1] += black_captures
+            for index, entry_ply in enumerate(entry_plies):
+                if entry_ply != _NOT_ENTERED:
+                    self._entries[index] += 1
+                    self._total_entry_plies[index] += entry_ply
+
+    def get_stats(self) -> dict:
+        """Returns a dict with the number of games; results (games won by white, won by black, and unfinished after
+        the maximum plies) and win_rates; plies (mean, min, max); captures (by white, by black, mean per game);
+        and fairy_entries: for each fairy letter, the games it entered in, that as a rate, and the mean ply of entry"""
+        games = self._games
+        def mean(total, count):
+            return total / count if count else None
+        return {
+            "games": games,
+            "results": {
+                "white": self._results[_RESULTS["WHITE_WON"]],
+                "black": self._results[_RESULTS["BLACK_WON"]],
+                "unfinished": self._results[_RESULTS["UNFINISHED"]],
+            },
+            "win_rates": {
+                "white": mean(self._results[_RESULTS["WHITE_WON"]], games),
+                "black": mean(self._results[_RESULTS["BLACK_WON"]], games),
+            },
+            "plies": {
+                "mean": mean(self._total_plies, games),
+                "min": self._min_plies,
+                "max": self._max_plies,
+            },
+            "captures": {
+                "white": self._captures[0],
+                "black": self._captures[1],
+                "mean_per_game": mean(sum(self._captures), games),
+            },
+            "fairy_entries": {
+                letter: {
+                    "games": self._entries[index],
+                    "rate": mean(self._entries[index], games),
+                    "mean_ply": mean(self._total_entry_plies[index], self._entries[index]),
+                }
+                for index, letter in enumerate(_FAIRY_LETTERS)
+            },
+        }
+
+def simulate(games:int, policy:str = "random", seed:int = 0, max_plies:int = _DEFAULT_MAX_PLIES, output:str = None,
+             processes:int = None, chunk_size:int = _DEFAULT_CHUNK_SIZE) -> dict:
+    """Plays games games (see play_game) and returns their statistics (see SelfPlayStats.get_stats)
+    Games are played in chunks of chunk_size by a pool of worker processes (one per CPU by default, or none at all if
+    processes is 1). If output is a path, the record of every game is written to it as its chunk finishes
+    Raises KeyError for an unknown policy, and ValueError if max_plies doesn't fit in a record"""
+    if policy not in _POLICY_WEIGHTS:
+        raise KeyError(policy)
+    if not 0 <= max_plies < _NOT_ENTERED:
+        raise ValueError("max_plies must be from 0 to " + str(_NOT_ENTERED - 1))
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    stats = SelfPlayStats()
+    output_file = None
+    if output is not None:
+        output_file = open(output, "wb")
+        output_file.write(_HEADER.pack(_MAGIC, _VERSION, _RECORD.size))
+    try:
+        chunks = ((first_game, min(chunk_size, games - first_game), policy, seed, max_plies) for first_game in range(0, games, chunk_size))
+        for records in imap_bounded(processes, _play_chunk, chunks):
+            stats.add_records(records)
+            if output_file is not None:
+                output_file.write(records)
+    finally:
+        if output_file is not None:
+            output_file.close()
+    return stats.get_stats()
+
+def read_results(path:str):
+    """Yields (plies, game state, captures by color dict, fairy letter -> ply of entry dict) for each game in a file
+    written by simulate, in game order
+    Raises ValueError if the file isn't a self-play results file"""
+    game_states = {code: game_state for game_state, code in _RESULTS.items()}
+    with open(path, "rb") as results_file:
+        header = results_file.read(_HEADER.size)
+        if len(header) != _HEADER.size or _HEADER.unpack(header) != (_MAGIC, _VERSION, _RECORD.size):
+            raise ValueError("not a self-play results file: " + path)
+        while True:
+            records = results_file.read(_RECORD.size * 4096)
+            if not records:
+                return
+            for plies, result, white_captures, black_captures, *entry_plies in _RECORD.iter_unpack(records):
+                yield (
+                    plies,
+                    game_states[result],
+                    {"white": white_captures, "black": black_captures},
+                    {letter: entry_ply for letter, entry_ply in zip(_FAIRY_LETTERS, entry_plies) if entry_ply != _NOT_ENTERED},
+                )
+
+def main(argv = None) -> int:
+    """Runs a simulation from the command line and prints its statistics as JSON"""
+    parser = argparse.ArgumentParser(description="Random self-play for ChessVar")
+    parser.add_argument("games", type=int, help="number of games to play")
+    parser.add_argument("--policy", choices=sorted(_POLICY_WEIGHTS), default="random", help="how moves are chosen (default random)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the run (default 0)")
+    parser.add_argument("--max-plies", type=int, default=_DEFAULT_MAX_PLIES, help="plies after which a game is left unfinished (default 500)")
+    parser.add_argument("--output", help="write the record of every game to this file")
+    parser.add_argument("--processes", type=int, help="worker processes (default one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=_DEFAULT_CHUNK_SIZE, help="games per chunk handed to a worker (default 64)")
+    arguments = parser.parse_args(argv)
+    stats = simulate(arguments.games, arguments.policy, arguments.seed, arguments.max_plies, arguments.output, arguments.processes, arguments.chunk_size)
+    print(json.dumps(stats, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
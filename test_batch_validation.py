@@ -0,0 +1,74 @@
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from batch_validation import POSITION_DTYPE, positions_from_buffer, validate_moves
+from position_encoding import encode_position, encode_positions, decode_position
+from ChessVar import ChessVar, encode_move, encode_drop
+from test_chess import PERFT_POSITIONS, play_moves, play_random_moves
+
+def sample_positions_and_moves(seed):
+    """Returns games at random positions, each paired with a mix of legal moves and random (mostly invalid) moves"""
+    rng = random.Random(seed)
+    games = []
+    for position in PERFT_POSITIONS:
+        game = ChessVar()
+        play_moves(game, position["moves"])
+        games.append(game)
+    for _ in range(40):
+        game = ChessVar()
+        play_random_moves(game, rng, rng.randrange(100))
+        games.append(game)
+
+    positions = []
+    moves = []
+    for game in games:
+        candidates = game.legal_moves()
+        # Legal moves with bits set above the drop flag, or made negative, aren't packed moves
+        candidates += [move | (1 << rng.choice((13, 14, 20))) for move in candidates[:5]]
+        candidates += [move | (-1 << 13) for move in candidates[:3]]
+        candidates += [encode_move(rng.randrange(64), rng.randrange(64)) for _ in range(30)]
+        candidates += [encode_drop(rng.choice("FHfh"), rng.randrange(64)) for _ in range(10)]
+        for move in candidates:
+            positions.append(game)
+            moves.append(move)
+    return positions, moves
+
+class TestBatchValidation:
+    def test_matches_chessvar(self):
+        games, moves = sample_positions_and_moves(20)
+        positions = positions_from_buffer(encode_positions(games))
+        legal, new_positions = validate_moves(positions, moves)
+        assert legal.dtype == bool
+        assert len(legal) == len(new_positions) == len(moves)
+        assert legal.sum() > 0 and (~legal).sum() > 0
+        for index, (game, move) in enumerate(zip(games, moves)):
+            copy = game.clone()
+            assert legal[index] == copy.make_packed_move(move)
+            assert new_positions[index].tobytes() == encode_position(copy)
+
+    def test_game_over(self):
+        game = ChessVar()
+        play_moves(game, ["e2e3", "f7f6", "d1h5", "a7a6"])
+        positions = positions_from_buffer(encode_positions([game, game]))
+        legal, new_positions = validate_moves(positions, [encode_move(31, 4), encode_move(31, 39)])
+        assert legal.tolist() == [True, True]
+        finished = decode_position(new_positions[0].tobytes())
+        assert finished.get_game_state() == "WHITE_WON"
+        assert finished.get_current_turn() == "white"
+        assert decode_position(new_positions[1].tobytes()).get_current_turn() == "black"
+
+        legal, _ = validate_moves(new_positions[:1], [encode_move(8, 16)])
+        assert legal.tolist() == [False]
+
+    def test_positions_dtype(self):
+        assert POSITION_DTYPE.itemsize == len(encode_position(ChessVar()))
+        buffer = encode_positions([ChessVar()] * 3)
+        positions = positions_from_buffer(buffer)
+        assert positions["turns"].tolist() == [0, 0, 0]
+        legal, new_positions = validate_moves(positions, np.array([encode_move(52, 36)] * 3, np.uint16))
+        assert legal.all()
+        assert new_positions["turns"].tolist() == [1, 1, 1]
+        # The input positions are left unchanged
+        assert positions.tobytes() == bytes(buffer)
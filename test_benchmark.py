@@ -0,0 +1,40 @@
+import json
+import pytest
+from benchmark import get_benchmark_names, run_benchmarks, compare_results, format_results, main
+
+def results(**ops_per_sec):
+    """Returns benchmark results with the given operations per second"""
+    return {"version": 1, "python": "", "results": {name: {"ops_per_sec": ops, "operations": 1, "seconds": 1.0} for name, ops in ops_per_sec.items()}}
+
+class TestBenchmark:
+    def test_run_benchmarks(self):
+        names = get_benchmark_names()
+        assert "board_construction" in names
+        assert "valid_destinations.Falcon" in names and "valid_destinations.Hunter" in names
+        current = run_benchmarks(names, min_time=0.001, rounds=1)
+        assert list(current["results"]) == names
+        assert all(result["ops_per_sec"] > 0 and result["operations"] > 0 for result in current["results"].values())
+        with pytest.raises(KeyError):
+            run_benchmarks(["no_such_benchmark"])
+
+    def test_compare_results(self):
+        baseline = results(a=100.0, b=100.0, c=100.0)
+        current = results(a=95.0, b=80.0, c=150.0, d=1.0)
+        assert compare_results(baseline, current, 0.1) == [("b", 100.0, 80.0)]
+        assert compare_results(baseline, current, 0.01) == [("a", 100.0, 95.0), ("b", 100.0, 80.0)]
+        assert "+50.0%" in format_results(current, baseline)
+
+    def test_main(self, tmp_path, capsys):
+        output = tmp_path / "results.json"
+        assert main(["board_construction", "--min-time", "0.001", "--rounds", "1", "--output", str(output)]) == 0
+        written = json.loads(output.read_text())
+        assert list(written["results"]) == ["board_construction"]
+        assert "board_construction" in capsys.readouterr().out
+
+        # A much faster baseline is a regression, a much slower one isn't
+        baseline = tmp_path / "baseline.json"
+        baseline.write_text(json.dumps(results(board_construction=1e12)))
+        assert main(["board_construction", "--min-time", "0.001", "--rounds", "1", "--compare", str(baseline)]) == 1
+        assert "REGRESSION board_construction" in capsys.readouterr().out
+        baseline.write_text(json.dumps(results(board_construction=1.0)))
+        assert main(["board_construction", "--min-time", "0.001", "--rounds", "1", "--compare", str(baseline)]) == 0
@@ -1,13 +1,45 @@
+import json
+import copy
+import os
+import pickle
+import random
 import pytest
 from ChessVar import (
     EmptySquare, Piece, Pawn, Knight, Bishop, 
-    Rook, Queen, King, Falcon, Hunter, Board, ChessVar
+    Rook, Queen, King, Falcon, Hunter, Board, ChessVar,
+    _SLIDER_RAYS, _LEAPER_TARGETS, _PAWN_PUSHES, _MOVE_DROP_FLAG,
+    encode_move, encode_drop, decode_move, move_to_notation, notation_to_move,
 )
+# Random games for the tests are played by the same function as self-play and the benchmarks
+from self_play import play_random_moves
 
 @pytest.fixture
 def board():
     return Board()
 
+with open(os.path.join(os.path.dirname(__file__), "perft_reference.json")) as reference_file:
+    PERFT_POSITIONS = json.load(reference_file)["positions"]
+
+def play_moves(game, moves):
+    """Plays a list of moves written as in move_to_notation ('e2e4' or 'F@c1')"""
+    for move in moves:
+        if move[1] == "@":
+            assert game.enter_fairy_piece(move[0], move[2:])
+        else:
+            assert game.make_move(move[:2], move[2:])
+
+def snapshot(game):
+    """Returns everything about a game's state that a move can change, for comparing before and after"""
+    board = game._board
+    return (
+        list(board._squares),
+        dict(board._color_bitboards), dict(board._piece_bitboards), board._occupied,
+        dict(board._major_pieces_in_play), dict(board._fairy_pieces_in_play),
+        dict(board._avail_fairy_pieces), board._fairy_reserve,
+        board._unmoved_pawns,
+        game._game_state, game._turns, game._current_turn,
+    )
+
 class TestPiece:
     def test_color(self, board):
         assert board._pieces["black rook a"].get_color() == "black"
@@ -15,14 +47,64 @@ class TestPiece:
         assert board._pieces["white falcon"].get_color() == "white"
 
     def test_pawn(self, board):
-        assert board._pieces["black pawn a"]._moves_made == 0
-        board._pieces["black pawn a"].on_move()
-        assert board._pieces["black pawn a"]._moves_made == 1
+        assert board.get_unmoved_pawns() == 0xFF << 48 | 0xFF << 8
+        board.move_piece(0, 1, 0, 2)
+        assert not (board.get_unmoved_pawns() >> 16) & 1
+        assert board.get_unmoved_pawns() == 0xFF << 48 | 0xFE << 8
+
+    def test_shared_pieces(self, board):
+        # Every board shares one immutable object per piece type and color
+        assert board._pieces is Board()._pieces
+        assert board._pieces["black pawn a"] is board._pieces["black pawn h"]
+        assert board.get_piece_at_coord(0, 0) is Board().get_piece_at_coord(7, 0)
+        assert board._pieces["black pawn a"] is not board._pieces["white pawn a"]
+        with pytest.raises(AttributeError):
+            board._pieces["white queen"]._moves_made = 0
+        with pytest.raises(AttributeError):
+            board._pieces["white queen"]._color = "black"
+        with pytest.raises(AttributeError):
+            board._pieces["black pawn a"]._pushes = ()
+        with pytest.raises(AttributeError):
+            del board._pieces["empty"]._letter
+        assert board._pieces["white queen"].get_color() == "white"
+
+    def test_pickled_pieces_shared(self, board):
+        # A pickled piece is just its letter: unpickling gives back the shared piece, not a copy of its move tables
+        for piece_name in ("white pawn a", "black knight b", "white king", "black queen", "white falcon"):
+            piece = board._pieces[piece_name]
+            data = pickle.dumps(piece)
+            assert len(data) < 100
+            assert pickle.loads(data) is piece
+        assert pickle.loads(pickle.dumps(board._pieces["empty"])) is board._pieces["empty"]
+        assert copy.copy(board._pieces["white rook a"]) is board._pieces["white rook a"]
+
+    def test_copied_games_share_pieces(self):
+        # Pickled and deep-copied games hold the same shared pieces, and don't carry copies of the move tables
+        game = ChessVar()
+        play_moves(game, ["e2e4", "d7d5", "e4d5"])
+        data = pickle.dumps(game)
+        assert len(data) < 2000
+        for copied in (pickle.loads(data), copy.deepcopy(game)):
+            assert copied.get_board().get_placement() == game.get_board().get_placement()
+            assert copied.position_hash() == game.position_hash()
+            for square in range(64):
+                assert copied.get_board().get_piece_at_square(square) is game.get_board().get_piece_at_square(square)
+            copied.pop()
+            assert game.get_board().get_placement() != copied.get_board().get_placement()
+
+    def test_new_boards_independent(self):
+        # Boards are copied from one starting board, which their moves must not change
+        first = Board()
+        first.move_piece(4, 6, 4, 4)
+        second = Board()
+        assert second.get_placement() == "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+        assert second.get_unmoved_pawns() == 0xFF << 48 | 0xFF << 8
+        assert second.get_piece_at_coord(4, 6) is second._pieces["white pawn e"]
 
     def test_black_pawn_valid_destinations(self, board):
         pawn_valid_destinations = board._pieces["black pawn a"].get_valid_destinations(0,1,board)
         assert pawn_valid_destinations == [ (0,2), (0,3)]
-        board._pieces["black pawn a"].on_move()
+        board.set_unmoved_pawns(board.get_unmoved_pawns() & ~(1 << 8))
         pawn_valid_destinations = board._pieces["black pawn a"].get_valid_destinations(0,1,board)
         assert pawn_valid_destinations == [(0,2)]
 
@@ -110,6 +192,40 @@ class TestPiece:
         king_valid_destinations = board._pieces["black king"].get_valid_destinations(4,5, board)
         assert king_valid_destinations == [(5,5), (3,5), (4,6), (4,4), (5,6), (3,6),(3,4), (5,4)]
 
+    def test_move_tables(self):
+        # Falcon on e4 (column 4, row 4 = square 36): forward diagonals, straight back
+        assert _SLIDER_RAYS["F"][36] == ((29, 22, 15), (27, 18, 9, 0), (44, 52, 60))
+        assert _SLIDER_RAYS["f"][36] == ((45, 54, 63), (43, 50, 57), (28, 20, 12, 4))
+        # Hunter on a1 can only move forward
+        assert _SLIDER_RAYS["H"][56] == ((48, 40, 32, 24, 16, 8, 0),)
+        assert _LEAPER_TARGETS["N"][62] == (45, 47, 52)
+        assert _PAWN_PUSHES["P"][52] == (44, 36)
+        assert _PAWN_PUSHES["p"][56] == ()
+
+    def test_get_destination_squares(self, board):
+        assert board._pieces["white knight b"].get_destination_squares(57, board) == [40, 42]
+        board.place_fairy_piece("h", 4, 4)
+        assert board._pieces["black hunter"].get_destination_squares(36, board) == [44, 52, 27, 18, 29, 22]
+
+    def test_is_valid_destination(self, board):
+        assert board._pieces["white pawn e"].is_valid_destination(4,6, 4,4, board) == True
+        assert board._pieces["white pawn e"].is_valid_destination(4,6, 4,3, board) == False
+        assert board._pieces["white knight g"].is_valid_destination(6,7, 5,5, board) == True
+        assert board._pieces["white knight g"].is_valid_destination(6,7, 4,6, board) == False
+        assert board._pieces["black rook a"].is_valid_destination(0,0, 0,4, board) == False
+
+        board.move_piece(0,1,0,6)
+        assert board._pieces["black rook a"].is_valid_destination(0,0, 0,4, board) == True
+        assert board._pieces["black rook a"].is_valid_destination(0,0, 0,5, board) == True
+        assert board._pieces["black rook a"].is_valid_destination(0,0, 0,6, board) == False
+        assert board._pieces["black rook a"].is_valid_destination(0,0, 0,7, board) == False
+        assert board._pieces["black rook a"].is_valid_destination(0,0, 1,1, board) == False
+
+        board.place_fairy_piece("F", 2,4)
+        assert board._pieces["white falcon"].is_valid_destination(2,4, 5,1, board) == True
+        assert board._pieces["white falcon"].is_valid_destination(2,4, 2,5, board) == True
+        assert board._pieces["white falcon"].is_valid_destination(2,4, 2,3, board) == False
+
 class TestBoard:
     def test_get_piece_object(self, board):
         assert board.get_piece_object("white pawn a") == board._pieces["white pawn a"]
@@ -131,12 +247,66 @@ class TestBoard:
         assert board.is_piece_in_play("white falcon") == False
         assert board.is_piece_in_play("black king") == True
   
+    def test_piece_index(self, board):
+        assert board.get_piece_coord("black king") == (4,0)
+        assert board.get_piece_coord("white falcon") == None
+        assert board.get_piece_name_at_coord(0,6) == "white pawn"
+        assert board.get_piece_name_at_coord(4,0) == "black king"
+        assert board.get_piece_coord("white pawn h") == (0,6)
+        assert board.get_piece_name_at_coord(0,4) == None
+
+        board.move_piece(3,0,4,7)
+        assert board.get_king_coord("white") == None
+        assert board.get_king_coord("black") == (4,0)
+        assert board.get_piece_coord("black queen") == (4,7)
+        assert board.get_piece_name_at_coord(3,0) == None
+
+        board.place_fairy_piece("h", 3,0)
+        assert board.is_piece_in_play("black hunter") == True
+        assert board.get_piece_coord("black hunter") == (3,0)
+
     def test_move_piece(self, board):
         board.move_piece(0,0,0,6)
         assert board.get_piece_at_coord(0,0) == board._pieces["empty"]
         assert board.get_piece_at_coord(0,6) == board._pieces["black rook a"]
-        assert board.is_piece_in_play("white pawn a") == False
+        assert board.is_piece_in_play("white pawn a") == True
+        board.move_piece(0,6,3,7)
+        assert board.is_piece_in_play("white queen") == False
+        assert board.get_piece_name_at_coord(3,7) == "black rook"
     
+    def test_clone(self, board):
+        board.move_piece(2, 7, 2, 0)
+        board.place_fairy_piece("F", 2, 7)
+        copy = board.clone()
+        assert copy.get_placement() == board.get_placement()
+        assert copy.generate_moves("white") == board.generate_moves("white")
+        copy.move_piece(4, 6, 4, 4)
+        copy.remove_fairy_piece("F", 2, 7)
+        assert board.get_piece_name_at_coord(4, 6) == "white pawn"
+        assert copy.get_piece_name_at_coord(4, 6) is None
+        assert board.get_fairy_reserve() == 2 | 4 | 8
+        assert board.get_fairy_piece_object("F") is None
+        assert (board.get_unmoved_pawns() >> 52) & 1
+        assert copy.get_piece_name_at_coord(4, 4) == "white pawn"
+        assert copy.get_fairy_piece_object("F") is board.get_piece_object("white falcon")
+
+    def test_bitboards(self, board):
+        assert board.get_color_bitboard("black") == 0xFFFF
+        assert board.get_color_bitboard("white") == 0xFFFF << 48
+        assert board.get_occupied_bitboard() == 0xFFFF | (0xFFFF << 48)
+        assert board.get_piece_bitboard("p") == 0xFF00
+        assert board.get_piece_bitboard("K") == 1 << 60
+        assert board.get_piece_bitboard("F") == 0
+
+        board.move_piece(0,0,0,6)
+        assert board.get_piece_bitboard("r") == (1 << 7) | (1 << 48)
+        assert board.get_piece_bitboard("P") == 0xFE << 48
+        assert board.get_color_bitboard("black") == 0xFFFE | (1 << 48)
+
+        board.place_fairy_piece("F", 2,4)
+        assert board.get_piece_bitboard("F") == 1 << 34
+        assert board.get_fairy_reserve() == 0b1110
+
     def test_is_on_board(self, board):
         assert board.is_on_board(0,0) == True
         assert board.is_on_board(1,1) == True
@@ -159,6 +329,41 @@ class TestBoard:
         assert board.count_fairy_pieces("black") == 0
         assert board.count_fairy_pieces("white") == 0
 
+    def test_can_enter_fairy(self, board):
+        assert board.can_enter_fairy("white") == False
+        board.move_piece(2,7,2,0)
+        assert board.count_major_pieces("black") == 6
+        assert board.can_enter_fairy("black") == True
+        assert board.can_enter_fairy("white") == False
+
+        board.place_fairy_piece("f", 2,1)
+        assert board.count_fairy_pieces("black") == 1
+        assert board.can_enter_fairy("black") == False
+
+        board.move_piece(2,0,3,0)
+        assert board.count_major_pieces("black") == 5
+        assert board.can_enter_fairy("black") == True
+        board.place_fairy_piece("h", 3,1)
+        assert board.count_fairy_pieces("black") == 2
+        assert board.can_enter_fairy("black") == False
+
+    def test_generate_moves(self, board):
+        white_moves = [move_to_notation(move) for move in board.generate_moves("white")]
+        assert len(white_moves) == 20
+        assert "e2e4" in white_moves
+        assert "g1f3" in white_moves
+        assert "e2e5" not in white_moves
+
+        # After losing a bishop, black can enter either fairy piece on any empty square of its home ranks
+        board.move_piece(2,7,2,0)
+        board.move_piece(2,0,2,4)
+        board.move_piece(3,1,3,3)
+        black_moves = board.generate_moves("black")
+        assert encode_drop("f", 2) in black_moves
+        assert encode_drop("h", 11) in black_moves
+        assert encode_drop("f", 3) not in black_moves
+        assert len([move for move in black_moves if decode_move(move)[2] is not None]) == 4
+
     def test_falcon(self,board):
         board.place_fairy_piece("F", 2,4)
         assert board._avail_fairy_pieces == {
@@ -186,6 +391,7 @@ class TestChessVar:
     
     def test_translate_string_to_index(self, game):
         assert game._translate_string_to_index("c1") == (2,7)
+        assert game._translate_string_to_index("a10") == None
 
     def test_advance_turn(self, game):
         game._advance_turn()
@@ -210,6 +416,219 @@ class TestChessVar:
         assert game._origin_piece_cant_move(7,7) == True
         assert game._origin_piece_cant_move(0,0) == False
 
+    def test_move_encoding(self):
+        assert decode_move(encode_move(52, 36)) == (52, 36, None)
+        assert decode_move(encode_drop("H", 58)) == (None, 58, "H")
+        assert move_to_notation(encode_move(52, 36)) == "e2e4"
+        assert move_to_notation(encode_drop("h", 2)) == "h@c8"
+        assert notation_to_move("e2e4") == encode_move(52, 36)
+        assert notation_to_move("h@c8") == encode_drop("h", 2)
+        for malformed in ("e2", "e2e9", "x@c1", "F@z1", "e2-e4", None):
+            assert notation_to_move(malformed) == None
+
+    def test_make_packed_move(self, game):
+        assert game.make_packed_move(encode_move(52, 28)) == False
+        assert game.make_packed_move(encode_move(52, 36)) == True
+        assert game.make_packed_move(encode_drop("f", 2)) == False
+        for malformed in (None, -1, 1 << 13, _MOVE_DROP_FLAG | 4 | (2 << 6)):
+            assert game.make_packed_move(malformed) == False
+        assert game.get_turn_count() == 1
+
+    def test_legal_moves(self, game):
+        assert len(game.legal_moves()) == 20
+        game.make_move("e2", "e4")
+        assert len(game.legal_moves()) == 20
+
+        # A pawn that has moved loses its double step
+        game.make_move("a7", "a6")
+        game.make_move("e4", "e5")
+        game.make_move("a6", "a5")
+        white_moves = [move_to_notation(move) for move in game.legal_moves()]
+        assert "e5e6" in white_moves
+        assert "e5e7" not in white_moves
+
+        game._game_state = "WHITE_WON"
+        assert game.legal_moves() == []
+
+    def test_push_pop(self, game):
+        rng = random.Random(162)
+        for _ in range(5):
+            snapshots = []
+            while game.legal_moves() and len(snapshots) < 150:
+                snapshots.append(snapshot(game))
+                game.push(rng.choice(game.legal_moves()))
+            while snapshots:
+                game.pop()
+                assert snapshot(game) == snapshots.pop()
+
+    def test_clone(self, game):
+        play_moves(game, ["e2e4", "d7d5", "e4d5"])
+        before = snapshot(game)
+        copy = game.clone()
+        assert snapshot(copy) == before
+        assert copy.position_hash() == game.position_hash()
+        # Moves made on the copy, including taking back moves made before cloning, don't affect the original
+        assert copy.make_move("d8", "d5") == True
+        copy.pop()
+        copy.pop()
+        assert copy.make_move("e4", "e5") == True
+        assert snapshot(game) == before
+        assert game.perft(2) == game.clone().perft(2)
+
+        # The undo stack is shared until either game changes it, and the original's changes don't reach the copy
+        copy = game.clone()
+        assert copy._undo_stack is game._undo_stack
+        game.pop()
+        assert copy._undo_stack is not game._undo_stack
+        assert len(copy._undo_stack) == 3
+        assert snapshot(copy) == before
+        copy.pop()
+        assert snapshot(copy) == snapshot(game)
+
+    def test_get_valid_destinations(self, game):
+        assert game.get_valid_destinations("e2") == ["e3", "e4"]
+        assert game.get_valid_destinations("g8") == ["f6", "h6"]
+        assert game.get_valid_destinations("e4") == []
+        assert game.get_valid_destinations("z9") == []
+        assert game.get_destination_cache_stats() == None
+
+    def test_destination_cache(self, game):
+        game.enable_destination_cache(max_size=2)
+        assert game.get_valid_destinations("e2") == ["e3", "e4"]
+        assert game.get_valid_destinations("e2") == ["e3", "e4"]
+        assert game.get_destination_cache_stats() == {"hits": 1, "misses": 1, "size": 1, "max_size": 2}
+
+        # A move changes the position, so the cached destinations no longer apply
+        game.make_move("e2", "e3")
+        assert game.get_valid_destinations("e2") == []
+        assert game.get_valid_destinations("e3") == ["e4"]
+        assert game.get_destination_cache_stats() == {"hits": 1, "misses": 3, "size": 2, "max_size": 2}
+        assert game.enter_fairy_piece("f", "e6") == False
+        game.make_move("d7", "d5")
+        assert game.get_valid_destinations("f1") == ["e2", "d3", "c4", "b5", "a6"]
+        assert game.get_valid_destinations("f1") == ["e2", "d3", "c4", "b5", "a6"]
+        assert game.get_destination_cache_stats() == {"hits": 2, "misses": 4, "size": 2, "max_size": 2}
+
+        # Going back to a cached position hits again unless its entry was the least recently used and dropped
+        game.pop()
+        assert game.get_valid_destinations("e3") == ["e4"]
+        assert game.get_destination_cache_stats()["hits"] == 3
+        game.pop()
+        assert game.get_valid_destinations("e2") == ["e3", "e4"]
+        assert game.get_destination_cache_stats()["misses"] == 5
+
+        # Results match the uncached ones over a random game
+        rng = random.Random(21)
+        cached = ChessVar()
+        cached.enable_destination_cache(max_size=100)
+        uncached = ChessVar()
+        squares = [column + row for column in "abcdefgh" for row in "12345678"]
+        for _ in range(60):
+            if not uncached.legal_moves():
+                break
+            for square in rng.sample(squares, 16):
+                assert cached.get_valid_destinations(square) == uncached.get_valid_destinations(square)
+            move = rng.choice(uncached.legal_moves())
+            cached.push(move)
+            uncached.push(move)
+        assert cached.get_destination_cache_stats()["size"] == 100
+        game.disable_destination_cache()
+        assert game.get_destination_cache_stats() == None
+
+    def test_pop_after_make_move(self, game):
+        before = snapshot(game)
+        game.make_move("e2", "e4")
+        assert not (game._board.get_unmoved_pawns() >> 36) & 1
+        assert game.pop() == encode_move(52, 36)
+        assert (game._board.get_unmoved_pawns() >> 52) & 1
+        assert snapshot(game) == before
+        with pytest.raises(IndexError):
+            game.pop()
+
+    def test_position_hash(self, game):
+        start_hash = game.position_hash()
+        assert start_hash == game._compute_position_hash()
+        assert ChessVar().position_hash() == start_hash
+
+        # Transpositions reach the same hash
+        for origin, destination in [("g1", "f3"), ("b8", "c6"), ("f3", "g1"), ("c6", "b8")]:
+            game.make_move(origin, destination)
+            assert game.position_hash() == game._compute_position_hash()
+        assert game.position_hash() == start_hash
+
+        rng = random.Random(3)
+        for _ in range(5):
+            game = ChessVar()
+            while game.legal_moves():
+                game.push(rng.choice(game.legal_moves()))
+                assert game.position_hash() == game._compute_position_hash()
+            while game._undo_stack:
+                game.pop()
+            assert game.position_hash() == start_hash
+
+    def test_position_hash_pawn_double_step(self, game):
+        # Same placement and side to move, but one pawn has lost its double step
+        start_hash = game.position_hash()
+        game._board.set_unmoved_pawns(game._board.get_unmoved_pawns() & ~(1 << 52))
+        assert game._compute_position_hash() != start_hash
+
+    def test_to_position(self, game):
+        assert game.to_position() == "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 0 - FHfh"
+        play_moves(game, ["e2e4", "d7d6", "d1h5", "c8h3", "h5f7", "e8f7", "g2h3"])
+        assert game.to_position() == "rn1q1bnr/ppp1pkpp/3p4/8/4P3/7P/PPPP1P1P/RNB1KBNR b 7 d6,e4,h3 FHfh"
+        play_moves(game, ["f@c8"])
+        assert game.to_position() == "rnfq1bnr/ppp1pkpp/3p4/8/4P3/7P/PPPP1P1P/RNB1KBNR w 8 d6,e4,h3 FHh"
+
+    def test_from_position(self):
+        for position in PERFT_POSITIONS:
+            played = ChessVar()
+            play_moves(played, position["moves"])
+            loaded = ChessVar.from_position(played.to_position())
+            assert loaded.to_position() == played.to_position()
+            assert loaded.position_hash() == played.position_hash()
+            assert sorted(loaded.legal_moves()) == sorted(played.legal_moves())
+            assert loaded.perft(2) == position["perft"][1]
+
+        # Moved pawns lose their double step
+        game = ChessVar.from_position("4k3/8/8/8/4P3/8/P7/4K3 b 13 e4 h")
+        board = game.get_board()
+        assert board.get_piece_name_at_coord(4, 4) == "white pawn"
+        assert board.get_unmoved_pawns() == 1 << 48
+        assert game.get_current_turn() == "black"
+        assert game._turns == 13
+        assert game.get_game_state() == "UNFINISHED"
+        assert board.get_fairy_reserve() == 8
+        assert board.count_major_pieces("black") == 0
+        assert game.can_enter_fairy("black") == True
+        assert game.can_enter_fairy("white") == False
+        assert game.enter_fairy_piece("h", "e7") == True
+        assert game.make_move("a2", "a4") == True
+        assert game.make_move("e7", "e4") == True
+
+        # A missing king decides the game
+        assert ChessVar.from_position("8/8/8/8/8/8/8/4K3 w 10 - -").get_game_state() == "WHITE_WON"
+        assert ChessVar.from_position("4k3/8/8/8/8/8/8/8 b 9 - -").get_game_state() == "BLACK_WON"
+
+    @pytest.mark.parametrize("position", [
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 0 -",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w 0 - FHfh",
+        "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w 0 - FHfh",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w 0 - FHfh",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x 0 - FHfh",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w -1 - FHfh",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR b 0 - FHfh",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 0 e4 FHfh",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 0 - FFhf",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 0 - FHfx",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RFBQKBNR w 0 - FHfh",
+        "rnbqkbnr/pppppppp/8/8/8/2N5/PPPPPPPP/RNBQKBNR w 0 - FHfh",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNK w 0 - FHfh",
+        "8/8/8/8/8/8/8/8 w 0 - -",
+    ])
+    def test_from_position_invalid(self, position):
+        with pytest.raises(ValueError):
+            ChessVar.from_position(position)
+
     def test_enter_fairy_piece(self, game):
         assert game.enter_fairy_piece("f", "g2") == False
         assert game.enter_fairy_piece("F", "c2") == False
@@ -238,5 +657,70 @@ class TestChessVar:
         game._board.move_piece(2,7, 2,4)
         game._current_turn = "white"
         assert game.enter_fairy_piece("F", "c1") == False
-
-
+        assert game.can_enter_fairy("white") == False
+        assert game.can_enter_fairy("black") == True
+
+    @pytest.mark.parametrize("square", ["a10", "z1", "a0", "e", "", "E2", "e2 "])
+    def test_malformed_squares(self, game, square):
+        before = game.to_position()
+        assert game.make_move(square, "e4") == False
+        assert game.make_move("e2", square) == False
+        assert game.enter_fairy_piece("F", square) == False
+        assert game.get_valid_destinations(square) == []
+        assert game.to_position() == before
+
+    def test_make_move_idx(self, game):
+        assert game.make_move_idx(52, 36) == True
+        assert game.to_position() == "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b 1 e4 FHfh"
+        assert game.make_move_idx(52, 36) == False
+        for origin, destination in [(-1, 20), (12, 64), (12, 28.0), ("e7", 28), (None, 28)]:
+            assert game.make_move_idx(origin, destination) == False
+        assert game.make_move_idx(12, 28) == True
+        assert game.get_turn_count() == 2
+
+    def test_enter_fairy_piece_idx(self, game):
+        game._board.move_piece(2, 7, 2, 0)
+        game._board.move_piece(7, 0, 7, 7)
+        assert game.enter_fairy_piece_idx("F", 7) == False
+        assert game.enter_fairy_piece_idx("F", 64) == False
+        assert game.enter_fairy_piece_idx("F", "c1") == False
+        assert game.enter_fairy_piece_idx("X", 58) == False
+        assert game.enter_fairy_piece_idx("F", 58) == True
+        assert game.get_board().get_piece_at_square(58).get_letter() == "F"
+        assert game.get_current_turn() == "black"
+
+
+
+class TestPerft:
+    @pytest.mark.parametrize("position", PERFT_POSITIONS, ids=[position["name"] for position in PERFT_POSITIONS])
+    def test_perft(self, position):
+        game = ChessVar()
+        play_moves(game, position["moves"])
+        before = snapshot(game)
+        for depth, expected in enumerate(position["perft"], start=1):
+            # Deeper counts are kept in the reference file for benchmarking
+            if expected > 100000:
+                break
+            assert game.perft(depth) == expected
+        assert snapshot(game) == before
+
+    def test_perft_divide(self):
+        game = ChessVar()
+        divide = game.perft_divide(3)
+        assert len(divide) == 20
+        assert divide["e2e4"] == 600
+        assert divide["g1f3"] == 440
+        assert sum(divide.values()) == game.perft(3)
+        assert game.perft(0) == 1
+
+    def test_perft_invalid_depth(self):
+        game = ChessVar()
+        play_moves(game, ["e2e4"])
+        before = snapshot(game)
+        with pytest.raises(ValueError):
+            game.perft(-1)
+        with pytest.raises(ValueError):
+            game.perft_divide(0)
+        with pytest.raises(ValueError):
+            game.perft_divide(-2)
+        assert snapshot(game) == before
@@ -0,0 +1,86 @@
+import random
+import pytest
+import game_database
+from game_database import GameDatabase, write_database
+from ChessVar import ChessVar, encode_move, encode_drop
+from test_chess import play_random_moves
+
+@pytest.fixture
+def games():
+    rng = random.Random(11)
+    games = [play_random_moves(ChessVar(), rng, rng.randrange(1, 80)) for _ in range(30)]
+    # Games sharing an opening, one with a fairy piece entry, and an empty game
+    e4 = encode_move(52, 36)
+    games.append([e4, encode_move(11, 27), encode_move(36, 27), encode_move(3, 27)])
+    games.append([
+        e4, encode_move(11, 27), encode_move(36, 27), encode_move(3, 27),
+        encode_move(57, 42), encode_move(27, 48), encode_move(56, 48), encode_drop("f", 3),
+    ])
+    games.append([])
+    return games
+
+@pytest.fixture
+def database(tmp_path, games):
+    path = str(tmp_path / "games.db")
+    assert write_database(path, games, opening_plies=3) == len(games)
+    with GameDatabase(path) as database:
+        yield database
+
+class TestGameDatabase:
+    def test_moves(self, database, games):
+        assert database.get_game_count() == len(games)
+        assert database.get_opening_plies() == 3
+        for game_number, moves in enumerate(games):
+            assert database.get_moves(game_number) == moves
+        with pytest.raises(IndexError):
+            database.get_moves(len(games))
+
+    def test_replay(self, database, games):
+        game = ChessVar()
+        for move in games[31]:
+            game.push(move)
+        assert database.replay(31).to_position() == game.to_position()
+        assert database.replay(31, 0).to_position() == ChessVar().to_position()
+        assert database.replay(32).to_position() == ChessVar().to_position()
+
+    def test_find_position(self, database, games):
+        for game_number, moves in enumerate(games):
+            game = ChessVar()
+            for move in moves:
+                game.push(move)
+                assert game_number in database.find_position(game.position_hash())
+        after_queen_takes = database.replay(30).position_hash()
+        assert database.find_position(after_queen_takes) == [30, 31]
+        assert database.find_position(database.replay(31).position_hash()) == [31]
+        assert database.find_position(0) == []
+        # Every game starts at the starting position, including the empty game
+        assert database.find_position(ChessVar().position_hash()) == list(range(len(games)))
+
+    def test_find_opening(self, database, games):
+        for moves in (games[30][:1], games[30][:3], games[30], games[31], games[5][:2]):
+            expected = [game_number for game_number, game_moves in enumerate(games) if game_moves[:len(moves)] == moves]
+            assert database.find_opening(moves) == expected
+        assert 30 in database.find_opening(games[30][:1])
+        assert database.find_opening(games[31]) == [31]
+        assert database.find_opening([]) == list(range(len(games)))
+
+    def test_sorted_on_disk(self, tmp_path, games, database, monkeypatch):
+        # With tiny sort runs, the index entries are spilled and merged, and the file comes out the same
+        monkeypatch.setattr(game_database, "_SORT_RUN_ENTRIES", 7)
+        monkeypatch.setattr(game_database, "_MERGE_READ_ENTRIES", 3)
+        monkeypatch.setattr(game_database, "_WRITE_BATCH_SIZE", 5)
+        path = tmp_path / "spilled.db"
+        write_database(str(path), games, opening_plies=3)
+        assert path.read_bytes() == (tmp_path / "games.db").read_bytes()
+        assert sorted(entry.name for entry in tmp_path.iterdir()) == ["games.db", "spilled.db"]
+
+    def test_invalid(self, tmp_path):
+        path = str(tmp_path / "invalid.db")
+        with pytest.raises(ValueError):
+            write_database(path, [[encode_move(52, 28)]])
+        with pytest.raises(ValueError):
+            write_database(path, [[encode_drop("F", 58)]])
+        with open(path, "wb") as database_file:
+            database_file.write(b"not a database")
+        with pytest.raises(ValueError):
+            GameDatabase(path)
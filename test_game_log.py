@@ -0,0 +1,84 @@
+import random
+from game_log import parse_line, validate_game, ingest, ingest_file, imap_bounded
+from ChessVar import ChessVar, move_to_notation
+from test_chess import play_random_moves
+
+def random_log(count, seed):
+    """Returns log lines of random games, some with an invalid move appended"""
+    rng = random.Random(seed)
+    lines = []
+    for game_number in range(count):
+        moves = play_random_moves(ChessVar(), rng, rng.randrange(60))
+        notation = [move_to_notation(move) for move in moves]
+        if game_number % 3 == 0:
+            notation.append("a1a1")
+        lines.append("game" + str(game_number) + " " + " ".join(notation) + "\n")
+    return lines
+
+class TestGameLog:
+    def test_parse_line(self):
+        assert parse_line("g1 e2e4 e7e5\n") == ("g1", ["e2e4", "e7e5"])
+        assert parse_line("g2\n") == ("g2", [])
+        assert parse_line("   \n") == None
+        assert parse_line("# comment\n") == None
+
+    def test_validate_game(self):
+        result = validate_game("g1", ["e2e4", "d7d5", "e4d5", "d8d5"])
+        assert result == {
+            "game_id": "g1",
+            "plies": 4,
+            "illegal_ply": None,
+            "game_state": "UNFINISHED",
+            "winner": None,
+            "position": "rnb1kbnr/ppp1pppp/8/3q4/8/8/PPPP1PPP/RNBQKBNR w 4 - FHfh",
+        }
+        assert validate_game("g2", ["e2e4", "e2e4", "d7d5"])["illegal_ply"] == 1
+        assert validate_game("g3", ["F@c1"])["illegal_ply"] == 0
+        for malformed in ("e2", "e2e9", "x@c1", "F@z1", "e2-e4"):
+            result = validate_game("g4", ["e2e4", malformed])
+            assert result["illegal_ply"] == 1
+            assert result["plies"] == 1
+
+        result = validate_game("g5", ["e2e3", "f7f6", "d1h5", "a7a6", "h5e8", "a6a5"])
+        assert result["game_state"] == "WHITE_WON"
+        assert result["winner"] == "white"
+        assert result["plies"] == 5
+        assert result["illegal_ply"] == 5
+
+    def test_ingest(self):
+        lines = random_log(30, 4)
+        lines.insert(5, "\n")
+        lines.insert(9, "# skipped\n")
+        expected = list(ingest(lines, processes=1))
+        assert [result["game_id"] for result in expected] == ["game" + str(number) for number in range(30)]
+        assert all(result["illegal_ply"] is not None for result in expected[::3])
+        assert list(ingest(lines, processes=2, chunk_size=4)) == expected
+
+    def test_ingest_is_lazy(self):
+        lines_read = []
+        def lines():
+            for number in range(1000):
+                lines_read.append(number)
+                yield "game" + str(number) + " e2e4\n"
+        results = ingest(lines(), processes=1, chunk_size=10)
+        assert next(results)["game_id"] == "game0"
+        assert len(lines_read) == 10
+
+    def test_ingest_file(self, tmp_path):
+        path = tmp_path / "games.log"
+        path.write_text("".join(random_log(10, 8)))
+        assert list(ingest_file(str(path), processes=1)) == list(ingest(random_log(10, 8), processes=1))
+
+    def test_imap_bounded(self):
+        tasks_read = []
+        def tasks():
+            for number in range(100):
+                tasks_read.append(number)
+                yield number, 2
+        assert list(imap_bounded(1, pow, tasks())) == [number ** 2 for number in range(100)]
+        tasks_read.clear()
+        results = imap_bounded(2, pow, tasks())
+        assert next(results) == 0
+        # Only a few tasks per process are read ahead
+        assert len(tasks_read) == 8
+        assert list(results) == [number ** 2 for number in range(1, 100)]
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from game_server import GameServer
+from ChessVar import ChessVar
+
+START_POSITION = ChessVar().to_position()
+
+@pytest.fixture
+def server():
+    return GameServer(idle_timeout=60)
+
+class TestGameServer:
+    def test_handle_line(self, server):
+        assert server.handle_line("NEW") == "OK 1"
+        assert server.handle_line("new\n") == "OK 2"
+        assert server.handle_line("MOVE 1 e2 e4") == "OK"
+        assert server.handle_line("MOVE 1 e2 e4") == "INVALID"
+        assert server.handle_line("MOVE 1 z9 e4") == "INVALID"
+        assert server.handle_line("MOVE 1 e77 e5") == "INVALID"
+        assert server.handle_line("ENTER 1 f c8") == "INVALID"
+        assert server.handle_line("STATE 1") == "OK UNFINISHED black"
+        assert server.handle_line("STATE 2") == "OK UNFINISHED white"
+        assert server.handle_line("BOARD 2") == "OK " + START_POSITION
+        assert server.handle_line("BOARD 3") == "ERR no session 3"
+        assert server.handle_line("MOVE 1 e2") == "ERR MOVE takes 3 arguments"
+        assert server.handle_line("JUMP 1") == "ERR unknown command JUMP"
+        assert server.handle_line("") == "ERR empty request"
+        assert server.handle_line("CLOSE 2") == "OK"
+        assert server.handle_line("STATE 2") == "ERR no session 2"
+
+    def test_eviction(self, server):
+        for _ in range(3):
+            server.handle_line("NEW")
+        server.handle_line("MOVE 1 e2 e4")
+        server.handle_line("MOVE 1 d7 d5")
+        position = server.get_session("1").to_position()
+        assert server.evict_idle_sessions() == 0
+        assert server.evict_idle_sessions(now=max(server._last_used.values()) + 60) == 3
+        assert server.get_stats() == {"sessions": 0, "evicted_sessions": 3, "watched_sessions": 0}
+
+        # An evicted session is restored when it's used again
+        assert server.handle_line("BOARD 1") == "OK " + position
+        assert server.handle_line("MOVE 1 e4 d5") == "OK"
+        assert server.get_stats() == {"sessions": 1, "evicted_sessions": 2, "watched_sessions": 0}
+        assert server.handle_line("CLOSE 2") == "OK"
+        assert server.get_stats() == {"sessions": 1, "evicted_sessions": 1, "watched_sessions": 0}
+
+    def test_connections(self, server, tmp_path):
+        async def talk():
+            tcp_server = await server.start("127.0.0.1", 0)
+            unix_server = await server.start(path=str(tmp_path / "chess.sock"))
+            port = tcp_server.sockets[0].getsockname()[1]
+            player_reader, player_writer = await asyncio.open_connection("127.0.0.1", port)
+            watcher_reader, watcher_writer = await asyncio.open_unix_connection(str(tmp_path / "chess.sock"))
+
+            # Several requests sent at once get their replies in order
+            player_writer.write(b"NEW\nMOVE 1 e2 e4\nSTATE 1\n")
+            replies = [(await player_reader.readline()).decode() for _ in range(3)]
+            assert replies == ["OK 1\n", "OK\n", "OK UNFINISHED black\n"]
+
+            watcher_writer.write(b"WATCH 1\n")
+            assert await watcher_reader.readline() == b"OK\n"
+            player_writer.write(b"MOVE 1 d7 d5\nMOVE 1 e4 d5\n")
+            assert [await player_reader.readline() for _ in range(2)] == [b"OK\n", b"OK\n"]
+            # Both moves were answered in one pass, so the watcher only gets the latest position
+            update = (await watcher_reader.readline()).decode()
+            assert update == "UPDATE 1 " + server.get_session("1").to_position() + "\n"
+            assert server.get_stats()["watched_sessions"] == 1
+
+            watcher_writer.close()
+            player_writer.close()
+            await watcher_writer.wait_closed()
+            await player_writer.wait_closed()
+            await asyncio.sleep(0.05)
+            assert server.get_stats()["watched_sessions"] == 0
+            server.stop()
+            tcp_server.close()
+            unix_server.close()
+            await tcp_server.wait_closed()
+            await unix_server.wait_closed()
+        asyncio.run(talk())
@@ -0,0 +1,82 @@
+import pytest
+import instrumentation
+import ChessVar as chess_module
+from ChessVar import ChessVar, Board, Rook
+from test_chess import PERFT_POSITIONS, play_moves
+
+@pytest.fixture
+def counters():
+    instrumentation.reset_counters()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset_counters()
+
+class TestInstrumentation:
+    def test_off_by_default(self):
+        originals = (ChessVar.make_move_idx, ChessVar.enter_fairy_piece_idx, Board.is_piece_in_play, Rook.get_destination_squares, chess_module._walk_rays)
+        assert instrumentation.is_enabled() == False
+        instrumentation.enable()
+        instrumentation.enable()
+        assert instrumentation.is_enabled() == True
+        assert ChessVar.make_move_idx is not originals[0]
+        instrumentation.disable()
+        assert (ChessVar.make_move_idx, ChessVar.enter_fairy_piece_idx, Board.is_piece_in_play, Rook.get_destination_squares, chess_module._walk_rays) == originals
+        # Inherited methods are inherited again, rather than copied onto the piece class
+        assert "get_destination_squares" not in vars(Rook)
+
+    def test_counters(self, counters):
+        game = ChessVar()
+        assert game.make_move("e2", "e4") == True
+        assert game.make_move("e2", "e4") == False
+        assert game.make_move_idx(12, 28) == True
+        assert game.enter_fairy_piece("F", "c1") == False
+        assert game.get_valid_destinations("a1") == []
+        assert game.get_valid_destinations("d1") == ["e2", "f3", "g4", "h5"]
+        counts = {name: counter["calls"] for name, counter in instrumentation.get_counters().items()}
+        assert counts["make_move.accepted"] == 2
+        assert counts["make_move.rejected"] == 1
+        assert counts["enter_fairy_piece.rejected"] == 1
+        assert counts["enter_fairy_piece.accepted"] == 0
+        assert counts["valid_destinations.Rook"] == 1
+        assert counts["valid_destinations.Queen"] == 1
+        assert counts["valid_destinations.Pawn"] == 0
+        # Two accepted moves check for both kings
+        assert counts["is_piece_in_play"] == 4
+        # The rook's two rays stop at a2 and b1; the queen's stop at c1, c2, d2 and e1, and run from e2 to h5
+        ray_walks = instrumentation.get_counters()["ray_walks"]
+        assert ray_walks["calls"] == 2
+        assert ray_walks["squares"] == 2 + 8
+        assert all(counter["seconds"] >= 0 for counter in instrumentation.get_counters().values())
+
+    def test_legal_moves(self, counters):
+        game = ChessVar()
+        play_moves(game, ["e2e4", "e7e5"])
+        instrumentation.reset_counters()
+        moves = game.legal_moves()
+        counts = instrumentation.get_counters()
+        assert counts["valid_destinations.Pawn"]["calls"] == 8
+        assert counts["valid_destinations.Knight"]["calls"] == 2
+        assert counts["ray_walks"]["calls"] == 5
+        assert counts["make_move.accepted"]["calls"] == 0
+        assert len(moves) == 29
+
+    def test_same_moves(self):
+        # The counting copy of the ray walk finds the same moves as the original
+        instrumentation.enable()
+        try:
+            for position in PERFT_POSITIONS:
+                game = ChessVar()
+                play_moves(game, position["moves"])
+                assert game.perft(2) == position["perft"][1]
+            assert instrumentation.get_counters()["ray_walks"]["squares"] > 0
+        finally:
+            instrumentation.disable()
+            instrumentation.reset_counters()
+
+    def test_reset_counters(self, counters):
+        game = ChessVar()
+        game.make_move("e2", "e4")
+        instrumentation.reset_counters()
+        assert all(counter["calls"] == 0 and counter["seconds"] == 0 for counter in instrumentation.get_counters().values())
+        assert instrumentation.get_counters()["ray_walks"]["squares"] == 0
@@ -0,0 +1,82 @@
+import random
+import pytest
+from position_encoding import (
+    RECORD_SIZE, encode_position, encode_position_into, encode_positions,
+    count_positions, get_record, get_position_key, decode_position, iter_positions,
+)
+from ChessVar import ChessVar
+from test_chess import PERFT_POSITIONS, play_moves, play_random_moves
+
+def random_games(count, seed):
+    """Returns games played out to a random number of random moves"""
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = ChessVar()
+        play_random_moves(game, rng, rng.randrange(120))
+        games.append(game)
+    return games
+
+class TestPositionEncoding:
+    def test_record_size(self):
+        assert RECORD_SIZE == 48
+        assert len(encode_position(ChessVar())) == RECORD_SIZE
+
+    def test_round_trip(self):
+        games = []
+        for position in PERFT_POSITIONS:
+            game = ChessVar()
+            play_moves(game, position["moves"])
+            games.append(game)
+        games.extend(random_games(40, 5))
+        for game in games:
+            decoded = decode_position(encode_position(game))
+            assert decoded.to_position() == game.to_position()
+            assert decoded.position_hash() == game.position_hash()
+            assert decoded.get_game_state() == game.get_game_state()
+            assert sorted(decoded.legal_moves()) == sorted(game.legal_moves())
+
+    def test_many_positions_in_one_buffer(self):
+        games = random_games(25, 7)
+        buffer = encode_positions(games)
+        assert len(buffer) == 25 * RECORD_SIZE
+        assert count_positions(buffer) == 25
+        assert [game.to_position() for game in iter_positions(memoryview(buffer))] == [game.to_position() for game in games]
+        assert decode_position(bytes(buffer), 12).to_position() == games[12].to_position()
+        assert get_record(buffer, 3) == encode_position(games[3])
+
+        # Records can be written in place
+        encode_position_into(ChessVar(), buffer, 3)
+        assert decode_position(buffer, 3).to_position() == ChessVar().to_position()
+
+    def test_equal_positions_equal_records(self):
+        game = ChessVar()
+        start = encode_position(game)
+        play_moves(game, ["g1f3", "b8c6", "f3g1", "c6b8"])
+        # The records differ by turn count, but the positions are the same
+        assert encode_position(game) != start
+        assert get_position_key(encode_position(game)) == get_position_key(start)
+        assert len(get_position_key(start)) == RECORD_SIZE - 5
+        buffer = encode_positions([ChessVar(), game])
+        assert get_position_key(buffer, 1) == get_position_key(buffer, 0)
+        assert get_position_key(buffer, 1) != get_position_key(encode_position(ChessVar.from_position("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR b 1 - FHfh")))
+        assert encode_position(ChessVar.from_position(game.to_position())) == encode_position(game)
+        while game._undo_stack:
+            game.pop()
+        assert encode_position(game) == start
+
+    def test_invalid_records(self):
+        record = bytearray(encode_position(ChessVar()))
+        record[20] = 0xFF
+        with pytest.raises(ValueError):
+            decode_position(record)
+
+        record = bytearray(encode_position(ChessVar()))
+        record[32] = 0
+        with pytest.raises(ValueError):
+            decode_position(record)
+
+        record = bytearray(encode_position(ChessVar()))
+        record[32] = record[33] = 0xFF
+        with pytest.raises(ValueError):
+            decode_position(record)
@@ -0,0 +1,116 @@
+import time
+import pytest
+from ChessVar import ChessVar, encode_move
+from search import Searcher, ParallelSearcher, evaluate, WIN_SCORE
+from transposition import EXACT, LOWER_BOUND
+from test_chess import snapshot
+
+@pytest.fixture
+def game():
+    return ChessVar()
+
+class TestSearch:
+    def test_evaluate(self, game):
+        assert evaluate(game) == 0
+        game.get_board().move_piece(3,7,3,1)
+        assert evaluate(game) == 100
+        game._advance_turn()
+        assert evaluate(game) == -100
+
+    def test_finds_king_capture(self, game):
+        # White queen on h5 with the f7 pawn gone: Qxe8 wins at once
+        game.get_board().move_piece(3,7,7,3)
+        game.get_board().move_piece(5,1,5,3)
+        move = game.best_move(depth=3)
+        assert move == encode_move(31, 4)
+        stats = game.get_search_stats()
+        assert stats["score"] == WIN_SCORE - 1
+        assert stats["best_move"] == move
+
+    def test_avoids_losing_the_king(self, game):
+        # Black to move; the white queen threatens the king, which has to be dealt with
+        game.get_board().move_piece(3,7,7,3)
+        game.get_board().move_piece(5,1,5,3)
+        game._advance_turn()
+        move = game.best_move(depth=2)
+        game.push(move)
+        assert encode_move(31, 4) not in game.legal_moves()
+
+    def test_leaves_game_unchanged(self, game):
+        game.make_move("e2", "e4")
+        before = snapshot(game)
+        position_hash = game.position_hash()
+        move = game.best_move(time_limit=0.2)
+        assert move in game.legal_moves()
+        assert snapshot(game) == before
+        assert game.position_hash() == position_hash
+
+    def test_stats(self, game):
+        searcher = Searcher(size_mb=1)
+        move = searcher.search(game, depth=2)
+        stats = searcher.get_stats()
+        assert stats["best_move"] == move
+        assert stats["depth"] == 2
+        assert stats["nodes"] > 20
+        assert stats["nodes_per_second"] > 0
+
+    def test_no_moves_when_game_over(self, game):
+        game._game_state = "WHITE_WON"
+        assert game.best_move(depth=2) == None
+
+class TestParallelSearch:
+    def test_finds_king_capture(self, game):
+        game.get_board().move_piece(3,7,7,3)
+        game.get_board().move_piece(5,1,5,3)
+        with ParallelSearcher(processes=2, size_mb=1) as searcher:
+            move = searcher.search(game, depth=2)
+            assert move == encode_move(31, 4)
+            assert searcher.get_stats()["processes"] == 2
+
+    def test_matches_single_process_score(self, game):
+        game.make_move("e2", "e4")
+        game.make_move("d7", "d5")
+        searcher = Searcher(size_mb=1)
+        searcher.search(game, depth=2)
+        before = snapshot(game)
+        with ParallelSearcher(processes=2, size_mb=1) as parallel_searcher:
+            move = parallel_searcher.search(game, depth=2)
+            stats = parallel_searcher.get_stats()
+        assert move in game.legal_moves()
+        assert stats["depth"] == 2
+        assert stats["score"] == searcher.get_stats()["score"]
+        assert stats["nodes"] > 0
+        assert snapshot(game) == before
+
+    def test_best_move_with_processes(self, game):
+        move = game.best_move(depth=1, processes=2)
+        assert move in game.legal_moves()
+        assert game.get_search_stats()["processes"] == 2
+
+        # A long-lived searcher keeps its pool between moves
+        with ParallelSearcher(2) as parallel_searcher:
+            for _ in range(2):
+                move = game.best_move(depth=1, searcher=parallel_searcher)
+                assert game.get_search_stats()["processes"] == 2
+                game.push(move)
+
+    def test_time_limit(self, game):
+        # Every worker searches one share against one deadline, so the search ends close to the time limit
+        with ParallelSearcher(processes=2, size_mb=1) as parallel_searcher:
+            parallel_searcher.search(game, depth=1)
+            start = time.perf_counter()
+            move = parallel_searcher.search(game, time_limit=0.5)
+            elapsed = time.perf_counter() - start
+            assert move in game.legal_moves()
+            assert elapsed < 1.5
+            assert parallel_searcher.get_stats()["depth"] >= 1
+            assert parallel_searcher._generation == 2
+
+    def test_root_entry_bound(self, game):
+        # A search of only some of the root moves stores the root's score as a lower bound, not as exact
+        searcher = Searcher()
+        searcher.search(game, depth=2, root_moves=game.legal_moves()[:3])
+        assert searcher._table.probe(game.position_hash())[2] == LOWER_BOUND
+        searcher = Searcher()
+        searcher.search(game, depth=2)
+        assert searcher._table.probe(game.position_hash())[2] == EXACT
@@ -0,0 +1,66 @@
+import random
+import pytest
+from ChessVar import ChessVar
+from self_play import play_random_moves, play_game, simulate, read_results, SelfPlayStats, _play_chunk
+
+class TestSelfPlay:
+    def test_play_game(self):
+        plies, game_state, captures, entry_plies = play_game(random.Random(3))
+        assert (plies, game_state, captures, entry_plies) == play_game(random.Random(3))
+        assert game_state in ("WHITE_WON", "BLACK_WON")
+        assert 0 < captures["white"] + captures["black"] <= 32
+        assert all(letter in "FHfh" and 0 <= ply < plies for letter, ply in entry_plies.items())
+        # White moves on even plies, black on odd ones
+        assert all((ply % 2 == 0) == letter.isupper() for letter, ply in entry_plies.items())
+
+        assert play_game(random.Random(3), max_plies=4) == (4, "UNFINISHED", {"white": 0, "black": 0}, {})
+        with pytest.raises(KeyError):
+            play_game(random.Random(3), policy="greedy")
+
+    def test_play_random_moves(self):
+        game = ChessVar()
+        moves = play_random_moves(game, random.Random(3), 10)
+        assert len(moves) == 10 and game.get_turn_count() == 10
+        assert moves == play_random_moves(ChessVar(), random.Random(3), 10)
+        # The game ends early when a king is captured
+        moves = play_random_moves(game, random.Random(3), 10000)
+        assert len(moves) < 10000 and game.get_game_state() != "UNFINISHED"
+        assert play_random_moves(game, random.Random(3), 5) == []
+
+    def test_weighted_policy(self):
+        plies, game_state, captures, _ = play_game(random.Random(5), policy="weighted")
+        assert game_state != "UNFINISHED"
+        assert captures["white"] + captures["black"] > 0
+
+    def test_simulate(self, tmp_path):
+        output = tmp_path / "games.selfplay"
+        stats = simulate(40, policy="weighted", seed=7, output=str(output), processes=1, chunk_size=16)
+        assert stats["games"] == 40
+        assert sum(stats["results"].values()) == 40
+        assert stats["win_rates"]["white"] + stats["win_rates"]["black"] == pytest.approx(1 - stats["results"]["unfinished"] / 40)
+        assert stats["plies"]["min"] <= stats["plies"]["mean"] <= stats["plies"]["max"]
+        assert set(stats["fairy_entries"]) == set("FHfh")
+
+        # The file holds every game in order, and the games don't depend on how many processes play them
+        games = list(read_results(str(output)))
+        assert len(games) == 40
+        assert games[20] == play_game(random.Random(7 * 1_000_003 + 20), "weighted")
+        assert simulate(40, policy="weighted", seed=7, processes=2, chunk_size=8) == stats
+        assert simulate(40, policy="weighted", seed=8, processes=1) != stats
+
+    def test_stats(self):
+        stats = SelfPlayStats()
+        assert stats.get_stats()["plies"]["mean"] == None
+        stats.add_records(_play_chunk(0, 5, "random", 1, 500))
+        stats.add_records(_play_chunk(5, 5, "random", 1, 500))
+        assert stats.get_stats() == simulate(10, seed=1, processes=1, chunk_size=3)
+
+    def test_invalid_arguments(self, tmp_path):
+        with pytest.raises(KeyError):
+            simulate(1, policy="greedy", processes=1)
+        with pytest.raises(ValueError):
+            simulate(1, max_plies=70000, processes=1)
+        not_results = tmp_path / "other"
+        not_results.write_bytes(b"CVGD0000")
+        with pytest.raises(ValueError):
+            list(read_results(str(not_results)))
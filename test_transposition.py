@@ -0,0 +1,78 @@
+import pytest
+from transposition import (
+    TranspositionTable, table_size_in_bytes,
+    EXACT, LOWER_BOUND, UPPER_BOUND,
+)
+from ChessVar import ChessVar
+
+@pytest.fixture
+def table():
+    return TranspositionTable(size_mb=1)
+
+class TestTranspositionTable:
+    def test_size(self, table):
+        assert table_size_in_bytes(1) == 1024 * 1024
+        assert table_size_in_bytes(1.5) == 1024 * 1024
+        assert table.get_capacity() == 1024 * 1024 // 16
+
+    def test_store_and_probe(self, table):
+        game = ChessVar()
+        key = game.position_hash()
+        assert table.probe(key) == None
+
+        table.store(key, 5, -120, LOWER_BOUND, 2100)
+        assert table.probe(key) == (5, -120, LOWER_BOUND, 2100)
+        table.store(key, 3, 40, EXACT)
+        assert table.probe(key) == (3, 40, EXACT, None)
+        assert table.probe(key ^ 1) == None
+
+    def test_replacement(self):
+        table = TranspositionTable(size_mb=0)
+        assert table.get_capacity() == 2
+        # Every key lands in the single bucket
+        table.store(1, 6, 10, EXACT, 1)
+        table.store(2, 2, 20, UPPER_BOUND, 2)
+        assert table.probe(1) == (6, 10, EXACT, 1)
+        assert table.probe(2) == (2, 20, UPPER_BOUND, 2)
+
+        # A shallower result doesn't replace the deep entry, only the always-replace slot
+        table.store(3, 1, 30, EXACT, 3)
+        assert table.probe(1) == (6, 10, EXACT, 1)
+        assert table.probe(2) == None
+        assert table.probe(3) == (1, 30, EXACT, 3)
+
+        # A deeper result, or any result in a new search, takes the depth-preferred slot
+        table.store(4, 7, 40, EXACT, 4)
+        assert table.probe(1) == None
+        table.new_search()
+        table.store(5, 0, 50, EXACT, 5)
+        assert table.probe(4) == None
+        assert table.probe(5) == (0, 50, EXACT, 5)
+
+    def test_shared_buffer(self):
+        buffer = bytearray(4096)
+        table = TranspositionTable(buffer=buffer)
+        other_table = TranspositionTable(buffer=buffer)
+        assert table.get_capacity() == 4096 // 16
+        table.store(12345, 4, 99, EXACT, 7)
+        assert other_table.probe(12345) == (4, 99, EXACT, 7)
+        other_table.clear()
+        assert table.probe(12345) == None
+
+    def test_shared_generation(self):
+        # Tables sharing a buffer that start the same search generation keep each other's deep entries
+        buffer = bytearray(32)
+        table = TranspositionTable(buffer=buffer)
+        other_table = TranspositionTable(buffer=buffer)
+        table.new_search()
+        table.new_search(5)
+        other_table.new_search(5)
+        table.store(1, 6, 10, EXACT, 1)
+        other_table.store(2, 2, 20, EXACT, 2)
+        assert other_table.probe(1) == (6, 10, EXACT, 1)
+        assert table.probe(2) == (2, 20, EXACT, 2)
+
+        # A later generation replaces the deep entries of the earlier one
+        other_table.new_search(6)
+        other_table.store(3, 0, 30, EXACT, 3)
+        assert table.probe(1) == None
@@ -0,0 +1,113 @@
+# Description: A fixed-size transposition table for searching ChessVar positions. Results are keyed by
+#               ChessVar.position_hash() and stored in a flat array of 64-bit words, so the memory used never grows
+
+from array import array
+
+# Bound types stored with each score
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Layout of the 64-bit data word of an entry
+_MOVE_BITS = 14          # packed move + 1, so 0 means "no best move"
+_DEPTH_SHIFT = 14
+_DEPTH_MASK = 0xFF
+_BOUND_SHIFT = 22
+_BOUND_MASK = 0x3
+_SCORE_SHIFT = 24
+_SCORE_OFFSET = 1 << 31  # scores are stored as unsigned 32-bit values
+_SCORE_MASK = 0xFFFFFFFF
+_GENERATION_SHIFT = 56
+_GENERATION_MASK = 0xFF
+
+_WORD_MASK = (1 << 64) - 1
+_WORDS_PER_ENTRY = 2     # (key XOR data, data)
+_ENTRIES_PER_BUCKET = 2  # (depth-preferred slot, always-replace slot)
+_WORDS_PER_BUCKET = _WORDS_PER_ENTRY * _ENTRIES_PER_BUCKET
+_BYTES_PER_BUCKET = 8 * _WORDS_PER_BUCKET
+
+def table_size_in_bytes(size_mb:float) -> int:
+    """Returns the number of bytes a table with the given memory budget actually uses
+    (the largest power-of-two number of buckets that fits in the budget)"""
+    return _usable_bytes(int(size_mb * 1024 * 1024))
+
+def _usable_bytes(budget:int) -> int:
+    """Returns the largest power-of-two number of buckets that fits in the budget, in bytes (at least one bucket)"""
+    buckets = max(1, budget // _BYTES_PER_BUCKET)
+    return (1 << (buckets.bit_length() - 1)) * _BYTES_PER_BUCKET
+
+class TranspositionTable:
+    """Represents a transposition table with a fixed memory budget
+    Each bucket holds two entries: the first is only replaced by a result searched at least as deep (or left over
+    from an older search), the second is always replaced. Each entry is two 64-bit words: the key XORed with the
+    data, and the data, so a half-written entry (e.g. from another process sharing the buffer) fails to match"""
+    def __init__(self, size_mb:float = 16, buffer = None) -> None:
+        """Creates an empty table using at most size_mb megabytes
+        If a writable buffer (e.g. shared memory) is given, the table lives in it and its size is taken from it"""
+        if buffer is None:
+            self._table = array("Q", bytes(table_size_in_bytes(size_mb)))
+        else:
+            byte_view = memoryview(buffer).cast("B")
+            self._table = byte_view[:_usable_bytes(len(byte_view))].cast("Q")
+        self._bucket_mask = len(self._table) // _WORDS_PER_BUCKET - 1
+        self._generation = 0
+
+    def get_capacity(self) -> int:
+        """Returns the number of entries the table can hold"""
+        return (self._bucket_mask + 1) * _ENTRIES_PER_BUCKET
+
+    def clear(self):
+        """Empties the table"""
+        byte_view = memoryview(self._table).cast("B")
+        byte_view[:] = bytes(len(byte_view))
+        self._generation = 0
+
+    def new_search(self, generation:int = None):
+        """Marks the start of a new search, so entries from earlier searches are replaced first
+        The generation is counted per table object, so searches in several processes sharing one buffer must pass
+        the same generation (e.g. counted by the process that starts them) to agree on which entries are current"""
+        if generation is None:
+            generation = self._generation + 1
+        self._generation = generation & _GENERATION_MASK
+
+    def probe(self, key:int):
+        """Returns (depth, score, bound, best move) stored for the position hash, or None if there's no entry
+        The best move is None if no move was stored"""
+        table = self._table
+        index = (key & self._bucket_mask) * _WORDS_PER_BUCKET
+        for slot in (index, index + _WORDS_PER_ENTRY):
+            data = table[slot + 1]
+            if data and table[slot] ^ data == key:
+                move = (data & ((1 << _MOVE_BITS) - 1)) - 1
+                return (
+                    (data >> _DEPTH_SHIFT) & _DEPTH_MASK,
+                    ((data >> _SCORE_SHIFT) & _SCORE_MASK) - _SCORE_OFFSET,
+                    (data >> _BOUND_SHIFT) & _BOUND_MASK,
+                    None if move < 0 else move,
+                )
+        return None
+
+    def store(self, key:int, depth:int, score:int, bound:int, best_move = None):
+        """Stores a search result for the position hash, following the bucket's replacement policy"""
+        data = (
+            (0 if best_move is None else best_move + 1)
+            | (min(depth, _DEPTH_MASK) << _DEPTH_SHIFT)
+            | (bound << _BOUND_SHIFT)
+            | (((score + _SCORE_OFFSET) & _SCORE_MASK) << _SCORE_SHIFT)
+            | (self._generation << _GENERATION_SHIFT)
+        )
+        table = self._table
+        index = (key & self._bucket_mask) * _WORDS_PER_BUCKET
+        stored_data = table[index + 1]
+        # The depth-preferred slot takes the entry if it's empty, holds the same position, is from an older search,
+        # or was searched less deeply. Otherwise the entry goes in the always-replace slot
+        use_depth_preferred_slot = (
+            not stored_data
+            or table[index] ^ stored_data == key
+            or (stored_data >> _GENERATION_SHIFT) != self._generation
+            or depth >= (stored_data >> _DEPTH_SHIFT) & _DEPTH_MASK
+        )
+        if not use_depth_preferred_slot:
+            index += _WORDS_PER_ENTRY
+        table[index] = (key ^ data) & _WORD_MASK
+        table[index + 1] = data